@@ -0,0 +1,605 @@
+#!/usr/bin/env python3
+"""
+Converter Benchmarks
+Times the converters against the data/input corpus and reports speedups
+over the implementations they replaced. The converters, combiner and
+synthetic benchmarks run every format (and DataCombiner) on the corpus and
+on a synthetic scan of --projections projections with a --vgl-mb MiB VGL
+project (synthetic.py), each case in a fresh process so its peak RSS is its
+own, and report wall time, peak RSS and output size.
+
+--save writes the results to a JSON baseline; --compare reads one and exits
+1 if any result is more than --tolerance slower, larger or bigger than it.
+
+Usage: python benchmark.py [benchmark ...] [--repeat N] [--input-dir DIR] [--projections N] [--vgl-mb MB]
+                           [--save FILE] [--compare FILE] [--tolerance T]
+"""
+import argparse
+import configparser
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pca_to_json import parse_pca
+from columnar import RowView
+from pcj_to_json import XRayLogParser
+from pcp_to_json import PCPConverter, convert_cell
+from converters import CONVERTERS, convert_path, get_converter
+import sidecar
+import synthetic
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCHMARKS: Dict[str, Callable] = {}
+SCALE_OPTIONS: Dict[str, Tuple[str, ...]] = {}  # Benchmark -> the scale options it takes
+DEFAULT_PROJECTIONS = 100000
+DEFAULT_VGL_MB = 256
+TOLERANCE = 0.25
+MIN_SECONDS = 0.005  # Slowdowns smaller than this are timer noise, whatever the ratio
+COMPARED = ('seconds', 'rss', 'bytes')  # Result values checked against a baseline
+COMBINED_TYPES = ('pca', 'pcj', 'pcp', 'pcr', 'vgl')  # Formats DataCombiner reads
+
+def benchmark(name: str, options: Iterable[str] = ()):
+    """Register a benchmark function under a name, with the scale options it accepts."""
+    def register(func):
+        BENCHMARKS[name] = func
+        SCALE_OPTIONS[name] = tuple(options)
+        return func
+    return register
+
+def best_time(func: Callable, repeat: int) -> float:
+    """Best wall time of func() over repeat runs, in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def peak_memory(func: Callable) -> int:
+    """Peak Python heap allocation while running func(), in bytes."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def peak_rss() -> Optional[int]:
+    """High-water resident set size of this process, in bytes (None where it cannot be read).
+
+    Linux keeps ru_maxrss across exec, so a spawned child would report its
+    parent's peak; VmHWM belongs to the child's own address space.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _isolated(task: Tuple[Callable, tuple]) -> dict:
+    func, args = task
+    result = func(*args)
+    result['rss'] = peak_rss()
+    return result
+
+def run_isolated(tasks: List[Tuple[Callable, tuple]]) -> List[dict]:
+    """Run each (func, args) in a fresh interpreter and add its peak RSS to the result dict func returns.
+
+    Peak RSS only ever grows within a process, so sharing one would report
+    the largest case so far for every case after it.
+    """
+    if not tasks:
+        return []
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        return pool.map(_isolated, tasks, chunksize=1)
+
+def convert_files(paths: List[str], repeat: int) -> dict:
+    """Best wall time of converting every path to a temp directory, and the JSON bytes written."""
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = []
+
+        def run():
+            outputs[:] = [convert_path(Path(path), Path(tmp))[1] for path in paths]
+
+        seconds = best_time(run, repeat)
+        return {'files': len(paths), 'seconds': seconds, 'bytes': sum(os.path.getsize(p) for p in outputs)}
+
+def combine_outputs(workdir: str, scans: List[Tuple[str, str]], repeat: int, warm: bool) -> dict:
+    """Best wall time of DataCombiner.combine_data over workdir/data/output.
+
+    Cold runs start from an empty catalog and cache every time, so every
+    output is loaded and summarised; warm runs reuse a filled catalog.
+    """
+    from data_combiner import DataCombiner
+
+    os.chdir(workdir)
+    scan_list = os.path.join(workdir, 'scans.txt')
+    with open(scan_list, 'w') as f:
+        f.writelines(f"{stem}|{file_type}\n" for stem, file_type in scans)
+    runs = []
+
+    def run():
+        if warm and runs:
+            combiner = runs[0]
+        else:
+            catalog = os.path.join(workdir, f"catalog-{len(runs)}.db")
+            combiner = DataCombiner(catalog_path=catalog)
+            runs.append(combiner)
+        df, processed = combiner.combine_data(Path(scan_list))
+        assert len(processed) == len(scans), f"combined {len(processed)} of {len(scans)} scans"
+
+    if warm:
+        run()
+    return {'files': len(scans), 'seconds': best_time(run, repeat)}
+
+def corpus_by_format(input_dir: Path) -> Dict[str, List[str]]:
+    """Corpus files per converter, for the converters that are installed."""
+    files: Dict[str, List[str]] = {}
+    for path in sorted(input_dir.iterdir()):
+        converter = get_converter(path.name)
+        if path.is_file() and converter is not None and converter.available():
+            files.setdefault(converter.name, []).append(str(path))
+    return files
+
+def convert_tree(paths: Iterable[str], workdir: str) -> List[Tuple[str, str]]:
+    """Convert inputs into workdir/data/output; returns the (stem, type) scans DataCombiner can read."""
+    output_dir = Path(workdir) / 'data' / 'output'
+    output_dir.mkdir(parents=True, exist_ok=True)
+    scans = []
+    for path in paths:
+        converter, _ = convert_path(Path(path), output_dir)
+        if converter.name in COMBINED_TYPES:
+            scans.append((Path(path).stem, converter.name))
+    return scans
+
+def legacy_pcj(path: str) -> dict:
+    """The readlines-based PCJ conversion: whole file and every row held before json.dump."""
+    parser = XRayLogParser(path)
+    with open(path, 'r') as file:
+        lines = file.readlines()
+    parser.parse_info_section(lines)
+    data_started = False
+    for line in lines:
+        if line.startswith('[Data]'):
+            data_started = True
+            continue
+        if data_started:
+            if line.startswith(';'):
+                parser.parse_column_names(line)
+            elif line.strip():
+                parser.data_section.append(parser.parse_data_line(line))
+    return {'info': parser.info_section, 'data': parser.data_section}
+
+def legacy_pcp(lines: List[str]) -> dict:
+    """The per-cell PCP conversion: isdigit test and strptime attempt for every value."""
+    metadata, columns, measurements = {}, [], []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if '|' in line:
+            key, value = line.split('|', 1)
+            metadata[key.strip()] = value.strip()
+            continue
+        if line.startswith('ImgNr'):
+            columns = line.split('\t')
+            continue
+        values = line.split('\t')
+        if not values[0].isdigit():
+            continue
+        measurement = {}
+        for column, value in zip(columns, values):
+            if value.replace('.', '').replace('-', '').isdigit():
+                measurement[column] = float(value)
+            else:
+                try:
+                    measurement[column] = datetime.strptime(value, '%Y-%m-%d %H:%M:%S').isoformat()
+                except ValueError:
+                    measurement[column] = value
+        measurements.append(measurement)
+    return {'metadata': metadata, 'measurements': measurements}
+
+def legacy_rtf(rtf_content: str) -> dict:
+    """The regex-per-field RTF conversion: striprtf twice, one re.search per field over the whole text."""
+    import re
+    from rtf_to_json import FORMULA_SECTION, SCOPED_FIELD, SECTIONS, clean_rtf_content, clean_value
+
+    cleaned_text = clean_rtf_content(rtf_content)
+    parsed_data = {}
+    for section_name, fields in SECTIONS:
+        section_data = {}
+        for field in fields:
+            pattern = re.escape(field) + r':\s*(.*?)(?=\n|$)'
+            if field == SCOPED_FIELD:
+                pattern = re.escape(section_name) + r'[\s\S]*?' + pattern
+            match = re.search(pattern, cleaned_text, re.MULTILINE | re.DOTALL)
+            value = clean_value(match.group(1)) if match else None
+            if value:
+                section_data[field] = value
+        if section_name is None:
+            parsed_data.update(section_data)
+        elif section_data:
+            parsed_data[section_name] = section_data
+
+    cleaned_text = clean_rtf_content(rtf_content)
+    section = re.search(r"Geometric Unsharpness Custom Formula:.*?(?=Motion Positions:|$)", cleaned_text, re.DOTALL)
+    formulas = {}
+    blocks = re.finditer(r"Name:\s*(.*?)(?:\s*\[.*?\])?\s*Expression:\s*(.*?)\s*Value:\s*(.*?)(?=Name:|$)",
+                         section.group(0) if section else '', re.DOTALL)
+    for block in blocks:
+        name = re.sub(r'\s*\[.*?\]', '', block.group(1).strip()).replace('|', '').strip()
+        if not name or name.startswith('\\') or name.endswith('cell'):
+            continue
+        formulas[name] = {
+            'Expression': block.group(2).strip().replace('|', '').strip().replace('Math.', ''),
+            'Value': block.group(3).strip().replace('|', '').strip(),
+        }
+    if formulas:
+        parsed_data[FORMULA_SECTION] = formulas
+    return parsed_data
+
+def legacy_configparser_pca(pca_data: str) -> dict:
+    """The configparser-based conversion the service used before parse_pca."""
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.optionxform = str
+    parser.read_string(pca_data)
+    data_dict = {}
+    for section in parser.sections():
+        section_dict = {}
+        for key, value in parser.items(section):
+            try:
+                if "." in value and not value.endswith('.tif'):
+                    section_dict[key] = float(value)
+                else:
+                    try:
+                        section_dict[key] = int(value)
+                    except ValueError:
+                        section_dict[key] = value
+            except ValueError:
+                section_dict[key] = value
+        data_dict[section] = section_dict
+    return data_dict
+
+@benchmark('pca')
+def bench_pca(input_dir: Path, repeat: int) -> List[dict]:
+    """configparser vs parse_pca over every .pca file in the corpus."""
+    texts = [p.read_text() for p in sorted(input_dir.glob('*.pca'))]
+    if not texts:
+        return []
+
+    def run_legacy():
+        for text in texts:
+            legacy_configparser_pca(text)
+
+    def run_new():
+        for text in texts:
+            parse_pca(text)
+
+    for text in texts:
+        assert parse_pca(text) == legacy_configparser_pca(text), "parse_pca output differs from configparser"
+
+    legacy = best_time(run_legacy, repeat)
+    new = best_time(run_new, repeat)
+    return [
+        {'name': 'pca/configparser', 'files': len(texts), 'seconds': legacy},
+        {'name': 'pca/parse_pca', 'files': len(texts), 'seconds': new, 'speedup': legacy / new},
+    ]
+
+def check_pcp(name: str, lines: List[str]) -> None:
+    """Typed PCP output must match per-cell parsing in value, and convert_cell in type.
+
+    Values are compared numerically against legacy_pcp, which writes every
+    number as a float, so ImgNr 1 and 1.0 are equal there. Types are checked
+    separately against convert_cell applied value by value: json.dumps tells
+    1 from 1.0, so the int columns must really be ints.
+    """
+    typed = PCPConverter(name).convert_lines(lines)
+    legacy = legacy_pcp(lines)
+    assert typed == legacy, f"typed PCP values differ from per-cell parsing for {name}"
+    columns = next(line.strip().split('\t') for line in lines if line.startswith('ImgNr'))
+    expected = [
+        {column: convert_cell(value) for column, value in zip(columns, line.strip().split('\t'))}
+        for line in lines
+        if line.strip() and not line.startswith('ImgNr') and '|' not in line
+        and line.strip().split('\t')[0].isdigit()
+    ]
+    assert json.dumps(typed['measurements']) == json.dumps(expected), \
+        f"typed PCP column types differ from convert_cell for {name}"
+
+@benchmark('pcp')
+def bench_pcp(input_dir: Path, repeat: int) -> List[dict]:
+    """Per-cell vs column-typed PCP parsing over every .pcp file (TV Vizio PCB.pcp is the largest)."""
+    sources = sorted(input_dir.glob('*.pcp'))
+    results = []
+    for source in sources:
+        with open(source, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        check_pcp(source.name, lines)
+        legacy = best_time(lambda: legacy_pcp(lines), repeat)
+        typed = best_time(lambda: PCPConverter(str(source)).convert_lines(lines), repeat)
+        results += [
+            {'name': f'pcp/per-cell {source.stem[:14]}', 'files': 1, 'seconds': legacy},
+            {'name': f'pcp/typed {source.stem[:14]}', 'files': 1, 'seconds': typed, 'speedup': legacy / typed},
+        ]
+    return results
+
+@benchmark('rtf')
+def bench_rtf(input_dir: Path, repeat: int) -> List[dict]:
+    """Regex-per-field vs single-pass parsing of the RTF technique reports (Technique-USNM35717_.rtf)."""
+    try:
+        from rtf_to_json import convert_rtf, parse_report, report_lines
+    except ImportError:
+        return []  # striprtf not installed
+    results = []
+    for source in sorted(input_dir.glob('*.rtf')):
+        text = source.read_text(encoding='utf-8')
+        assert convert_rtf(text) == legacy_rtf(text), f"single-pass RTF output differs for {source.name}"
+        lines = report_lines(text)
+        legacy = best_time(lambda: legacy_rtf(text), repeat)
+        single = best_time(lambda: convert_rtf(text), repeat)
+        results += [
+            {'name': f'rtf/regex per field {source.stem[:10]}', 'files': 1, 'seconds': legacy},
+            {'name': f'rtf/single pass {source.stem[:10]}', 'files': 1, 'seconds': single, 'speedup': legacy / single},
+            {'name': 'rtf/field pass only', 'files': 1, 'seconds': best_time(lambda: parse_report(lines), repeat)},
+        ]
+    return results
+
+@benchmark('columnar')
+def bench_columnar(input_dir: Path, repeat: int) -> List[dict]:
+    """Row vs columnar JSON for PCJ and PCP: output size, json.loads and row access."""
+    results = []
+    for ext, table_key in (('pcj', 'data'), ('pcp', 'measurements')):
+        sources = sorted(input_dir.glob(f'*.{ext}'))
+        if not sources:
+            continue
+        converter = CONVERTERS[ext]
+        row_texts, col_texts = [], []
+        for source in sources:
+            raw = source.read_bytes()
+            row_texts.append(converter.dumps(converter.convert(raw)))
+            col_texts.append(converter.dumps(converter.convert(raw, columnar=True)))
+
+        def load_rows():
+            for text in row_texts:
+                json.loads(text)
+
+        def load_columns():
+            for text in col_texts:
+                json.loads(text)
+
+        def scan_rows_view():
+            for text in col_texts:
+                for row in RowView(json.loads(text)[table_key]):
+                    pass
+
+        row_bytes = sum(len(t) for t in row_texts)
+        col_bytes = sum(len(t) for t in col_texts)
+        rows_load = best_time(load_rows, repeat)
+        results += [
+            {'name': f'{ext}/rows load', 'files': len(sources), 'seconds': rows_load, 'bytes': row_bytes},
+            {'name': f'{ext}/columnar load', 'files': len(sources), 'seconds': best_time(load_columns, repeat),
+             'bytes': col_bytes, 'speedup': rows_load / best_time(load_columns, repeat)},
+            {'name': f'{ext}/columnar + RowView', 'files': len(sources), 'seconds': best_time(scan_rows_view, repeat),
+             'bytes': col_bytes},
+        ]
+    return results
+
+@benchmark('pcj-stream', options=('projections',))
+def bench_pcj_stream(input_dir: Path, repeat: int, projections: int = DEFAULT_PROJECTIONS) -> List[dict]:
+    """readlines + json.dump vs the streaming PCJ writer on a synthetic 100k-projection file."""
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'synthetic.pcj')
+        synthetic.write_pcj(source, projections)
+        legacy_out = os.path.join(tmp, 'legacy.json')
+        stream_out = os.path.join(tmp, 'stream.json')
+
+        def run_legacy():
+            with open(legacy_out, 'w') as f:
+                json.dump(legacy_pcj(source), f, indent=2)
+
+        def run_stream():
+            XRayLogParser(source).save_json(stream_out)
+
+        legacy_peak = peak_memory(run_legacy)
+        stream_peak = peak_memory(run_stream)
+        with open(legacy_out) as a, open(stream_out) as b:
+            assert a.read() == b.read(), "streaming PCJ output differs from json.dump"
+
+        runs = max(1, repeat // 10)
+        legacy = best_time(run_legacy, runs)
+        stream = best_time(run_stream, runs)
+        return [
+            {'name': 'pcj/readlines', 'files': 1, 'seconds': legacy, 'peak': legacy_peak},
+            {'name': 'pcj/stream', 'files': 1, 'seconds': stream, 'peak': stream_peak,
+             'speedup': legacy / stream},
+        ]
+
+@benchmark('sidecar', options=('projections',))
+def bench_sidecar(input_dir: Path, repeat: int, projections: int = DEFAULT_PROJECTIONS) -> List[dict]:
+    """Loading every projection column of a synthetic 100k-projection PCJ: row JSON vs the .npz sidecar."""
+    if not sidecar.available():
+        return []
+    converter = CONVERTERS['pcj']
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'synthetic.pcj')
+        synthetic.write_pcj(source, projections)
+        rows_json = os.path.join(tmp, 'rows.pcj.json')
+        sidecar_json = os.path.join(tmp, 'sidecar.pcj.json')
+        with open(source, 'rb') as src, open(rows_json, 'w') as out:
+            converter.write(src, out)
+        with open(source, 'rb') as src, open(sidecar_json, 'w') as out:
+            converter.write_with_sidecar(src, out, os.path.join(tmp, 'sidecar.pcj.npz'))
+
+        def load_rows():
+            with open(rows_json) as f:
+                data = json.load(f)['data']
+            return {name: [row.get(name) for row in data] for name in data[0]}
+
+        def load_sidecar():
+            with open(sidecar_json) as f:
+                table = json.load(f)['data']
+            return sidecar.load_columns(table, tmp)
+
+        rows_load = best_time(load_rows, max(1, repeat // 10))
+        mapped = best_time(load_sidecar, repeat)
+        return [
+            {'name': 'pcj/rows json columns', 'files': 1, 'seconds': rows_load,
+             'bytes': os.path.getsize(rows_json), 'peak': peak_memory(load_rows)},
+            {'name': 'pcj/sidecar mmap columns', 'files': 1, 'seconds': mapped,
+             'bytes': os.path.getsize(sidecar_json), 'peak': peak_memory(load_sidecar),
+             'speedup': rows_load / mapped},
+        ]
+
+@benchmark('converters')
+def bench_converters(input_dir: Path, repeat: int) -> List[dict]:
+    """Every installed converter over its corpus files: wall time, peak RSS and JSON bytes."""
+    corpus = corpus_by_format(input_dir)
+    tasks = [(convert_files, (paths, repeat)) for paths in corpus.values()]
+    return [{'name': f'convert/{name} corpus', **result}
+            for name, result in zip(corpus, run_isolated(tasks))]
+
+@benchmark('combiner')
+def bench_combiner(input_dir: Path, repeat: int) -> List[dict]:
+    """DataCombiner over the converted corpus, from an empty and from a filled catalog."""
+    if importlib.util.find_spec('pandas') is None:
+        return []
+    paths = [path for name, paths in corpus_by_format(input_dir).items() if name in COMBINED_TYPES for path in paths]
+    with tempfile.TemporaryDirectory() as tmp:
+        scans = convert_tree(paths, tmp)
+        results = run_isolated([(combine_outputs, (tmp, scans, repeat, warm)) for warm in (False, True)])
+    return [{'name': f'combine/corpus {label}', **result} for label, result in zip(('cold', 'warm'), results)]
+
+@benchmark('synthetic', options=('projections', 'vgl_mb'))
+def bench_synthetic(input_dir: Path, repeat: int, projections: int = DEFAULT_PROJECTIONS,
+                    vgl_mb: float = DEFAULT_VGL_MB) -> List[dict]:
+    """Each format of a synthetic scan, and DataCombiner over it, at the given scale."""
+    runs = max(1, repeat // 10)
+    scale = f'{projections // 1000}k' if projections >= 1000 else str(projections)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = synthetic.write_scan(os.path.join(tmp, 'scan'), projections=projections,
+                                     vgl_bytes=int(vgl_mb * (1 << 20)))
+        names = [f'convert/{ext} {f"{vgl_mb:g}MB" if ext == "vgl" else scale}' for ext in paths]
+        tasks = [(convert_files, ([str(path)], runs)) for path in paths.values()]
+        if importlib.util.find_spec('pandas') is not None:
+            scans = convert_tree([str(path) for path in paths.values()], tmp)
+            names.append(f'combine/{scale} cold')
+            tasks.append((combine_outputs, (tmp, scans, runs, False)))
+        return [{'name': name, **result} for name, result in zip(names, run_isolated(tasks))]
+
+def save_baseline(path: Path, results: List[dict], settings: Dict) -> None:
+    """Write results to a JSON baseline keyed by result name."""
+    baseline = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': f"{platform.system()} {platform.machine()}",
+        'settings': settings,
+        'results': {result['name']: {key: result[key] for key in ('files', *COMPARED, 'peak') if result.get(key) is not None}
+                    for result in results},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2)
+        f.write('\n')
+
+def compare_baseline(results: List[dict], baseline: Dict, tolerance: float = TOLERANCE) -> List[str]:
+    """Regressions of results against a baseline: any compared value more than tolerance above it.
+
+    Results the baseline does not have, and values either side did not
+    measure, are not compared.
+    """
+    regressions = []
+    for result in results:
+        reference = baseline['results'].get(result['name'])
+        if reference is None:
+            continue
+        for key in COMPARED:
+            old, new = reference.get(key), result.get(key)
+            if old is None or new is None or new <= old * (1 + tolerance):
+                continue
+            if key == 'seconds' and new - old < MIN_SECONDS:
+                continue
+            change = f"{new / old - 1:+.0%}" if old else "from 0"
+            regressions.append(f"{result['name']}: {key} {old:.6g} -> {new:.6g} ({change})")
+    return regressions
+
+def format_result(result: dict) -> str:
+    line = f"{result['name']:<32} {result['files']:>5} files  {result['seconds'] * 1000:>10.2f} ms"
+    if 'bytes' in result:
+        line += f"  {result['bytes'] / 1024:>9.1f} KiB"
+    if 'peak' in result:
+        line += f"  peak {result['peak'] / 1024:>9.1f} KiB"
+    if result.get('rss') is not None:
+        line += f"  rss {result['rss'] / (1 << 20):>7.1f} MiB"
+    if 'speedup' in result:
+        line += f"  {result['speedup']:.1f}x"
+    return line
+
+def main():
+    default_input = Path(__file__).resolve().parents[2] / 'data' / 'input'
+    arg_parser = argparse.ArgumentParser(description="Benchmark the file converters")
+    arg_parser.add_argument('benchmarks', nargs='*', help=f"Benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    arg_parser.add_argument('--repeat', type=int, default=20, help="Runs per timing, best is reported")
+    arg_parser.add_argument('--input-dir', type=Path, default=default_input, help="Corpus directory")
+    arg_parser.add_argument('--projections', type=int, default=DEFAULT_PROJECTIONS,
+                            help=f"Projections of the synthetic scans (default {DEFAULT_PROJECTIONS})")
+    arg_parser.add_argument('--vgl-mb', type=float, default=DEFAULT_VGL_MB,
+                            help=f"Uncompressed size of the synthetic VGL project in MiB (default {DEFAULT_VGL_MB})")
+    arg_parser.add_argument('--save', type=Path, metavar='FILE', help="Write the results to a JSON baseline")
+    arg_parser.add_argument('--compare', type=Path, metavar='FILE',
+                            help="Compare with a JSON baseline; exit 1 on a regression")
+    arg_parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                            help=f"Allowed increase over the baseline (default {TOLERANCE:g}, i.e. {TOLERANCE:.0%})")
+    args = arg_parser.parse_args()
+
+    names = args.benchmarks or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        print(f"Unknown benchmark(s): {', '.join(unknown)}", file=sys.stderr)
+        sys.exit(1)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    scale = {'projections': args.projections, 'vgl_mb': args.vgl_mb}
+    results = []
+    for name in names:
+        options = {option: scale[option] for option in SCALE_OPTIONS[name]}
+        for result in BENCHMARKS[name](args.input_dir, args.repeat, **options):
+            print(format_result(result))
+            results.append(result)
+
+    if args.save:
+        save_baseline(args.save, results, {'repeat': args.repeat, **scale})
+        print(f"Baseline saved to {args.save}")
+    if baseline is not None:
+        regressions = compare_baseline(results, baseline, args.tolerance)
+        print(f"{len(regressions)} regression(s) against {args.compare} ({baseline.get('created')}, "
+              f"{baseline.get('machine')}, Python {baseline.get('python')})")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
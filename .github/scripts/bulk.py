@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Bulk Conversion
+Converts whole directory trees, globs or lists of instrument files through
+the converter registry on a process pool sized to the machine. Progress is
+printed as each file finishes, outputs are written atomically, and a
+summary reports files/sec and the time spent per format.
+
+`build` keeps a manifest of what each output was made from (input hash,
+converter name, version and source fingerprint, options, output hash) and
+only reconverts inputs whose entry no longer matches. Outputs no current
+input produces are reported as orphans.
+
+With --profile DIR every worker dumps a cProfile of each file it converts
+(or of a --profile-rate sample of them) to DIR, and the run ends with one
+hotspot summary over all of them.
+
+Usage: python bulk.py convert <dir|glob|file> [...] [--output-dir data/output] [--jobs N]
+                              [--columnar] [--sidecar] [--profile DIR]
+       python bulk.py build <dir|glob|file> [...] [--output-dir data/output] [--manifest PATH]
+                            [--jobs N] [--columnar] [--sidecar] [--force] [--dry-run] [--prune]
+                            [--profile DIR]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import profiling
+from converters import CONVERTERS, SNIFF_BYTES, convert_path, get_converter, supported_extensions
+from sidecar import sidecar_name
+
+MANIFEST_NAME = '.manifest.json'
+MANIFEST_VERSION = 1
+
+_NO_PROFILER = profiling.Profiler()
+_worker_profiler = _NO_PROFILER
+
+def default_jobs() -> int:
+    """One worker per core."""
+    return os.cpu_count() or 1
+
+def expand_inputs(patterns: Iterable[str]) -> List[Tuple[Path, Path]]:
+    """Resolve directories, globs and files to (input, output subdirectory) pairs.
+
+    Directories are walked for files with a registered extension, and their
+    layout is kept below the output directory so equal names in different
+    folders do not collide. Globs and plain files go to the output root.
+    """
+    extensions = tuple(supported_extensions())
+    seen = set()
+    inputs = []
+
+    def add(path: Path, subdir: Path) -> None:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            inputs.append((path, subdir))
+
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            root = Path(pattern)
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if name.lower().endswith(extensions) and not name.startswith('.'):
+                        path = Path(dirpath) / name
+                        add(path, path.parent.relative_to(root))
+        elif glob.has_magic(pattern):
+            for match in sorted(glob.glob(pattern, recursive=True)):
+                if os.path.isfile(match):
+                    add(Path(match), Path())
+        else:
+            add(Path(pattern), Path())
+    return inputs
+
+def set_worker_profiler(output_dir: Optional[str], rate: float = 1.0) -> None:
+    """Pool initializer: dump a profile of (a sample of) this worker's files to output_dir."""
+    global _worker_profiler
+    _worker_profiler = profiling.Profiler(output_dir, rate=rate, max_dumps=None, summary_interval=None) \
+        if output_dir else _NO_PROFILER
+
+def convert_one(job: Tuple[str, str, bool, bool]) -> Dict:
+    """Worker: convert one file and report how it went."""
+    input_file, output_dir, columnar, sidecar_output = job
+    start = time.perf_counter()
+    result = {'input': input_file, 'output': None, 'format': None, 'bytes': 0, 'error': None}
+    with _worker_profiler.profile(Path(input_file).name) as run:
+        try:
+            result['bytes'] = os.path.getsize(input_file)
+            os.makedirs(output_dir, exist_ok=True)
+            converter, output_path = convert_path(Path(input_file), Path(output_dir), columnar=columnar,
+                                                  sidecar_output=sidecar_output)
+            result['format'] = converter.name
+            result['output'] = str(output_path)
+        except Exception as e:
+            converter = get_converter(input_file)
+            result['format'] = converter.name if converter else None
+            result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - start
+    if run is not None and run.dump:
+        result['profile'] = run.dump
+    return result
+
+def run_jobs(jobs: List[Tuple], workers: int, func=convert_one,
+             profiler: Optional[profiling.Profiler] = None) -> Iterator[Dict]:
+    """Run func over jobs, yielding results as they finish.
+
+    With an enabled profiler, each worker profiles the files it converts.
+    """
+    settings = (profiler.output_dir, profiler.rate) if profiler is not None and profiler.enabled else (None,)
+    if workers <= 1 or len(jobs) <= 1:
+        set_worker_profiler(*settings)
+        try:
+            for job in jobs:
+                yield func(job)
+        finally:
+            set_worker_profiler(None)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=set_worker_profiler,
+                             initargs=settings) as pool:
+        futures = [pool.submit(func, job) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+def summarize(results: List[Dict], elapsed: float) -> List[str]:
+    """Summary lines: throughput overall and time per format."""
+    converted = [r for r in results if not r['error']]
+    total_bytes = sum(r['bytes'] for r in converted)
+    lines = [
+        f"{len(converted)} converted, {len(results) - len(converted)} failed in {elapsed:.2f}s "
+        f"({len(converted) / elapsed if elapsed else 0:.1f} files/s, "
+        f"{total_bytes / (1 << 20) / elapsed if elapsed else 0:.1f} MiB/s)"
+    ]
+    formats: Dict[str, List[Dict]] = {}
+    for result in converted:
+        formats.setdefault(result['format'], []).append(result)
+    for name in sorted(formats):
+        seconds = [r['seconds'] for r in formats[name]]
+        lines.append(f"  {name:<5} {len(seconds):>6} files  {sum(seconds):>8.2f}s total  "
+                     f"{sum(seconds) / len(seconds) * 1000:>9.1f} ms/file  {max(seconds) * 1000:>9.1f} ms max")
+    return lines
+
+def file_sha256(path) -> str:
+    """SHA-256 of a file, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def plan_outputs(inputs: List[Tuple[Path, Path]], output_dir: str) -> Tuple[List[Tuple], List[Dict]]:
+    """Pair each input with its converter and output directory.
+
+    Returns (planned, failed): planned holds (path, converter, output
+    directory) tuples; inputs no converter accepts, or whose output name is
+    already taken by another input, are returned as failed results instead
+    so two inputs never race for the same file.
+    """
+    planned = []
+    failed = []
+    targets = {}
+    for path, subdir in inputs:
+        converter = get_converter(path.name)
+        if converter is None and path.is_file():
+            with open(path, 'rb') as f:
+                converter = get_converter(path.name, f.read(SNIFF_BYTES))
+        target_dir = Path(output_dir) / subdir
+        if converter is not None:
+            target = os.path.abspath(target_dir / converter.output_name(path.stem))
+            if target in targets:
+                failed.append({'input': str(path), 'output': None, 'format': converter.name, 'bytes': 0,
+                               'seconds': 0.0, 'error': f"same output as {targets[target]}"})
+                continue
+            targets[target] = str(path)
+        planned.append((path, converter, target_dir))
+    return planned, failed
+
+def run_with_progress(jobs: List[Tuple], workers: int, failed: List[Dict], func=convert_one,
+                      profiler: Optional[profiling.Profiler] = None) -> Tuple[List[Dict], float]:
+    """Run jobs, printing one line per finished file; returns (results, seconds).
+
+    With an enabled profiler the workers dump a profile per file, and their
+    dumps are summarised into the profiler's directory at the end.
+    """
+    print(f"Converting {len(jobs)} files with {min(workers, len(jobs)) or 1} workers", flush=True)
+    start = time.perf_counter()
+    results = list(failed)
+    for result in failed:
+        print(f"Error converting {result['input']}: {result['error']}", file=sys.stderr, flush=True)
+    width = len(str(len(jobs)))
+    for done, result in enumerate(run_jobs(jobs, workers, func, profiler), 1):
+        results.append(result)
+        prefix = f"[{done:>{width}}/{len(jobs)}]"
+        if result['error']:
+            print(f"{prefix} Error converting {result['input']}: {result['error']}", file=sys.stderr, flush=True)
+        else:
+            print(f"{prefix} {result['input']} -> {result['output']} "
+                  f"({result['format']}, {result['seconds'] * 1000:.1f} ms)", flush=True)
+    elapsed = time.perf_counter() - start
+    if profiler is not None and profiler.enabled:
+        profiler.add_dumps(result['profile'] for result in results if result.get('profile'))
+        summary_path = profiler.close()
+        if summary_path:
+            print(f"Profile summary: {summary_path}", flush=True)
+    return results, elapsed
+
+def command_convert(args) -> int:
+    inputs = expand_inputs(args.inputs)
+    if not inputs:
+        print("No input files found", file=sys.stderr)
+        return 1
+    planned, failed = plan_outputs(inputs, args.output_dir)
+    jobs = [(str(path), str(target_dir), args.columnar, args.sidecar) for path, _, target_dir in planned]
+    results, elapsed = run_with_progress(jobs, args.jobs or default_jobs(), failed,
+                                         profiler=profiling.from_args(args))
+    for line in summarize(results, elapsed):
+        print(line)
+    return 1 if any(r['error'] for r in results) else 0
+
+# Incremental builds
+
+def load_manifest(path: Path) -> Dict[str, Dict]:
+    """Manifest entries by input path; empty if there is no usable manifest."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        print(f"Ignoring {path}: manifest version {manifest.get('version')} is not {MANIFEST_VERSION}",
+              file=sys.stderr)
+        return {}
+    return manifest['entries']
+
+def save_manifest(path: Path, entries: Dict[str, Dict]) -> None:
+    """Write the manifest to a temp file and rename it into place."""
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'entries': dict(sorted(entries.items()))}, f, indent=2)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+def build_options(converter, columnar: bool, sidecar_output: bool) -> Dict[str, bool]:
+    """The options that can change this format's output, as recorded in the manifest."""
+    options = {}
+    if 'columnar' in converter.options:
+        options['columnar'] = columnar
+    if converter.tables:
+        options['sidecar'] = sidecar_output
+    return options
+
+def stale_reason(entry: Optional[Dict], expected: Dict, output_dir: Path) -> Optional[str]:
+    """Why an input must be reconverted, or None if its outputs are up to date.
+
+    expected holds the entry fields known before converting: input hash,
+    converter name, version, fingerprint, options and output name.
+    """
+    if entry is None:
+        return "new input"
+    if entry['input_sha256'] != expected['input_sha256']:
+        return "input changed"
+    if entry['converter'] != expected['converter']:
+        return f"converter changed from {entry['converter']}"
+    if entry['converter_version'] != expected['converter_version']:
+        return f"{expected['converter']} converter version changed"
+    if entry['converter_fingerprint'] != expected['converter_fingerprint']:
+        return f"{expected['converter']} converter code changed"
+    if entry['options'] != expected['options']:
+        return "options changed"
+    if entry['output'] != expected['output']:
+        return "output name changed"
+    for key in ('output', 'sidecar'):
+        if entry.get(key) is None:
+            continue
+        path = output_dir / entry[key]
+        if not path.exists():
+            return f"{key} missing"
+        if file_sha256(path) != entry[f'{key}_sha256']:
+            return f"{key} modified"
+    return None
+
+def build_one(job: Tuple[str, str, bool, bool]) -> Dict:
+    """Worker: convert one file and hash what it wrote."""
+    result = convert_one(job)
+    if not result['error']:
+        output_path = Path(result['output'])
+        result['output_sha256'] = file_sha256(output_path)
+        sidecar_path = output_path.with_name(sidecar_name(output_path.name))
+        if job[3] and sidecar_path.exists():
+            result['sidecar'] = str(sidecar_path)
+            result['sidecar_sha256'] = file_sha256(sidecar_path)
+    return result
+
+def find_orphans(output_dir: Path, produced: Iterable[str]) -> List[Path]:
+    """JSON and sidecar files below output_dir that no input produces."""
+    produced = set(produced)
+    orphans = []
+    if not output_dir.is_dir():
+        return orphans
+    for path in sorted(output_dir.rglob('*')):
+        relative = path.relative_to(output_dir)
+        if not path.is_file() or path.suffix not in ('.json', '.npz') \
+                or any(part.startswith('.') for part in relative.parts):
+            continue
+        if relative.as_posix() not in produced:
+            orphans.append(path)
+    return orphans
+
+def command_build(args) -> int:
+    inputs = expand_inputs(args.inputs)
+    if not inputs:
+        print("No input files found", file=sys.stderr)
+        return 1
+    output_dir = Path(args.output_dir)
+    manifest_path = Path(args.manifest) if args.manifest else output_dir / MANIFEST_NAME
+    entries = load_manifest(manifest_path)
+    fingerprints = {name: converter.fingerprint() for name, converter in CONVERTERS.items()}
+
+    planned, failed = plan_outputs(inputs, args.output_dir)
+    current = set()
+    pending = {}
+    jobs = []
+    up_to_date = 0
+    for path, converter, target_dir in planned:
+        key = path.as_posix()
+        current.add(key)
+        if converter is None:
+            failed.append({'input': str(path), 'output': None, 'format': None, 'bytes': 0, 'seconds': 0.0,
+                           'error': f"No converter for {path.name}"})
+            entries.pop(key, None)
+            continue
+        expected = {
+            'input_sha256': file_sha256(path),
+            'converter': converter.name,
+            'converter_version': converter.version,
+            'converter_fingerprint': fingerprints[converter.name],
+            'options': build_options(converter, args.columnar, args.sidecar),
+            'output': (target_dir / converter.output_name(path.stem)).relative_to(output_dir).as_posix(),
+        }
+        reason = "forced" if args.force else stale_reason(entries.get(key), expected, output_dir)
+        if reason is None:
+            up_to_date += 1
+            continue
+        print(f"Rebuild {path}: {reason}", flush=True)
+        pending[str(path)] = (key, expected)
+        jobs.append((str(path), str(target_dir), args.columnar, args.sidecar))
+
+    # Entries whose input is gone are dropped; their outputs show up as orphans
+    for key in list(entries):
+        if key not in current and not os.path.exists(key):
+            del entries[key]
+
+    results = list(failed)
+    if args.dry_run:
+        print(f"{len(jobs)} to rebuild, {up_to_date} up to date")
+    elif jobs or failed:
+        results, elapsed = run_with_progress(jobs, args.jobs or default_jobs(), failed, func=build_one,
+                                             profiler=profiling.from_args(args))
+        for result in results:
+            if result['input'] not in pending:
+                continue
+            key, expected = pending[result['input']]
+            if result['error']:
+                # Retry next time rather than trust an output of unknown age
+                entries.pop(key, None)
+                continue
+            entry = dict(expected, output_sha256=result['output_sha256'])
+            if 'sidecar' in result:
+                entry['sidecar'] = Path(result['sidecar']).relative_to(output_dir).as_posix()
+                entry['sidecar_sha256'] = result['sidecar_sha256']
+            entries[key] = entry
+        for line in summarize(results, elapsed):
+            print(line)
+        print(f"{up_to_date} up to date")
+    else:
+        print(f"Nothing to rebuild, {up_to_date} up to date")
+
+    produced = [entry[field] for entry in entries.values() for field in ('output', 'sidecar') if field in entry]
+    produced += [expected['output'] for _, expected in pending.values()]
+    orphans = find_orphans(output_dir, produced)
+    for orphan in orphans:
+        if args.prune and not args.dry_run:
+            orphan.unlink()
+            print(f"Removed orphaned output {orphan}")
+        else:
+            print(f"Orphaned output {orphan}")
+
+    if not args.dry_run:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        save_manifest(manifest_path, entries)
+    return 1 if any(r['error'] for r in results) else 0
+
+def add_conversion_options(command: argparse.ArgumentParser) -> None:
+    command.add_argument('inputs', nargs='+', help="Directories (walked recursively), globs or files")
+    command.add_argument('--output-dir', default='data/output', help="Directory for JSON outputs")
+    command.add_argument('--jobs', '-j', type=int, default=None,
+                         help=f"Worker processes (default: one per core, {default_jobs()} here)")
+    command.add_argument('--columnar', action='store_true', help="Write projection tables one array per column")
+    command.add_argument('--sidecar', action='store_true',
+                         help="Write numeric projection columns to a .npz next to the JSON (needs numpy)")
+    profiling.add_arguments(command)
+
+def build_parser() -> argparse.ArgumentParser:
+    arg_parser = argparse.ArgumentParser(description="Convert many instrument files in parallel")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    convert = commands.add_parser('convert', help="Convert directories, globs or files")
+    add_conversion_options(convert)
+    convert.set_defaults(func=command_convert)
+
+    build = commands.add_parser('build', help="Reconvert only inputs whose content or converter changed")
+    add_conversion_options(build)
+    build.add_argument('--manifest', default=None,
+                       help=f"Build manifest (default: {MANIFEST_NAME} in the output directory)")
+    build.add_argument('--force', action='store_true', help="Reconvert every input")
+    build.add_argument('--dry-run', action='store_true', help="Only list what would be rebuilt")
+    build.add_argument('--prune', action='store_true', help="Delete orphaned outputs")
+    build.set_defaults(func=command_build)
+    return arg_parser
+
+def main(argv: Optional[List[str]] = None):
+    args = build_parser().parse_args(argv)
+    sys.exit(args.func(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Scan Catalog
+A persistent SQLite index of the key metrics of converted scans. Each output
+JSON is loaded once; its metrics are flattened into a table per format with
+one column per parameter, and the file is only read again when its size or
+mtime changes. Looking up any number of scans is then one indexed query per
+format instead of a JSON load per scan.
+
+The catalog does not know the file layout or which metrics matter: it asks
+its owner (DataCombiner) to locate, load and extract them.
+
+Usage: python catalog.py [--db data/catalog.db] [--output-dir data/output]
+"""
+import argparse
+import numbers
+import os
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_PATH = 'data/catalog.db'
+QUERY_CHUNK = 500  # Names per IN (...) query, below SQLite's parameter limit
+
+_TYPE_RE = re.compile(r'[a-z0-9_]+')
+_OUTPUT_RE = re.compile(r'(?P<name>.+)\.(?P<type>[a-z0-9_]+)\.json')
+
+def _plain(value: Any) -> Any:
+    """NumPy integers (from sidecar tables) as Python ints; NumPy floats already are floats."""
+    if isinstance(value, numbers.Integral) and not isinstance(value, int):
+        return int(value)
+    return value
+
+def _kind(value: Any) -> str:
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, float):
+        return 'float'
+    return 'str'
+
+def _stored(value: Any) -> Any:
+    """value as SQLite keeps it: scalars as is, anything else as its text."""
+    if value is None or isinstance(value, (bool, float, str)):
+        return value
+    if isinstance(value, int):
+        return value if -(1 << 63) <= value < (1 << 63) else str(value)
+    return str(value)
+
+class ScanCatalog:
+    """Persistent per-format parameter tables for the scans a combiner reads.
+
+    owner provides find_json_file(name, type), load_json_file(path),
+    extract_key_metrics(data, type) and METRICS_VERSION; rows extracted by
+    an older METRICS_VERSION are re-ingested.
+    """
+
+    def __init__(self, db_path: str, owner):
+        self.db_path = db_path
+        self.owner = owner
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA foreign_keys=ON')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS scans (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                type TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER,
+                mtime_ns INTEGER,
+                version INTEGER,
+                ingested_at REAL NOT NULL,
+                UNIQUE (type, name)
+            );
+            CREATE TABLE IF NOT EXISTS parameters (
+                type TEXT NOT NULL,
+                name TEXT NOT NULL,
+                col TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                PRIMARY KEY (type, name)
+            );
+        """)
+        self._conn.commit()
+        self._columns: Dict[str, Dict[str, Tuple[str, str]]] = {}  # type -> name -> (col, kind)
+        self.ingested = 0
+
+    def close(self) -> None:
+        self._conn.close()
+
+    # Schema
+
+    @staticmethod
+    def _table(scan_type: str) -> str:
+        if not _TYPE_RE.fullmatch(scan_type):
+            raise ValueError(f"Invalid scan type '{scan_type}'")
+        return f"params_{scan_type}"
+
+    def _type_columns(self, scan_type: str) -> Dict[str, Tuple[str, str]]:
+        """Parameter name -> (column, kind) for a format, creating its table if needed."""
+        if scan_type not in self._columns:
+            table = self._table(scan_type)
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ("
+                               "scan_id INTEGER PRIMARY KEY REFERENCES scans (id) ON DELETE CASCADE)")
+            rows = self._conn.execute('SELECT name, col, kind FROM parameters WHERE type = ? ORDER BY position',
+                                      (scan_type,)).fetchall()
+            self._columns[scan_type] = {name: (col, kind) for name, col, kind in rows}
+        return self._columns[scan_type]
+
+    def _column_for(self, scan_type: str, name: str, value: Any) -> str:
+        """Column holding a parameter, added on first sight.
+
+        Columns are named by position because parameter names are not valid
+        or unique SQL identifiers (SQLite folds case: InitTimeOut and
+        InitTimeout are both PCA keys). They have no declared type, so each
+        value keeps the type it was stored with; kind records it so bools
+        come back as bools.
+        """
+        columns = self._type_columns(scan_type)
+        kind = _kind(value)
+        if name in columns:
+            col, known = columns[name]
+            if value is not None and known != kind and known != 'mixed':
+                if known == 'none':
+                    known = kind
+                elif {known, kind} == {'int', 'float'}:
+                    known = 'float'
+                else:
+                    known = 'mixed'
+                columns[name] = (col, known)
+                self._conn.execute('UPDATE parameters SET kind = ? WHERE type = ? AND name = ?',
+                                   (known, scan_type, name))
+            return col
+        col = f"p{len(columns)}"
+        kind = 'none' if value is None else kind
+        self._conn.execute(f"ALTER TABLE {self._table(scan_type)} ADD COLUMN {col}")
+        self._conn.execute('INSERT INTO parameters (type, name, col, kind, position) VALUES (?, ?, ?, ?, ?)',
+                           (scan_type, name, col, kind, len(columns)))
+        columns[name] = (col, kind)
+        return col
+
+    # Ingest
+
+    def ingest(self, name: str, scan_type: str, path, metrics: Optional[Dict] = None) -> None:
+        """Load one output (unless metrics are given) and store its metrics."""
+        path = Path(path)
+        st = os.stat(path)
+        if metrics is None:
+            metrics = self.owner.extract_key_metrics(self.owner.load_json_file(path), scan_type)
+        table = self._table(scan_type)
+        self._type_columns(scan_type)
+        try:
+            self._store(table, name, scan_type, path, st, metrics)
+        except Exception:
+            # Columns added by the rolled back transaction are gone again
+            self._columns.pop(scan_type, None)
+            raise
+        self.ingested += 1
+
+    def _store(self, table: str, name: str, scan_type: str, path: Path, st: os.stat_result, metrics: Dict) -> None:
+        with self._conn:
+            row = self._conn.execute('SELECT id FROM scans WHERE type = ? AND name = ?', (scan_type, name)).fetchone()
+            values = (str(path), st.st_size, st.st_mtime_ns, self.owner.METRICS_VERSION, time.time())
+            if row is None:
+                scan_id = self._conn.execute(
+                    'INSERT INTO scans (name, type, path, size, mtime_ns, version, ingested_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)', (name, scan_type) + values).lastrowid
+            else:
+                scan_id = row[0]
+                self._conn.execute('UPDATE scans SET path = ?, size = ?, mtime_ns = ?, version = ?, ingested_at = ? '
+                                   'WHERE id = ?', values + (scan_id,))
+                self._conn.execute(f"DELETE FROM {table} WHERE scan_id = ?", (scan_id,))
+            metrics = {key: _plain(value) for key, value in metrics.items()}
+            cols = [self._column_for(scan_type, key, value) for key, value in metrics.items()]
+            placeholders = ', '.join('?' * (len(cols) + 1))
+            self._conn.execute(f"INSERT INTO {table} (scan_id{''.join(', ' + c for c in cols)}) "
+                               f"VALUES ({placeholders})", [scan_id] + [_stored(v) for v in metrics.values()])
+
+    def _is_current(self, row, path: Optional[str] = None) -> bool:
+        """True if a scans row still describes its file (or the file at path)."""
+        _, stored_path, size, mtime_ns, version = row
+        if path is None:
+            path = stored_path
+        elif path != stored_path:
+            return False
+        if version != self.owner.METRICS_VERSION:
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return st.st_size == size and st.st_mtime_ns == mtime_ns
+
+    def _rows(self, scan_type: str, names: List[str]) -> Dict[str, Tuple]:
+        rows = {}
+        for start in range(0, len(names), QUERY_CHUNK):
+            chunk = names[start:start + QUERY_CHUNK]
+            query = (f"SELECT name, id, path, size, mtime_ns, version FROM scans "
+                     f"WHERE type = ? AND name IN ({', '.join('?' * len(chunk))})")
+            for name, *row in self._conn.execute(query, [scan_type] + chunk):
+                rows[name] = tuple(row)
+        return rows
+
+    def update(self, scans: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+        """Make sure every (name, type) is catalogued and current.
+
+        Only new or changed outputs are loaded; the rest cost one stat.
+        Returns the errors for scans that could not be found or loaded.
+        """
+        by_type: Dict[str, List[str]] = {}
+        for name, scan_type in scans:
+            by_type.setdefault(scan_type, []).append(name)
+        errors = {}
+        for scan_type, names in by_type.items():
+            if not _TYPE_RE.fullmatch(scan_type):
+                errors.update({(name, scan_type): f"Invalid scan type '{scan_type}'" for name in names})
+                continue
+            rows = self._rows(scan_type, names)
+            for name in names:
+                row = rows.get(name)
+                if row is not None and self._is_current(row):
+                    continue
+                try:
+                    self.ingest(name, scan_type, self.owner.find_json_file(name, scan_type))
+                except Exception as e:
+                    errors[(name, scan_type)] = str(e)
+        return errors
+
+    def refresh(self, output_dir) -> int:
+        """Catalogue every <name>.<type>.json in output_dir and forget deleted outputs.
+
+        Returns the number of outputs (re)loaded.
+        """
+        before = self.ingested
+        found: Dict[str, Dict[str, str]] = {}
+        with os.scandir(output_dir) as entries:
+            for entry in entries:
+                match = _OUTPUT_RE.fullmatch(entry.name)
+                if match and entry.is_file():
+                    found.setdefault(match['type'], {})[match['name']] = str(Path(output_dir) / entry.name)
+        for scan_type, paths in found.items():
+            rows = self._rows(scan_type, list(paths))
+            for name, path in paths.items():
+                row = rows.get(name)
+                if row is not None and self._is_current(row, path):
+                    continue
+                try:
+                    self.ingest(name, scan_type, path)
+                except Exception as e:
+                    print(f"Warning: {path}: {e}", file=sys.stderr)
+        stale = [(scan_id, path) for scan_id, path in self._conn.execute('SELECT id, path FROM scans')
+                 if not os.path.exists(path)]
+        with self._conn:
+            self._conn.executemany('DELETE FROM scans WHERE id = ?', [(scan_id,) for scan_id, _ in stale])
+        return self.ingested - before
+
+    # Query
+
+    def metrics(self, scans: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """Stored metrics of each catalogued (name, type), one query per format.
+
+        Parameters a scan does not have are left out, so each dict matches
+        what extract_key_metrics returned for it.
+        """
+        by_type: Dict[str, List[str]] = {}
+        for name, scan_type in scans:
+            by_type.setdefault(scan_type, []).append(name)
+        result = {}
+        for scan_type, names in by_type.items():
+            columns = list(self._type_columns(scan_type).items())
+            table = self._table(scan_type)
+            select = ''.join(f", t.{col}" for _, (col, _) in columns)
+            for start in range(0, len(names), QUERY_CHUNK):
+                chunk = names[start:start + QUERY_CHUNK]
+                query = (f"SELECT s.name{select} FROM scans s JOIN {table} t ON t.scan_id = s.id "
+                         f"WHERE s.type = ? AND s.name IN ({', '.join('?' * len(chunk))})")
+                for name, *values in self._conn.execute(query, [scan_type] + chunk):
+                    result[(name, scan_type)] = {
+                        key: bool(value) if kind == 'bool' else value
+                        for (key, (_, kind)), value in zip(columns, values) if value is not None
+                    }
+        return result
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM scans').fetchone()[0]
+
+def main():
+    from data_combiner import DataCombiner
+
+    arg_parser = argparse.ArgumentParser(description="Catalogue the key metrics of every converted scan")
+    arg_parser.add_argument('--db', default=DEFAULT_PATH, help="Catalog database")
+    arg_parser.add_argument('--output-dir', default='data/output', help="Directory of JSON outputs")
+    args = arg_parser.parse_args()
+
+    combiner = DataCombiner(args.db)
+    start = time.perf_counter()
+    loaded = combiner.catalog.refresh(args.output_dir)
+    print(f"{len(combiner.catalog)} scans catalogued, {loaded} loaded in {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    main()
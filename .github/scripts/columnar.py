@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Columnar Projection Tables
+Stores per-projection rows (PCJ [Data], PCP measurements) as one typed array
+per column instead of one dict per row. Columns that hold the same value in
+every row collapse to a scalar, and a schema header records each column's
+type. RowView gives the old list-of-dicts interface back for existing readers.
+"""
+import json
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+LAYOUT = 'columnar'
+SCHEMA_VERSION = 1
+TABLE_LAYOUTS = (LAYOUT, 'sidecar')  # Layouts dumps() writes one line per column array
+
+def _column_type(values: List[Any]) -> str:
+    kinds = {type(v) for v in values if v is not None}
+    if kinds == {int}:
+        return 'int'
+    if kinds == {float}:
+        return 'float'
+    if kinds == {str}:
+        return 'str'
+    return 'mixed'
+
+def to_columnar(rows: Iterable[Dict[str, Any]], columns: Optional[List[str]] = None) -> Dict:
+    """Convert a list of row dicts into a columnar table with a schema header."""
+    rows = list(rows)
+    if columns is None:
+        columns = []
+        for row in rows:
+            for name in row:
+                if name not in columns:
+                    columns.append(name)
+    # Rows that lack a column (short lines) hold None
+    return from_columns({name: [row.get(name) for row in rows] for name in columns}, len(rows))
+
+def from_columns(data: Dict[str, List[Any]], rows: Optional[int] = None,
+                 types: Optional[Dict[str, str]] = None) -> Dict:
+    """Build a columnar table from per-column value lists.
+
+    types overrides the inferred type of a column (e.g. 'datetime' for ISO
+    timestamp strings); columns that are None in every row are left out.
+    """
+    if rows is None:
+        rows = max((len(values) for values in data.values()), default=0)
+    types = types or {}
+    schema_columns = []
+    columns = {}
+    for name, values in data.items():
+        if rows and all(v is None for v in values):
+            continue
+        column_type = types.get(name) or _column_type(values)
+        first = values[0] if values else None
+        constant = bool(values) and first is not None and all(
+            v == first and type(v) is type(first) for v in values
+        )
+        schema_columns.append({'name': name, 'type': column_type, 'constant': constant})
+        columns[name] = first if constant else list(values)
+
+    return {
+        'schema': {
+            'layout': LAYOUT,
+            'version': SCHEMA_VERSION,
+            'rows': rows,
+            'columns': schema_columns,
+        },
+        'columns': columns,
+    }
+
+def is_columnar(table: Any) -> bool:
+    """True if table is a columnar table rather than a list of rows."""
+    return isinstance(table, dict) and table.get('schema', {}).get('layout') == LAYOUT
+
+def column(table: Union[Dict, List[Dict]], name: str) -> List[Any]:
+    """One column as a list, for columnar tables and lists of rows alike."""
+    if is_columnar(table):
+        values = table['columns'][name]
+        meta = next(c for c in table['schema']['columns'] if c['name'] == name)
+        if meta['constant']:
+            return [values] * table['schema']['rows']
+        return values
+    return [row.get(name) for row in table]
+
+class RowView(Sequence):
+    """Read-only list-of-dicts view over a columnar table."""
+
+    def __init__(self, table: Dict):
+        self.table = table
+        self.length = table['schema']['rows']
+        self._columns = []
+        for meta in table['schema']['columns']:
+            values = table['columns'][meta['name']]
+            self._columns.append((meta['name'], meta['constant'], values))
+
+    def __len__(self) -> int:
+        return self.length
+
+    def _row(self, index: int) -> Dict[str, Any]:
+        row = {}
+        for name, constant, values in self._columns:
+            value = values if constant else values[index]
+            if value is not None:
+                row[name] = value
+        return row
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(*index.indices(self.length))]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("row index out of range")
+        return self._row(index)
+
+def as_rows(table: Union[Dict, List[Dict]]) -> Sequence:
+    """Rows of a table in either layout."""
+    if is_columnar(table):
+        return RowView(table)
+    return table
+
+def dumps(document: Dict, **json_options) -> str:
+    """json.dumps that keeps the document indented but writes each column array
+    on a single line, so indentation does not dominate columnar output."""
+    arrays = []
+
+    def placeholder(values):
+        arrays.append(json.dumps(values, separators=(',', ':')))
+        return f"\x00column{len(arrays) - 1}\x00"
+
+    def strip_arrays(value):
+        if isinstance(value, dict) and value.get('schema', {}).get('layout') in TABLE_LAYOUTS:
+            columns = {name: placeholder(v) if isinstance(v, list) else v
+                       for name, v in value['columns'].items()}
+            return {'schema': value['schema'], 'columns': columns}
+        if isinstance(value, dict):
+            return {k: strip_arrays(v) for k, v in value.items()}
+        return value
+
+    text = json.dumps(strip_arrays(document), **json_options)
+    for index, array in enumerate(arrays):
+        text = text.replace(f'"\\u0000column{index}\\u0000"', array, 1)
+    return text
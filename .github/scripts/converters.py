@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Converter Registry
+One in-process interface over every instrument format: raw bytes in, dict out.
+Converters are looked up by file extension, or by sniffing the content when
+the extension is missing or unknown. Used by the Raspberry Pi service and by
+the GitHub workflows, so no format needs its own interpreter per file.
+
+Usage: python converters.py <input_file> [...] [--output-dir data/output] [--columnar] [--sidecar]
+                             [--profile DIR] [--profile-rate R] [--profile-top N]
+       python converters.py --output-name <input_file> [...]
+"""
+import argparse
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import sys
+from pathlib import Path
+from typing import IO, Callable, Dict, Iterable, List, Optional
+
+import columnar
+import profiling
+import sidecar
+
+class Converter:
+    """A registered format: how to recognise it, convert it and name its output."""
+
+    def __init__(self, name: str, extensions: List[str], convert: Callable[..., Dict],
+                 sniff: Callable[[bytes], bool], output_suffix: str, version: str = '1',
+                 json_options: Optional[Dict] = None, options: Iterable[str] = (),
+                 requires: Iterable[str] = (), stream: Optional[Callable[..., object]] = None,
+                 tables: Iterable[str] = (), reader: Optional[Callable[..., Dict]] = None,
+                 modules: Iterable[str] = ()):
+        self.name = name
+        self.extensions = [ext.lower() for ext in extensions]
+        self._convert = convert
+        self._sniff = sniff
+        self.output_suffix = output_suffix
+        self.version = version
+        self.json_options = json_options or {'indent': 2}
+        self.options = frozenset(options)  # Keyword options convert() accepts
+        self.requires = tuple(requires)  # Third-party modules convert() imports
+        self._stream = stream  # stream(text_source, text_out, **options), if the format can stream
+        self.tables = tuple(tables)  # Keys of per-projection tables that can go to a binary sidecar
+        self._reader = reader  # reader(binary_source, **options) -> dict, if the format reads incrementally
+        self.modules = tuple(modules)  # Script modules whose code decides this format's output
+
+    def convert(self, data: bytes, **options) -> Dict:
+        """Convert the raw file contents to a JSON-serialisable dict.
+
+        Options this format does not support are ignored, so callers can pass
+        the same settings (e.g. columnar=True) for every file.
+        """
+        return self._convert(data, **{k: v for k, v in options.items() if k in self.options})
+
+    def write(self, source: IO[bytes], out: IO[str], **options) -> None:
+        """Convert a binary source stream and write the JSON text to out.
+
+        Formats with a streaming writer never hold the whole file or every
+        row in memory, and formats with an incremental reader only read as
+        much of the source as they need; the text is the same as
+        dumps(convert(...)).
+        """
+        options = {k: v for k, v in options.items() if k in self.options}
+        if self._reader is not None:
+            out.write(self.dumps(self._reader(source, **options)))
+            return
+        if self._stream is not None:
+            text = io.TextIOWrapper(source, encoding='utf-8', newline=None)
+            try:
+                self._stream(text, out, **options)
+            finally:
+                text.detach()
+            return
+        out.write(self.dumps(self._convert(source.read(), **options)))
+
+    def write_with_sidecar(self, source: IO[bytes], out: IO[str], sidecar_path: str, **options) -> bool:
+        """Like write(), but numeric table columns go to a binary sidecar at sidecar_path.
+
+        Falls back to write() when the format has no tables or numpy is not
+        installed. Returns True if a sidecar was written.
+        """
+        if not self.tables or not sidecar.available():
+            self.write(source, out, **options)
+            return False
+        options = {k: v for k, v in options.items() if k in self.options}
+        options['columnar'] = True
+        result = self._convert(source.read(), **options)
+        document = sidecar.write(result, self.tables, sidecar_path)
+        out.write(self.dumps(document))
+        return any(sidecar.is_sidecar(document.get(key)) for key in self.tables)
+
+    def available(self) -> bool:
+        """True if every module this format needs is installed."""
+        return all(importlib.util.find_spec(module) is not None for module in self.requires)
+
+    def fingerprint(self) -> str:
+        """Hash of the declared version, this registry's source and the source of this format's modules.
+
+        Changes whenever the output may change, so a rebuild can tell which
+        outputs are stale without anyone remembering to bump version. The
+        registry itself is always included, since its wrappers and JSON
+        options shape every format's output.
+        """
+        digest = hashlib.sha256(f"{self.name}:{self.version}".encode())
+        with open(__file__, 'rb') as f:
+            digest.update(f.read())
+        for module in self.modules:
+            spec = importlib.util.find_spec(module)
+            if spec is None or spec.origin is None:
+                raise ImportError(f"Module {module} of converter {self.name} not found")
+            with open(spec.origin, 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    def sniff(self, head: bytes) -> bool:
+        """True if the first bytes of a file look like this format."""
+        return self._sniff(head)
+
+    def output_name(self, stem: str) -> str:
+        """Output file name for an input with the given stem."""
+        return f"{stem}{self.output_suffix}"
+
+    def dumps(self, result: Dict) -> str:
+        """Serialise a result the way this format's JSON outputs are written."""
+        if 'columnar' in self.options:
+            return columnar.dumps(result, **self.json_options)
+        return json.dumps(result, **self.json_options)
+
+    def __repr__(self):
+        return f"Converter({self.name!r}, {self.extensions})"
+
+CONVERTERS: Dict[str, Converter] = {}
+SNIFF_BYTES = 512
+
+def register(converter: Converter) -> Converter:
+    """Add a converter to the registry."""
+    CONVERTERS[converter.name] = converter
+    return converter
+
+def supported_extensions(available_only: bool = False) -> List[str]:
+    """Every extension handled by a registered converter.
+
+    With available_only=True, formats whose dependencies are missing are left out.
+    """
+    return [ext for converter in CONVERTERS.values()
+            if not available_only or converter.available()
+            for ext in converter.extensions]
+
+def get_converter(file_name: Optional[str] = None, data: Optional[bytes] = None) -> Optional[Converter]:
+    """Find a converter by file extension, falling back to content sniffing."""
+    if file_name:
+        suffix = Path(file_name).suffix.lower()
+        for converter in CONVERTERS.values():
+            if suffix in converter.extensions:
+                return converter
+    if data:
+        head = bytes(data[:SNIFF_BYTES])
+        for converter in CONVERTERS.values():
+            if converter.sniff(head):
+                return converter
+    return None
+
+def convert_bytes(data: bytes, file_name: Optional[str] = None, **options):
+    """Convert raw file contents; returns (converter, dict)."""
+    converter = get_converter(file_name, data)
+    if converter is None:
+        raise ValueError(f"No converter for {file_name or 'data'}")
+    return converter, converter.convert(data, **options)
+
+def service_output_name(file_name: str, data: Optional[bytes] = None) -> str:
+    """Name of the JSON the pca_parser service writes for a source file.
+
+    Spaces become underscores and PCA keeps its <name>.json naming in the
+    repo. Any other format whose output would take that name gets
+    <name>.<format>.json instead, so it cannot overwrite the PCA output of a
+    scan with the same stem.
+    """
+    safe_name = file_name.replace(' ', '_')
+    converter = get_converter(safe_name, data)
+    if converter is None:
+        raise ValueError(f"No converter for {safe_name}")
+    stem = os.path.splitext(safe_name)[0]
+    if converter.name == 'pca':
+        return f"{stem}.json"
+    json_filename = converter.output_name(stem)
+    if json_filename == f"{stem}.json":
+        json_filename = f"{stem}.{converter.name}.json"
+    return json_filename
+
+def _decode(data: bytes, encoding: str = 'utf-8') -> str:
+    return data.decode(encoding)
+
+def _text_lines(data: bytes) -> List[str]:
+    """Lines as a text-mode file would return them (universal newlines)."""
+    return io.StringIO(_decode(data), newline=None).readlines()
+
+# Built-in formats. Imports are deferred so a missing optional dependency
+# (striprtf for RTF) only affects its own format.
+
+def _convert_pca(data: bytes, flat: bool = True) -> Dict:
+    from pca_to_json import parse_pca
+    return parse_pca(data, flat=flat)
+
+def _convert_pcj(data: bytes, columnar: bool = False) -> Dict:
+    from pcj_to_json import XRayLogParser
+    return XRayLogParser('<bytes>').parse_lines(io.StringIO(_decode(data), newline=None), columnar)
+
+def _stream_pcj(source: IO[str], out: IO[str], columnar: bool = False) -> None:
+    from pcj_to_json import stream_json
+    stream_json(source, out, columnar)
+
+def _convert_pcp(data: bytes, columnar: bool = False) -> Dict:
+    from pcp_to_json import PCPConverter
+    return PCPConverter('<bytes>').convert_lines(_text_lines(data), columnar)
+
+def _convert_pcr(data: bytes) -> Dict:
+    from pcr_to_json import PCRConverter
+    return PCRConverter().convert_bytes(data)
+
+def _convert_vgl(data: bytes) -> Dict:
+    return _read_vgl(io.BytesIO(data))
+
+def _read_vgl(source: IO[bytes]) -> Dict:
+    from vgl_to_json import VGLConverter
+    return VGLConverter().convert_stream(source)
+
+def _convert_rtf(data: bytes) -> Dict:
+    from rtf_to_json import convert_rtf
+    return convert_rtf(_decode(data))
+
+def _starts_with(*prefixes: bytes) -> Callable[[bytes], bool]:
+    def sniff(head: bytes) -> bool:
+        return head.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(prefixes)
+    return sniff
+
+register(Converter('pca', ['.pca'], _convert_pca,
+                   lambda head: _starts_with(b'[General]')(head) and b'Version-pca' in head,
+                   '.pca.json', options=['flat'], modules=['pca_to_json']))
+register(Converter('pcj', ['.pcj'], _convert_pcj, _starts_with(b'[Info]'), '.pcj.json',
+                   options=['columnar'], stream=_stream_pcj, tables=['data'],
+                   modules=['pcj_to_json', 'columnar', 'sidecar']))
+register(Converter('pcp', ['.pcp'], _convert_pcp, _starts_with(b'datos|x'), '.pcp.json',
+                   options=['columnar'], tables=['measurements'], modules=['pcp_to_json', 'columnar', 'sidecar']))
+register(Converter('pcr', ['.pcr'], _convert_pcr, _starts_with(b'[Versions]'), '.pcr.json',
+                   modules=['pcr_to_json']))
+register(Converter('vgl', ['.vgl'], _convert_vgl, _starts_with(b'\x1f\x8b'), '.vgl.json',
+                   reader=_read_vgl, modules=['vgl_to_json']))
+register(Converter('rtf', ['.rtf'], _convert_rtf, _starts_with(b'{\\rtf'), '.json',
+                   json_options={'indent': 4, 'ensure_ascii': False}, requires=['striprtf'],
+                   modules=['rtf_to_json']))
+
+def convert_path(input_path: Path, output_dir: Path, columnar: bool = False, sidecar_output: bool = False,
+                 output_name: Optional[str] = None):
+    """Convert one file into output_dir; returns (converter, output path).
+
+    The JSON is written to a temp file and renamed into place, so a failed
+    conversion never leaves a partial output behind. A sidecar left by an
+    earlier conversion that the new JSON does not point to is removed.
+    """
+    input_path = Path(input_path)
+    with open(input_path, 'rb') as source:
+        converter = get_converter(input_path.name, source.read(SNIFF_BYTES))
+        if converter is None:
+            raise ValueError(f"No converter for {input_path.name}")
+        source.seek(0)
+        output_path = Path(output_dir) / (output_name or converter.output_name(input_path.stem))
+        sidecar_path = output_path.with_name(sidecar.sidecar_name(output_path.name))
+        tmp_path = output_path.with_name(f".{output_path.name}.tmp")
+        wrote_sidecar = False
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                if sidecar_output:
+                    wrote_sidecar = converter.write_with_sidecar(source, f, str(sidecar_path), columnar=columnar)
+                else:
+                    converter.write(source, f, columnar=columnar)
+            os.replace(tmp_path, output_path)
+            if not wrote_sidecar and converter.tables and sidecar_path.exists():
+                sidecar_path.unlink()
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+    return converter, output_path
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Convert instrument files to JSON")
+    arg_parser.add_argument('inputs', nargs='+', help="Files to convert")
+    arg_parser.add_argument('--output-dir', default='data/output', help="Directory for JSON outputs")
+    arg_parser.add_argument('--columnar', action='store_true', help="Write projection tables one array per column")
+    arg_parser.add_argument('--sidecar', action='store_true',
+                            help="Write numeric projection columns to a memory-mappable .npz next to the JSON (needs numpy)")
+    arg_parser.add_argument('--output-name', action='store_true',
+                            help="Only print each input's output file name; exit 1 if a format is unsupported")
+    profiling.add_arguments(arg_parser)
+    args = arg_parser.parse_args()
+
+    if args.output_name:
+        missing = 0
+        for input_file in args.inputs:
+            converter = get_converter(input_file)
+            if converter is None:
+                print(f"No converter for {input_file}", file=sys.stderr)
+                missing += 1
+            else:
+                print(converter.output_name(Path(input_file).stem))
+        sys.exit(1 if missing else 0)
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    profiler = profiling.from_args(args, summary_interval=None)
+    failed = 0
+    for input_file in args.inputs:
+        input_path = Path(input_file)
+        try:
+            with profiler.profile(input_path.name):
+                converter, output_path = convert_path(input_path, output_dir, columnar=args.columnar,
+                                                      sidecar_output=args.sidecar)
+        except Exception as e:
+            print(f"Error converting {input_path}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        print(f"{input_path} -> {output_path} ({converter.name})")
+
+    summary_path = profiler.close()
+    if summary_path:
+        print(f"Profile summary: {summary_path}", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -2,23 +2,128 @@
 """
 Custom Data Combiner
 Combines data from multiple JSON files into a human-readable table format.
+Key metrics are kept in a persistent scan catalog (catalog.py), so each
+output is only loaded again after it changes, and loaded outputs are kept
+in an LRU cache (output_cache.py). Set DATA_COMBINER_CACHE to a directory
+to also keep decoded outputs on disk between runs. PCJ and PCP metrics
+summarise the whole projection series with NumPy, not just the last row.
 """
-import json
 import sys
 import os
 from pathlib import Path
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Any, Union
+from typing import Dict, List, Any, Optional
 from datetime import datetime
 
+from catalog import DEFAULT_PATH as DEFAULT_CATALOG, ScanCatalog
+from columnar import as_rows, column, is_columnar
+from output_cache import OutputCache
+import sidecar
+
+# Projection series summarised per format: the table, its value columns,
+# the time column (datetimes, or a count of time_unit seconds) and the
+# rotation angle column
+SERIES = {
+    'pcj': {'table': 'data', 'columns': ('XS', 'YS', 'ZS', 'XD'), 'time': 'TimeStamp', 'time_unit': 0.001,
+            'angle': 'RS'},
+    'pcp': {'table': 'measurements', 'columns': ('MeanGV', 'DevGV', 'U', 'I', 'XDShift'), 'time': 'Time',
+            'time_unit': None, 'angle': 'RotPos'},
+}
+PERCENTILES = (0, 5, 50, 95, 100)
+
+def _series(table, name: str, dtype=np.float64) -> Optional[np.ndarray]:
+    """A column as an array without its gaps, or None if it is missing or not of dtype."""
+    if is_columnar(table) and name not in table['columns']:
+        return None
+    try:
+        values = np.asarray(column(table, name), dtype=dtype)
+    except (TypeError, ValueError):
+        return None
+    values = values[~(np.isnat(values) if values.dtype.kind == 'M' else np.isnan(values))]
+    return values if values.size else None
+
+def series_statistics(table, spec: Dict) -> Dict[str, float]:
+    """Whole-series metrics of a projection table in any layout.
+
+    Each value column gets min/max/mean/std and the 5th/50th/95th
+    percentiles; the time column gives the scan duration, and the angle
+    column the mean, spread and worst deviation of the rotation step.
+    Columnar and sidecar tables are summarised without a Python step per row.
+    """
+    metrics: Dict[str, float] = {'projections': len(as_rows(table))}
+    for name in spec['columns']:
+        values = _series(table, name)
+        if values is None:
+            continue
+        low, p5, p50, p95, high = np.percentile(values, PERCENTILES)
+        metrics.update({
+            f"{name}_min": float(low),
+            f"{name}_max": float(high),
+            f"{name}_mean": float(values.mean()),
+            f"{name}_std": float(values.std()),
+            f"{name}_p5": float(p5),
+            f"{name}_p50": float(p50),
+            f"{name}_p95": float(p95),
+        })
+
+    if spec['time_unit'] is None:
+        times = _series(table, spec['time'], 'datetime64[s]')
+        if times is not None:
+            metrics['duration_s'] = float((times.max() - times.min()) / np.timedelta64(1, 's'))
+    else:
+        times = _series(table, spec['time'])
+        if times is not None:
+            metrics['duration_s'] = float((times.max() - times.min()) * spec['time_unit'])
+
+    angles = _series(table, spec['angle'])
+    if angles is not None and angles.size > 1:
+        steps = np.diff(angles)
+        name = spec['angle']
+        metrics.update({
+            f"{name}_step_mean": float(steps.mean()),
+            f"{name}_step_std": float(steps.std()),
+            f"{name}_step_max_dev": float(np.abs(steps - np.median(steps)).max()),
+        })
+    return metrics
+
+def format_cell(value: Any, as_float: bool = False) -> str:
+    """Table text for a metric: floats to two decimals, missing values as N/A."""
+    if value is None:
+        return 'N/A'
+    if isinstance(value, float) or as_float:
+        return 'N/A' if value != value else f"{value:.2f}"
+    return str(value)
+
+def format_row(metrics: Dict[str, Any], columns: List[str]) -> List[str]:
+    """Cells of one scan's row.
+
+    Matches the table pandas used to build: a scan whose metrics are all
+    numbers became a float column when it had a float or a gap, so its
+    integers were shown with two decimals too.
+    """
+    values = metrics.values()
+    as_float = bool(metrics) and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values) \
+        and (len(metrics) < len(columns) or any(isinstance(v, float) for v in values))
+    return [format_cell(metrics.get(col), as_float) for col in columns]
+
 class DataCombiner:
-    def __init__(self):
+    METRICS_VERSION = 2  # Bump when extract_key_metrics changes, so catalogued scans are re-read
+
+    def __init__(self, catalog_path: str = DEFAULT_CATALOG, cache_entries: int = 64,
+                 cache_bytes: int = 256 << 20, cache_dir: Optional[str] = None):
         self.data: Dict[str, Any] = {}
+        self.catalog = ScanCatalog(catalog_path, self)
+        self.cache = OutputCache(cache_entries, cache_bytes, cache_dir)
         
     def load_json_file(self, file_path: Path) -> Dict:
-        """Load a JSON file and return its contents."""
-        with open(file_path, 'r') as f:
-            return json.load(f)
+        """Load a JSON file and return its contents, mapping any binary sidecar tables.
+
+        Results are cached until the file changes and are shared, so callers
+        must not modify them.
+        """
+        directory = str(Path(file_path).parent)
+        return self.cache.load(file_path, lambda document: sidecar.resolve(document, directory))
 
     def find_json_file(self, base_name: str, file_type: str) -> Path:
         """Find the correct JSON file based on the base name and type."""
@@ -49,17 +154,21 @@ class DataCombiner:
             
         elif file_type == 'pcj':
             if 'info' in data:
-                metrics = data['info']
-            if 'data' in data and data['data']:
-                last_data = data['data'][-1]
+                metrics = dict(data['info'])
+            rows = as_rows(data.get('data') or [])
+            if rows:
+                last_data = rows[-1]
                 metrics.update({f"last_{k}": v for k, v in last_data.items()})
+                metrics.update(series_statistics(data['data'], SERIES['pcj']))
             
         elif file_type == 'pcp':
             if 'metadata' in data:
-                metrics = data['metadata']
-            if 'measurements' in data and data['measurements']:
-                last_measurement = data['measurements'][-1]
+                metrics = dict(data['metadata'])
+            rows = as_rows(data.get('measurements') or [])
+            if rows:
+                last_measurement = rows[-1]
                 metrics.update({f"last_{k}": v for k, v in last_measurement.items()})
+                metrics.update(series_statistics(data['measurements'], SERIES['pcp']))
                 
         elif file_type == 'pcr':
             for section, content in data.items():
@@ -70,9 +179,10 @@ class DataCombiner:
                     
         elif file_type == 'vgl':
             if 'metadata' in data:
-                metrics = data['metadata']
+                metrics = dict(data['metadata'])
             if 'header' in data:
                 metrics.update(data['header'])
+            metrics.update(data.get('scan_info') or {})
                 
         return metrics
 
@@ -81,9 +191,7 @@ class DataCombiner:
         Combine data from multiple files into a DataFrame.
         Returns the DataFrame and list of processed files.
         """
-        combined_data = {}
-        processed_files = []
-        
+        scans = []
         with open(input_file, 'r') as f:
             for line in f:
                 line = line.strip()
@@ -92,30 +200,31 @@ class DataCombiner:
                     
                 # Split on pipe character
                 file_spec, file_type = line.split('|')
-                
-                try:
-                    # Try to find the correct JSON file
-                    json_file = self.find_json_file(file_spec, file_type)
-                    processed_files.append(f"{file_spec}.{file_type}")
-                    
-                    # Load and process the data
-                    json_data = self.load_json_file(json_file)
-                    metrics = self.extract_key_metrics(json_data, file_type)
-                    
-                    # Add to combined data
-                    combined_data[f"{file_spec} ({file_type})"] = metrics
-                    
-                except Exception as e:
-                    print(f"Warning: {str(e)}")
-                    continue
-        
-        # Convert to DataFrame
-        df = pd.DataFrame(combined_data).transpose()
-        
-        # Clean up the DataFrame
-        df = df.fillna('N/A')
-        for col in df.columns:
-            df[col] = df[col].apply(lambda x: f"{x:.2f}" if isinstance(x, float) else str(x))
+                scans.append((file_spec, file_type))
+
+        # Only new or changed outputs are loaded; the rest come from the catalog
+        errors = self.catalog.update(scans)
+        stored = self.catalog.metrics(scan for scan in scans if scan not in errors)
+
+        labels = []
+        rows = []
+        columns: Dict[str, None] = {}  # Ordered union of every scan's metric names
+        processed_files = []
+        for file_spec, file_type in scans:
+            if (file_spec, file_type) in errors:
+                print(f"Warning: {errors[(file_spec, file_type)]}")
+                continue
+            label = f"{file_spec} ({file_type})"
+            if label in labels:
+                continue
+            metrics = stored.get((file_spec, file_type), {})
+            processed_files.append(f"{file_spec}.{file_type}")
+            labels.append(label)
+            rows.append(metrics)
+            columns.update(dict.fromkeys(metrics))
+
+        columns = list(columns)
+        df = pd.DataFrame([format_row(metrics, columns) for metrics in rows], index=labels, columns=columns)
         
         return df, processed_files
 
@@ -152,7 +261,7 @@ def main():
     output_dir = Path(sys.argv[1])
     input_file = Path(sys.argv[2])
     
-    combiner = DataCombiner()
+    combiner = DataCombiner(cache_dir=os.environ.get('DATA_COMBINER_CACHE'))
     df, processed_files = combiner.combine_data(input_file)
     markdown_table = combiner.generate_markdown_table(df)
     combiner.save_output(markdown_table, output_dir, processed_files)
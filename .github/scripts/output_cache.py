@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Output Cache
+A bounded LRU cache of parsed JSON outputs, keyed by path, size and mtime so
+an edited file is never served stale. Entries are evicted once there are
+more than max_entries of them or their JSON text adds up to more than
+max_bytes. An optional directory keeps a marshal copy of each parsed
+document, so a later process skips JSON decoding for files it has seen.
+
+Cached documents are shared between callers and must not be modified.
+"""
+import collections
+import hashlib
+import json
+import marshal
+import os
+import sys
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Marshal data is only readable by the Python version that wrote it
+_DISK_TAG = f"{sys.implementation.cache_tag}-m{marshal.version}".encode()
+
+class OutputCache:
+    """LRU cache of parsed JSON files with a memory cap and hit/miss/eviction counts."""
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 256 << 20, cache_dir: Optional[str] = None):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self._entries: 'collections.OrderedDict[str, Tuple[int, int, Any]]' = collections.OrderedDict()
+        self.bytes = 0  # JSON text size of the cached entries
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+    def load(self, path, finish: Optional[Callable[[Any], Any]] = None) -> Any:
+        """Parsed contents of the JSON file at path, from the cache when it is unchanged.
+
+        finish, if given, maps the decoded JSON to what is kept in memory
+        (e.g. resolving sidecar tables); the disk layer keeps the plain JSON.
+        """
+        key = os.path.abspath(path)
+        st = os.stat(key)
+        entry = self._entries.get(key)
+        if entry is not None and entry[:2] == (st.st_size, st.st_mtime_ns):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        if entry is not None:
+            self._drop(key)
+
+        document = self._load_disk(key, st)
+        if document is None:
+            with open(key, 'r') as f:
+                document = json.load(f)
+            self._store_disk(key, st, document)
+        else:
+            self.disk_hits += 1
+        if finish is not None:
+            document = finish(document)
+
+        if st.st_size <= self.max_bytes:
+            self._entries[key] = (st.st_size, st.st_mtime_ns, document)
+            self.bytes += st.st_size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return document
+
+    def _drop(self, key: str) -> None:
+        size, _, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'disk_hits': self.disk_hits,
+            'evictions': self.evictions,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Disk layer
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{hashlib.sha256(key.encode()).hexdigest()}.marshal")
+
+    def _disk_header(self, st: os.stat_result) -> bytes:
+        return _DISK_TAG + f":{st.st_size}:{st.st_mtime_ns}\n".encode()
+
+    def _load_disk(self, key: str, st: os.stat_result) -> Any:
+        """The marshalled document for this version of the file, or None."""
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                if f.readline() != self._disk_header(st):
+                    return None
+                return marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+    def _store_disk(self, key: str, st: os.stat_result, document: Any) -> None:
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(self._disk_header(st))
+                marshal.dump(document, f)
+            os.replace(tmp_path, path)
+        except (OSError, ValueError):
+            # A cache that cannot be written only costs speed
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
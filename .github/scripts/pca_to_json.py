@@ -1,32 +1,87 @@
 #!/usr/bin/env python3
+"""
+PCA to JSON Converter
+Single-pass reader for phoenix datos|x PCA scan parameter files, shared by
+the Raspberry Pi service (nested sections) and the GitHub workflows (flat).
+"""
 import sys
 import json
+import re
 from pathlib import Path
+from typing import Dict, Union
+
+PCAValue = Union[str, int, float]
+
+# One regex walks the whole file: a [Section] header or a key=value line
+_LINE_RE = re.compile(
+    r'^[ \t]*(?:\[(?P<section>[^\]\r\n]*)\]|(?P<key>[^=\r\n]*?)[ \t]*=[ \t]*(?P<value>[^\r\n]*?))[ \t]*\r?$',
+    re.MULTILINE
+)
+_INT_RE = re.compile(r'[+-]?\d+')
+_FLOAT_RE = re.compile(r'[+-]?(?:\d+\.\d*|\.\d+)(?:[eE][+-]?\d+)?')
+
+def convert_value(value: str) -> PCAValue:
+    """Convert a PCA value: float if it has a decimal point, else int, else str.
+
+    Plain ASCII values are classified by regex so text fields do not pay for
+    a raised ValueError; anything unusual falls back to float()/int().
+    """
+    if '.' in value:
+        if value.endswith('.tif'):
+            return value
+        if _FLOAT_RE.fullmatch(value):
+            return float(value)
+        if value.isascii() and '_' not in value:
+            return value
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    if _INT_RE.fullmatch(value):
+        return int(value)
+    if value.isascii() and '_' not in value:
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+def parse_pca(data: Union[str, bytes], flat: bool = False) -> Dict:
+    """Parse PCA text or bytes in one pass.
+
+    Returns {section: {key: value}} by default. With flat=True all keys are
+    merged into one dict, later sections overriding earlier ones.
+    """
+    if isinstance(data, (bytes, bytearray)):
+        try:
+            data = data.decode('utf-8')
+        except UnicodeDecodeError:
+            data = data.decode('latin-1')
+
+    result: Dict = {}
+    section = None
+    for match in _LINE_RE.finditer(data):
+        name = match.group('section')
+        if name is not None:
+            if not flat:
+                section = result.setdefault(name, {})
+            continue
+        key = match.group('key')
+        if not key or key[0] in ';#':
+            continue
+        value = convert_value(match.group('value'))
+        if flat:
+            result[key] = value
+        elif section is None:
+            raise ValueError(f"PCA value '{key}' appears before the first [Section] header")
+        else:
+            section[key] = value
+    return result
 
 def parse_pca_file(file_path: str) -> dict:
-    """Parse PCA file and return data as dictionary."""
-    data_dict = {}
-    
-    with open(file_path, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if not line or "=" not in line:
-                continue
-                
-            key, value = line.split("=", 1)
-            key = key.strip()
-            value = value.strip()
-            
-            # Try to convert numeric values
-            try:
-                if "." in value:
-                    data_dict[key] = float(value)
-                else:
-                    data_dict[key] = int(value)
-            except ValueError:
-                data_dict[key] = value
-                
-    return data_dict
+    """Parse PCA file and return data as a flat dictionary."""
+    with open(file_path, 'rb') as f:
+        return parse_pca(f.read(), flat=True)
 
 def main():
     if len(sys.argv) != 2:
@@ -1,8 +1,21 @@
 #!/usr/bin/env python3
 import json
 import sys
+import tempfile
 from pathlib import Path
-from typing import Dict, List, Union
+from typing import Any, Dict, IO, Iterable, Iterator, List, Tuple, Union
+
+from columnar import LAYOUT, SCHEMA_VERSION, to_columnar
+
+_ROW_INDENT = '\n      '
+
+def _json_scalar(value: Union[str, int, float]) -> str:
+    """A row value as json.dumps writes it, without the per-call encoder setup."""
+    if type(value) is int:
+        return int.__repr__(value)
+    if type(value) is float and value == value and value not in (float('inf'), float('-inf')):
+        return float.__repr__(value)
+    return json.dumps(value)
 
 class XRayLogParser:
     def __init__(self, file_path: str):
@@ -11,25 +24,30 @@ class XRayLogParser:
         self.data_section: List[Dict[str, Union[str, int, float]]] = []
         self.column_names: List[str] = []
 
-    def parse_info_section(self, lines: List[str]) -> None:
+    def parse_info_line(self, line: str) -> None:
+        key, value = line.strip().split('=', 1)
+        try:
+            if '.' in value:
+                self.info_section[key] = float(value)
+            else:
+                self.info_section[key] = int(value)
+        except ValueError:
+            self.info_section[key] = value
+
+    def parse_info_section(self, lines: Iterable[str]) -> None:
         for line in lines:
             if line.startswith('[Info]'):
                 continue
             if line.startswith('[Data]'):
                 break
             if '=' in line:
-                key, value = line.strip().split('=')
-                try:
-                    if '.' in value:
-                        self.info_section[key] = float(value)
-                    else:
-                        self.info_section[key] = int(value)
-                except ValueError:
-                    self.info_section[key] = value
+                self.parse_info_line(line)
 
     def parse_column_names(self, header_line: str) -> None:
+        # Columns are separated by one or two tabs; drop the empty names so
+        # every value lines up with its column
         header = header_line.lstrip(';').strip()
-        self.column_names = [col.strip() for col in header.split('\t')]
+        self.column_names = [col.strip() for col in header.split('\t') if col.strip()]
 
     def parse_data_line(self, line: str) -> Dict[str, Union[float, int]]:
         values = line.strip().split('\t')
@@ -44,40 +62,190 @@ class XRayLogParser:
                 data_point[col_name] = value
         return data_point
 
-    def parse_file(self) -> Dict[str, Union[Dict, List]]:
-        with open(self.file_path, 'r') as file:
-            lines = file.readlines()
-
-        self.parse_info_section(lines)
+    def iter_events(self, lines: Iterable[str]) -> Iterator[Tuple[str, Any]]:
+        """Read PCJ lines in one pass.
 
-        data_section_start = False
+        Yields ('info', dict) once the [Info] block is complete, then
+        ('row', dict) for each projection. Only the current line is held,
+        so memory does not grow with the number of projections.
+        """
+        in_data = False
         for line in lines:
-            if line.startswith('[Data]'):
-                data_section_start = True
+            if not in_data:
+                if line.startswith('[Data]'):
+                    in_data = True
+                    yield 'info', self.info_section
+                elif not line.startswith('[Info]') and '=' in line:
+                    self.parse_info_line(line)
                 continue
-            if data_section_start:
-                if line.startswith(';'):
-                    self.parse_column_names(line)
-                elif line.strip():
-                    data_point = self.parse_data_line(line)
-                    self.data_section.append(data_point)
+            if line.startswith(';'):
+                self.parse_column_names(line)
+            elif line.strip():
+                yield 'row', self.parse_data_line(line)
+        if not in_data:
+            yield 'info', self.info_section
+
+    def parse_file(self, columnar: bool = False) -> Dict[str, Union[Dict, List]]:
+        with open(self.file_path, 'r') as file:
+            return self.parse_lines(file, columnar)
+
+    def parse_lines(self, lines: Iterable[str], columnar: bool = False) -> Dict[str, Union[Dict, List]]:
+        for kind, value in self.iter_events(lines):
+            if kind == 'row':
+                self.data_section.append(value)
 
         return {
             'info': self.info_section,
-            'data': self.data_section
+            'data': to_columnar(self.data_section) if columnar else self.data_section
+        }
+
+    def write_json_stream(self, lines: Iterable[str], out: IO[str]) -> int:
+        """Convert lines straight to JSON text on out, one row at a time.
+
+        Produces the same text as json.dump(self.parse_lines(lines), out, indent=2)
+        while keeping peak memory constant. Returns the number of rows written.
+        """
+        rows = 0
+        keys: Dict[str, str] = {}
+        for kind, value in self.iter_events(lines):
+            if kind == 'info':
+                info = json.dumps(value, indent=2).replace('\n', '\n  ')
+                out.write('{\n  "info": ' + info + ',\n  "data": [')
+                continue
+            out.write(',\n    ' if rows else '\n    ')
+            if value:
+                fields = []
+                for key, item in value.items():
+                    if key not in keys:
+                        keys[key] = _ROW_INDENT + json.dumps(key) + ': '
+                    fields.append(keys[key] + _json_scalar(item))
+                out.write('{' + ','.join(fields) + '\n    }')
+            else:
+                out.write('{}')
+            rows += 1
+        out.write('\n  ]\n}' if rows else ']\n}')
+        return rows
+
+    def save_json(self, output_path: str, columnar: bool = False) -> None:
+        with open(self.file_path, 'r') as file, open(output_path, 'w') as f:
+            if columnar:
+                # One line per column array, as converters.py --columnar writes it
+                write_columnar_stream(self, file, f)
+            else:
+                self.write_json_stream(file, f)
+
+class _SpilledColumn:
+    """One column of a streamed columnar table, written to a temp file as it grows."""
+
+    def __init__(self, name: str, rows_before: int):
+        self.name = name
+        self.file = tempfile.TemporaryFile('w+')
+        self.count = 0
+        self.first: Any = None
+        self.constant = True
+        self.kinds = set()
+        for _ in range(rows_before):
+            self.append(None)
+
+    def append(self, value: Any) -> None:
+        if self.count == 0:
+            self.first = value
+            self.constant = value is not None
+        elif self.constant and not (value == self.first and type(value) is type(self.first)):
+            self.constant = False
+        if value is not None:
+            self.kinds.add(type(value))
+        self.file.write((',' if self.count else '') + ('null' if value is None else _json_scalar(value)))
+        self.count += 1
+
+    def column_type(self) -> str:
+        for kind, name in ((int, 'int'), (float, 'float'), (str, 'str')):
+            if self.kinds == {kind}:
+                return name
+        return 'mixed'
+
+    def copy_to(self, out: IO[str]) -> None:
+        self.file.seek(0)
+        out.write('[')
+        while True:
+            chunk = self.file.read(1 << 16)
+            if not chunk:
+                break
+            out.write(chunk)
+        out.write(']')
+
+def write_columnar_stream(parser: XRayLogParser, lines: Iterable[str], out: IO[str]) -> int:
+    """Columnar counterpart of XRayLogParser.write_json_stream.
+
+    Each column is spilled to a temp file while the rows stream past, so
+    memory stays flat however many projections there are. The text equals
+    columnar.dumps(parser.parse_lines(lines, columnar=True), indent=2).
+    Returns the number of rows written.
+    """
+    columns: Dict[str, _SpilledColumn] = {}
+    rows = 0
+    try:
+        for kind, value in parser.iter_events(lines):
+            if kind != 'row':
+                continue
+            for name, item in value.items():
+                if name not in columns:
+                    columns[name] = _SpilledColumn(name, rows)
+                columns[name].append(item)
+            rows += 1
+            for column in columns.values():
+                if column.count < rows:
+                    column.append(None)
+
+        placeholders = {}
+        data = {}
+        for name, column in columns.items():
+            if column.constant:
+                data[name] = column.first
+            else:
+                placeholders[name] = f"\x00column{len(placeholders)}\x00"
+                data[name] = placeholders[name]
+        document = {
+            'info': parser.info_section,
+            'data': {
+                'schema': {
+                    'layout': LAYOUT,
+                    'version': SCHEMA_VERSION,
+                    'rows': rows,
+                    'columns': [{'name': name, 'type': column.column_type(), 'constant': column.constant}
+                                for name, column in columns.items()],
+                },
+                'columns': data,
+            },
         }
+        text = json.dumps(document, indent=2)
+        for name, placeholder in placeholders.items():
+            before, text = text.split(json.dumps(placeholder), 1)
+            out.write(before)
+            columns[name].copy_to(out)
+        out.write(text)
+    finally:
+        for column in columns.values():
+            column.file.close()
+    return rows
 
-    def save_json(self, output_path: str) -> None:
-        parsed_data = self.parse_file()
-        with open(output_path, 'w') as f:
-            json.dump(parsed_data, f, indent=2)
+def stream_json(source: IO[str], out: IO[str], columnar: bool = False) -> int:
+    """Convert PCJ text from source to JSON on out without holding the rows in memory."""
+    parser = XRayLogParser(getattr(source, 'name', '<stream>'))
+    if columnar:
+        return write_columnar_stream(parser, source, out)
+    return parser.write_json_stream(source, out)
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python pcj_to_json.py <pcj_file>")
+    args = sys.argv[1:]
+    columnar = '--columnar' in args
+    if columnar:
+        args.remove('--columnar')
+    if len(args) != 1:
+        print("Usage: python pcj_to_json.py <pcj_file> [--columnar]")
         sys.exit(1)
 
-    input_file = sys.argv[1]
+    input_file = args[0]
     input_path = Path(input_file)
     # Include original extension in output filename
     output_path = Path('data/output') / f"{input_path.stem}.pcj.json"
@@ -87,7 +255,7 @@ def main():
 
     # Process the file
     parser = XRayLogParser(input_file)
-    parser.save_json(str(output_path))
+    parser.save_json(str(output_path), columnar)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+PCP Stability Monitor
+Watches the per-projection tube and detector readings of a PCP file as its
+rows are read: a CUSUM on the tube current (I) and voltage (U) catches slow
+drift, and an EWMA of the row-to-row change of MeanGV and XDShift catches
+grey-value jumps and detector shift spikes. State per channel is a handful
+of numbers and at most MAX_EVENTS events are kept, so a scan of any length
+is checked in O(rows) time and O(1) memory with no third-party modules.
+
+Usage: python pcp_monitor.py <pcp_file>
+"""
+import json
+import math
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+WARMUP_ROWS = 20  # Rows that set each channel's baseline before anything is flagged
+MAX_EVENTS = 50
+MERGE_GAP = 5  # Flagged rows this close together are one event
+
+# Channel -> (check, resolution). resolution is the smallest change that
+# counts (one unit of the instrument's readout), so a channel that is
+# perfectly flat during warm-up does not flag every rounding step.
+CHANNELS = {
+    'I': ('drift', 1.0),
+    'U': ('drift', 1.0),
+    'MeanGV': ('jump', 1.0),
+    'XDShift': ('spike', 1.0),
+}
+
+class RunningStats:
+    """Welford mean/variance with min and max."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / self.count) if self.count else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        return {'min': self.min, 'max': self.max, 'mean': self.mean, 'std': self.std}
+
+class DriftDetector:
+    """Two-sided CUSUM of a channel's deviation from its warm-up baseline.
+
+    Deviations are measured in baseline standard deviations (at least the
+    channel's resolution); k is the slack per row and h the alarm level.
+    Every row while a sum is above h is flagged, so a lasting shift is one
+    run of flagged rows that ends once the channel is back at its baseline.
+    """
+
+    def __init__(self, resolution: float, k: float = 1.0, h: float = 10.0):
+        self.resolution = resolution
+        self.k = k
+        self.h = h
+        self.baseline = RunningStats()
+        self.high = 0.0
+        self.low = 0.0
+
+    def update(self, value: float) -> Optional[float]:
+        """Feed one value; returns the signed deviation score on an alarm."""
+        if self.baseline.count < WARMUP_ROWS:
+            self.baseline.add(value)
+            return None
+        z = (value - self.baseline.mean) / max(self.baseline.std, self.resolution)
+        self.high = max(0.0, self.high + z - self.k)
+        self.low = max(0.0, self.low - z - self.k)
+        if self.high > self.h:
+            return self.high
+        if self.low > self.h:
+            return -self.low
+        return None
+
+class JumpDetector:
+    """Flags a row whose change from the previous row is threshold times the usual change.
+
+    The usual change is an EWMA of absolute row-to-row differences; flagged
+    differences are left out of it so one spike does not hide the next.
+    """
+
+    def __init__(self, resolution: float, threshold: float = 8.0, alpha: float = 0.05):
+        self.resolution = resolution
+        self.threshold = threshold
+        self.alpha = alpha
+        self.previous: Optional[float] = None
+        self.typical = 0.0
+        self.seen = 0
+
+    def update(self, value: float) -> Optional[float]:
+        """Feed one value; returns the change in units of the usual change when flagged."""
+        previous, self.previous = self.previous, value
+        if previous is None:
+            return None
+        change = abs(value - previous)
+        self.seen += 1
+        if self.seen <= WARMUP_ROWS:
+            # Plain mean of the warm-up differences seeds the EWMA
+            self.typical += (change - self.typical) / self.seen
+            return None
+        score = change / max(self.typical, self.resolution)
+        if score > self.threshold:
+            return score if value > previous else -score
+        self.typical += self.alpha * (change - self.typical)
+        return None
+
+class PCPMonitor:
+    """Feeds PCP lines through one detector per channel and keeps a compact summary."""
+
+    def __init__(self, channels: Optional[Dict[str, tuple]] = None):
+        self.channels = dict(CHANNELS if channels is None else channels)
+        self.columns: Optional[Dict[str, int]] = None  # Channel -> index in a row
+        self.rows = 0
+        self.stats = {name: RunningStats() for name in self.channels}
+        self.detectors = {}
+        for name, (check, resolution) in self.channels.items():
+            self.detectors[name] = DriftDetector(resolution) if check == 'drift' else JumpDetector(resolution)
+        self.events: List[Dict[str, Any]] = []
+        self.counts: Dict[str, int] = {}
+        self.truncated = False
+        self._open: Dict[str, Dict[str, Any]] = {}  # Channel -> its event still being extended
+
+    def feed_line(self, line: str) -> None:
+        """Consume one line of a PCP file: the column header or a measurement row."""
+        line = line.strip()
+        if not line or '|' in line:
+            return
+        if line.startswith('ImgNr'):
+            header = line.split('\t')
+            self.columns = {name: header.index(name) for name in self.channels if name in header}
+            return
+        values = line.split('\t')
+        if self.columns is None or not values[0].isdigit():
+            return
+        self.rows += 1
+        image = int(values[0])
+        for name, index in self.columns.items():
+            try:
+                value = float(values[index])
+            except (IndexError, ValueError):
+                continue
+            self.stats[name].add(value)
+            score = self.detectors[name].update(value)
+            if score is not None:
+                self._flag(name, image, value, score)
+
+    def feed(self, lines: Iterable[str]) -> 'PCPMonitor':
+        for line in lines:
+            self.feed_line(line)
+        return self
+
+    def _flag(self, name: str, image: int, value: float, score: float) -> None:
+        kind = self.channels[name][0]
+        event = self._open.get(name)
+        if event is not None and image - event['last'] <= MERGE_GAP:
+            event['last'] = image
+            event['rows'] += 1
+            if abs(score) > abs(event['score']):
+                event['score'] = round(score, 2)
+                event['value'] = value
+            return
+        self.counts[f"{name}_{kind}"] = self.counts.get(f"{name}_{kind}", 0) + 1
+        if len(self.events) >= MAX_EVENTS:
+            self.truncated = True
+            self._open.pop(name, None)
+            return
+        event = {'channel': name, 'kind': kind, 'first': image, 'last': image, 'rows': 1,
+                 'value': value, 'score': round(score, 2)}
+        self.events.append(event)
+        self._open[name] = event
+
+    def summary(self) -> Dict[str, Any]:
+        """The per-scan anomaly summary."""
+        return {
+            'rows': self.rows,
+            'status': 'anomalies' if self.counts else 'ok',
+            'counts': dict(sorted(self.counts.items())),
+            'events': self.events,
+            'truncated': self.truncated,
+            'channels': {name: stats.summary() for name, stats in self.stats.items() if stats.count},
+        }
+
+def monitor_file(path) -> Dict[str, Any]:
+    """Anomaly summary of a PCP file, read one line at a time."""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        summary = PCPMonitor().feed(f).summary()
+    return {'file': Path(path).name, **summary}
+
+def anomaly_name(json_filename: str) -> str:
+    """Summary file name for a PCP JSON output, e.g. scan.pcp.json -> scan.pcp-anomalies.json.
+
+    Not <name>.<type>.json, so it is never mistaken for a converted output.
+    """
+    stem = json_filename[:-len('.json')] if json_filename.endswith('.json') else json_filename
+    return f"{stem}-anomalies.json"
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python pcp_monitor.py <pcp_file>")
+        sys.exit(1)
+
+    input_path = Path(sys.argv[1])
+    if not input_path.exists():
+        print(f"Error: Input file '{input_path}' does not exist")
+        sys.exit(1)
+
+    output_path = Path('data/output') / anomaly_name(f"{input_path.stem}.pcp.json")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    summary = monitor_file(input_path)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    print(f"{input_path.name}: {summary['status']} ({', '.join(f'{k}={v}' for k, v in summary['counts'].items())})")
+
+if __name__ == "__main__":
+    main()
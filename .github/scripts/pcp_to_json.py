@@ -1,16 +1,92 @@
 #!/usr/bin/env python3
-import json
+import re
 import sys
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Union
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from columnar import dumps as dumps_columnar, from_columns
+
+PCPValue = Union[int, float, str]
+
+# Column types are inferred from this many leading rows, then each column is
+# checked in full with one regex over its tab-joined text before bulk conversion
+SAMPLE_ROWS = 32
+_INT_RE = re.compile(r'-?\d+')
+_FLOAT_RE = re.compile(r'-?(?:\d+(?:\.\d*)?|\.\d+)')
+_TIME_RE = re.compile(r'\d{4}-\d\d-\d\d \d\d:\d\d:\d\d')
+_EPOCH = datetime(1970, 1, 1)
+_COLUMN_RES = {
+    'int': re.compile(r'-?\d+(?:\t-?\d+)*'),
+    'float': re.compile(r'-?(?:\d+(?:\.\d*)?|\.\d+)(?:\t-?(?:\d+(?:\.\d*)?|\.\d+))*'),
+    'datetime': re.compile(r'\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(?:\t\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)*'),
+}
+
+def convert_cell(value: str) -> PCPValue:
+    """Convert one measurement value: int, float, ISO timestamp or the original string."""
+    if _INT_RE.fullmatch(value):
+        return int(value)
+    if _FLOAT_RE.fullmatch(value):
+        return float(value)
+    try:
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').isoformat()
+    except ValueError:
+        return value
+
+def infer_type(sample: Iterable[str]) -> str:
+    """Column type from sample values: 'int', 'float', 'datetime' or 'mixed'."""
+    sample = list(sample)
+    if not sample:
+        return 'mixed'
+    if all(_INT_RE.fullmatch(v) for v in sample):
+        return 'int'
+    if all(_FLOAT_RE.fullmatch(v) for v in sample):
+        return 'float'
+    if all(_TIME_RE.fullmatch(v) for v in sample):
+        return 'datetime'
+    return 'mixed'
+
+def parse_timestamps(values: List[str]) -> Tuple[List[str], List[float]]:
+    """Parse 'YYYY-MM-DD HH:MM:SS' values into ISO strings and epoch seconds.
+
+    Timestamps carry no zone, so epoch seconds treat them as UTC.
+    """
+    # fromisoformat validates every field; the text already has ISO layout
+    epoch = [(value - _EPOCH).total_seconds() for value in map(datetime.fromisoformat, values)]
+    return [value.replace(' ', 'T') for value in values], epoch
+
+def parse_column(values: List[Optional[str]], column_type: str) -> Tuple[str, List, Optional[List[float]]]:
+    """Convert a whole column of strings; returns (type, values, epoch seconds or None).
+
+    A column that does not fully match its inferred type falls back to
+    convert_cell per value and is reported as 'mixed'.
+    """
+    if column_type in _COLUMN_RES and None not in values and \
+            _COLUMN_RES[column_type].fullmatch('\t'.join(values)):
+        try:
+            if column_type == 'int':
+                return column_type, list(map(int, values)), None
+            if column_type == 'float':
+                return column_type, list(map(float, values)), None
+            iso, epoch = parse_timestamps(values)
+            return column_type, iso, epoch
+        except ValueError:
+            pass
+    if column_type == 'int' and None not in values and \
+            _COLUMN_RES['float'].fullmatch('\t'.join(values)):
+        # Integers in the sample, decimals further down
+        return 'float', list(map(float, values)), None
+    return 'mixed', [None if v is None else convert_cell(v) for v in values], None
 
 class PCPConverter:
     def __init__(self, file_path: str):
         """Initialize the converter with the input file path."""
         self.file_path = file_path
         self.header_info: Dict[str, str] = {}
-        self.measurements: List[Dict[str, Union[float, str]]] = []
+        self.measurements: List[Dict[str, PCPValue]] = []
+        self.column_types: Dict[str, str] = {}
+        self.timestamps: Dict[str, List[float]] = {}  # Epoch seconds per datetime column
+        self._rows: List[List[str]] = []
 
     def parse_header(self, line: str) -> None:
         """Parse header information from the file."""
@@ -23,43 +99,79 @@ class PCPConverter:
             self.header_info['columns'] = line.strip().split('\t')
 
     def parse_measurement(self, line: str) -> None:
-        """Parse a measurement line into a dictionary."""
+        """Parse a single measurement line into a dictionary."""
         values = line.strip().split('\t')
         if not values or not values[0].isdigit():
             return
-        measurement = {}
-        for column, value in zip(self.header_info['columns'], values):
-            # Convert numeric values to appropriate types
-            if value.replace('.', '').replace('-', '').isdigit():
-                measurement[column] = float(value)
-            else:
-                try:
-                    # Try to parse as datetime
-                    measurement[column] = datetime.strptime(
-                        value, '%Y-%m-%d %H:%M:%S'
-                    ).isoformat()
-                except ValueError:
-                    measurement[column] = value
-        self.measurements.append(measurement)
-
-    def convert(self) -> Dict:
+        self.measurements.append({column: convert_cell(value)
+                                  for column, value in zip(self.header_info['columns'], values)})
+
+    def parse_columns(self) -> Dict[str, List[PCPValue]]:
+        """Convert the collected measurement rows column by column.
+
+        Types are inferred once per column from the first SAMPLE_ROWS rows;
+        values missing from short rows are None.
+        """
+        rows, self._rows = self._rows, []
+        if not rows:
+            return {}
+        columns = self.header_info['columns']
+        width = len(columns)
+        if any(len(row) != width for row in rows):
+            rows = [row[:width] + [None] * (width - len(row)) for row in rows]
+
+        data = {}
+        for name, values in zip(columns, zip(*rows)):
+            values = list(values)
+            sample = [v for v in values[:SAMPLE_ROWS] if v is not None]
+            column_type, data[name], epoch = parse_column(values, infer_type(sample))
+            self.column_types[name] = column_type
+            if epoch is not None:
+                self.timestamps[name] = epoch
+        return data
+
+    def convert(self, columnar: bool = False) -> Dict:
         """Convert the PCP file to a dictionary format."""
         with open(self.file_path, 'r', encoding='utf-8') as file:
-            # Process file line by line
-            for line in file:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                if line.startswith('ImgNr') or '|' in line:
-                    self.parse_header(line)
-                else:
-                    self.parse_measurement(line)
+            return self.convert_lines(file, columnar)
+
+    def convert_lines(self, lines: Iterable[str], columnar: bool = False) -> Dict:
+        """Convert PCP lines (a file object or list of strings) to a dictionary.
+
+        With columnar=True measurements are stored one array per column.
+        """
+        # Collect header and raw rows in one pass; values are converted per column
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            
+            if line.startswith('ImgNr') or '|' in line:
+                self.parse_header(line)
+            else:
+                values = line.split('\t')
+                if values[0].isdigit():
+                    self._rows.append(values)
+
+        data = self.parse_columns()
+        if columnar:
+            types = {name: 'datetime' for name in self.timestamps}
+            measurements = from_columns(data, len(next(iter(data.values()), [])), types)
+        else:
+            names = list(data)
+            if any(None in values for values in data.values()):
+                self.measurements = [
+                    {name: value for name, value in zip(names, row) if value is not None}
+                    for row in zip(*data.values())
+                ]
+            else:
+                self.measurements = [dict(zip(names, row)) for row in zip(*data.values())]
+            measurements = self.measurements
 
         # Create the final output structure
         output = {
             'metadata': self.header_info.copy(),
-            'measurements': self.measurements
+            'measurements': measurements
         }
         
         # Remove columns from metadata as it's internal info
@@ -68,18 +180,23 @@ class PCPConverter:
             
         return output
 
-    def save_json(self, output_path: str) -> None:
+    def save_json(self, output_path: str, columnar: bool = False) -> None:
         """Convert and save the data to a JSON file."""
-        data = self.convert()
+        data = self.convert(columnar)
         with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+            # Same text as json.dump(indent=2), with column arrays kept on one line
+            f.write(dumps_columnar(data, indent=2))
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python pcp_to_json.py <pcp_file>")
+    args = sys.argv[1:]
+    columnar = '--columnar' in args
+    if columnar:
+        args.remove('--columnar')
+    if len(args) != 1:
+        print("Usage: python pcp_to_json.py <pcp_file> [--columnar]")
         sys.exit(1)
 
-    input_file = sys.argv[1]
+    input_file = args[0]
     input_path = Path(input_file)
     # Include original extension in output filename
     output_path = Path('data/output') / f"{input_path.stem}.pcp.json"
@@ -89,7 +206,7 @@ def main():
 
     # Process the file
     converter = PCPConverter(input_file)
-    converter.save_json(str(output_path))
+    converter.save_json(str(output_path), columnar)
 
 if __name__ == "__main__":
     main()
@@ -63,18 +63,21 @@ class PCRConverter:
 
     def convert_file(self, input_path: Path) -> Dict[str, Any]:
         """Convert PCR file to dictionary."""
+        with open(input_path, 'rb') as file:
+            return self.convert_bytes(file.read())
+
+    def convert_bytes(self, raw: bytes) -> Dict[str, Any]:
+        """Convert PCR file contents to dictionary."""
         self.current_section = None
         self.data = {}
         
         try:
-            with open(input_path, 'r', encoding='utf-8') as file:
-                for line in file:
-                    self.parse_line(line)
+            text = raw.decode('utf-8')
         except UnicodeDecodeError:
             # Try with a different encoding if UTF-8 fails
-            with open(input_path, 'r', encoding='latin-1') as file:
-                for line in file:
-                    self.parse_line(line)
+            text = raw.decode('latin-1')
+        for line in text.splitlines():
+            self.parse_line(line)
                     
         return self.data
 
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Profiling Mode
+cProfile wrapper for the ingest service and the converter CLIs. A sampled
+fraction of calls (one file, one git batch) is profiled; each profile is
+dumped to <dir>/<time>-<pid>-<n>-<label>.prof for pstats or snakeviz, and all
+of them are added to one aggregate whose top functions are written to
+<dir>/summary.txt (with the aggregate itself in <dir>/aggregate.prof). Only
+one call is profiled at a time and old dumps are deleted past max_dumps, so
+overhead and disk use stay bounded when it is left on in production.
+
+Switched on by --profile DIR on converters.py and bulk.py, [Profiling] dir
+in the service's config.ini, or PCA_PROFILE=DIR for any of them.
+PCA_PROFILE_RATE is the fraction of calls profiled (default 1.0) and
+PCA_PROFILE_TOP the number of functions listed in the summary (default 30).
+
+Usage: python profiling.py <dir> [--top N]
+"""
+import argparse
+import cProfile
+import collections
+import contextlib
+import io
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from types import SimpleNamespace
+from typing import Iterable, Iterator, Optional
+
+ENV_DIR = 'PCA_PROFILE'
+ENV_RATE = 'PCA_PROFILE_RATE'
+ENV_TOP = 'PCA_PROFILE_TOP'
+SUMMARY_NAME = 'summary.txt'
+AGGREGATE_NAME = 'aggregate.prof'
+
+class Profiler:
+    """Profiles a sampled fraction of calls and keeps an aggregate of them.
+
+    Without an output directory (or with rate 0) profile() does nothing, so
+    callers can wrap their hot paths unconditionally.
+    """
+
+    def __init__(self, output_dir: Optional[str] = None, rate: float = 1.0, top: int = 30,
+                 max_dumps: Optional[int] = 500, summary_interval: Optional[float] = 60.0):
+        self.output_dir = output_dir or None
+        self.rate = min(max(rate, 0.0), 1.0)
+        self.top = max(1, top)
+        self.max_dumps = max_dumps
+        self.summary_interval = summary_interval  # Seconds between summary rewrites; None: only on close()
+        self.profiled = 0
+        self.skipped = 0
+        self.errors = 0
+        self._busy = threading.Lock()  # Held while a call is being profiled
+        self._lock = threading.Lock()
+        self._stats: Optional[pstats.Stats] = None
+        self._dumps = collections.deque()
+        self._sequence = 0
+        self._last_summary = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.output_dir is not None and self.rate > 0
+
+    @contextlib.contextmanager
+    def profile(self, label: str) -> Iterator[Optional[SimpleNamespace]]:
+        """Profile the block if it is sampled.
+
+        Yields None when it is not, or a namespace whose dump attribute is the
+        profile's path once the block has finished.
+        """
+        if not self.enabled:
+            yield None
+            return
+        if random.random() >= self.rate or not self._busy.acquire(blocking=False):
+            self.skipped += 1
+            yield None
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (or debugger) owns the interpreter's hooks
+            self._busy.release()
+            self.skipped += 1
+            yield None
+            return
+        run = SimpleNamespace(label=label, dump=None)
+        try:
+            yield run
+        finally:
+            profile.disable()
+            self._busy.release()
+            run.dump = self._record(profile, label)
+
+    def _record(self, profile: cProfile.Profile, label: str) -> Optional[str]:
+        """Dump one profile, add it to the aggregate and rewrite the summary when it is due."""
+        with self._lock:
+            self._sequence += 1
+            self.profiled += 1
+            sequence = self._sequence
+        safe_label = re.sub(r'[^A-Za-z0-9_.-]+', '_', label)[:80]
+        path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{sequence:06d}-{safe_label}.prof")
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            profile.dump_stats(path)
+        except OSError:
+            self.errors += 1
+            path = None
+        with self._lock:
+            self._add(profile)
+            if path is not None:
+                self._dumps.append(path)
+                while self.max_dumps is not None and len(self._dumps) > self.max_dumps:
+                    with contextlib.suppress(OSError):
+                        os.remove(self._dumps.popleft())
+            due = self.summary_interval is not None and time.monotonic() - self._last_summary >= self.summary_interval
+        if due:
+            self.write_summary()
+        return path
+
+    def _add(self, source) -> None:
+        if self._stats is None:
+            self._stats = pstats.Stats(source, stream=io.StringIO())
+        else:
+            self._stats.add(source)
+        # pstats lists every file it read at the top of a report; over hours that list only grows
+        self._stats.files = []
+
+    def add_dumps(self, paths: Iterable[str]) -> int:
+        """Add profiles dumped by other processes to the aggregate; returns how many were read."""
+        added = 0
+        with self._lock:
+            for path in paths:
+                try:
+                    self._add(path)
+                except (OSError, EOFError, TypeError, ValueError):
+                    self.errors += 1
+                    continue
+                self.profiled += 1
+                added += 1
+        return added
+
+    def summary(self) -> str:
+        """The top functions of the aggregate by cumulative and by own time."""
+        with self._lock:
+            if self._stats is None:
+                return "No profiles recorded\n"
+            out = io.StringIO()
+            self._stats.stream = out
+            out.write(f"{self.profiled} profiled, {self.skipped} skipped (rate {self.rate:g}), "
+                      f"{self._stats.total_tt:.3f}s profiled in total\n\n")
+            out.write(f"Top {self.top} by cumulative time\n")
+            self._stats.sort_stats('cumulative').print_stats(self.top)
+            out.write(f"Top {self.top} by own time\n")
+            self._stats.sort_stats('tottime').print_stats(self.top)
+            return out.getvalue()
+
+    def write_summary(self) -> Optional[str]:
+        """Write summary.txt and aggregate.prof to the output directory; returns the summary path."""
+        if self.output_dir is None:
+            return None
+        text = self.summary()
+        summary_path = os.path.join(self.output_dir, SUMMARY_NAME)
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with self._lock:
+                self._last_summary = time.monotonic()
+                if self._stats is not None:
+                    self._stats.dump_stats(os.path.join(self.output_dir, AGGREGATE_NAME))
+            tmp_path = f"{summary_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, summary_path)
+        except OSError:
+            self.errors += 1
+            return None
+        return summary_path
+
+    def close(self) -> Optional[str]:
+        """Write the final summary if anything was profiled."""
+        if not self.enabled or not self.profiled:
+            return None
+        return self.write_summary()
+
+def from_env(output_dir: Optional[str] = None, rate: float = 1.0, top: int = 30, environ=None, **kwargs) -> Profiler:
+    """A Profiler with the given settings, overridden by PCA_PROFILE* variables that are set."""
+    environ = os.environ if environ is None else environ
+    try:
+        rate = float(environ.get(ENV_RATE, rate))
+        top = int(environ.get(ENV_TOP, top))
+    except ValueError as e:
+        raise ValueError(f"Invalid {ENV_RATE}/{ENV_TOP}: {e}")
+    return Profiler(environ.get(ENV_DIR) or output_dir, rate=rate, top=top, **kwargs)
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """--profile, --profile-rate and --profile-top, defaulting to the environment."""
+    parser.add_argument('--profile', metavar='DIR', default=os.environ.get(ENV_DIR),
+                        help=f"Write cProfile dumps and a hotspot summary to DIR (env {ENV_DIR})")
+    parser.add_argument('--profile-rate', type=float, default=float(os.environ.get(ENV_RATE, 1.0)),
+                        help=f"Fraction of files to profile (default 1.0, env {ENV_RATE})")
+    parser.add_argument('--profile-top', type=int, default=int(os.environ.get(ENV_TOP, 30)),
+                        help=f"Functions listed in the summary (default 30, env {ENV_TOP})")
+
+def from_args(args: argparse.Namespace, **kwargs) -> Profiler:
+    """The Profiler for options added by add_arguments."""
+    return Profiler(args.profile, rate=args.profile_rate, top=args.profile_top, **kwargs)
+
+def main():
+    parser = argparse.ArgumentParser(description="Rewrite a profile directory's summary from its dumps")
+    parser.add_argument('dir', help="Directory of .prof dumps")
+    parser.add_argument('--top', type=int, default=30, help="Functions listed in the summary")
+    args = parser.parse_args()
+
+    dumps = sorted(os.path.join(args.dir, name) for name in os.listdir(args.dir)
+                   if name.endswith('.prof') and name != AGGREGATE_NAME)
+    profiler = Profiler(args.dir, top=args.top)
+    if not profiler.add_dumps(dumps):
+        print(f"No profiles in {args.dir}", file=sys.stderr)
+        sys.exit(1)
+    with open(profiler.write_summary(), encoding='utf-8') as f:
+        print(f.read(), end='')
+
+if __name__ == "__main__":
+    main()
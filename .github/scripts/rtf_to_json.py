@@ -43,139 +43,169 @@ def clean_value(value):
         
     return value
 
-def parse_rtf_to_dict(rtf_content):
-    """Parse RTF content into a structured dictionary."""
-    cleaned_text = clean_rtf_content(rtf_content)
-    parsed_data = {}
-    
-    # Define sections and their fields
-    sections = [
-        ('Machine ID', r'Machine ID:\s*(.*?)(?=\n|$)'),
-        ('Machine Serial', r'Machine Serial:\s*(.*?)(?=\n|$)'),
-        ('Operator ID', r'Operator ID:\s*(.*?)(?=\n|$)'),
-        ('Date/Time', r'Date/Time:\s*(.*?)(?=\n|$)'),
-        ('Xray Source', {
-            'Name': r'Xray Source[\s\S]*?Name:\s*(.*?)(?=\n|$)',
-            'Voltage': r'Voltage:\s*(.*?)(?=\n|$)',
-            'Current': r'Current:\s*(.*?)(?=\n|$)',
-            'Focal spot size': r'Focal spot size:\s*(.*?)(?=\n|$)'
-        }),
-        ('Detector', {
-            'Name': r'Detector[\s\S]*?Name:\s*(.*?)(?=\n|$)',
-            'Pixel pitch': r'Pixel pitch:\s*(.*?)(?=\n|$)',
-            'Gain': r'Gain:\s*(.*?)(?=\n|$)',
-            'Binning': r'Binning:\s*(.*?)(?=\n|$)',
-            'Framerate': r'Framerate:\s*(.*?)(?=\n|$)',
-            'Flip': r'Flip:\s*(.*?)(?=\n|$)',
-            'Rotation': r'Rotation:\s*(.*?)(?=\n|$)',
-            'Crop': r'Crop:\s*(.*?)(?=\n|$)',
-            'ROI': r'ROI:\s*(.*?)(?=\n|$)',
-            'Defect map': r'Defect map:\s*(.*?)(?=\n|$)',
-            'Offset map': r'Offset map:\s*(.*?)(?=\n|$)',
-            'Gain map 0': r'Gain map 0:\s*(.*?)(?=\n|$)',
-            'Gain map 1': r'Gain map 1:\s*(.*?)(?=\n|$)',
-            'Gain map 2': r'Gain map 2:\s*(.*?)(?=\n|$)',
-            'Gain map 3': r'Gain map 3:\s*(.*?)(?=\n|$)',
-            'Gain map 4': r'Gain map 4:\s*(.*?)(?=\n|$)'
-        }),
-        ('Distances', {
-            'Source to detector': r'Source to detector:\s*(.*?)(?=\n|$)',
-            'Source to object': r'Source to object:\s*(.*?)(?=\n|$)',
-            'Calculated Ug': r'Calculated Ug:\s*(.*?)(?=\n|$)',
-            'Zoom factor': r'Zoom factor:\s*(.*?)(?=\n|$)',
-            'Effective pixel pitch': r'Effective pixel pitch:\s*(.*?)(?=\n|$)'
-        }),
-        ('Motion Positions', {
-            'Table rotate': r'Table rotate:\s*(.*?)(?=\n|$)',
-            'Table left/right': r'Table left/right:\s*(.*?)(?=\n|$)',
-            'Table up/down': r'Table up/down:\s*(.*?)(?=\n|$)',
-            'Detector up/down': r'Detector up/down:\s*(.*?)(?=\n|$)',
-            'Table mag': r'Table mag:\s*(.*?)(?=\n|$)',
-            'Detector mag': r'Detector mag:\s*(.*?)(?=\n|$)',
-            'Detector left/right': r'Detector left/right:\s*(.*?)(?=\n|$)'
-        }),
-        ('Setup', {
-            'Fixturing': r'Fixturing:\s*(.*?)(?=\n|$)',
-            'Filter': r'Filter:\s*(.*?)(?=\n|$)'
-        }),
-        ('CT Scan', {
-            'Project name': r'Project name:\s*(.*?)(?=\n|$)',
-            'Project folder': r'Project folder:\s*(.*?)(?=\n|$)',
-            '# Frames averaged': r'# Frames averaged:\s*(.*?)(?=\n|$)',
-            '# Skip frames': r'# Skip frames:\s*(.*?)(?=\n|$)',
-            'Monitor xray down': r'Monitor xray down:\s*(.*?)(?=\n|$)',
-            'Type': r'Type:\s*(.*?)(?=\n|$)',
-            '# Projections': r'# Projections:\s*(.*?)(?=\n|$)',
-            'Start': r'Start:\s*(.*?)(?=\n|$)',
-            'End': r'End:\s*(.*?)(?=\n|$)',
-            'Duration': r'Duration:\s*(.*?)(?=\n|$)'
-        })
-    ]
-    
-    # Process each section
-    for section_name, section_def in sections:
-        if isinstance(section_def, dict):
-            # Handle nested sections
-            section_data = {}
-            for field_name, pattern in section_def.items():
-                match = re.search(pattern, cleaned_text, re.MULTILINE | re.DOTALL)
-                if match:
-                    value = clean_value(match.group(1))
-                    if value:
-                        section_data[field_name] = value
-            if section_data:
-                parsed_data[section_name] = section_data
-        else:
-            # Handle top-level fields
-            match = re.search(section_def, cleaned_text, re.MULTILINE | re.DOTALL)
-            if match:
-                value = clean_value(match.group(1))
-                if value:
-                    parsed_data[section_name] = value
-    
-    return parsed_data
+# Report layout in output order: (section, fields). Top-level fields have no
+# section. Each field is read from the first "<field>:" in the report.
+SECTIONS = [
+    (None, ['Machine ID', 'Machine Serial', 'Operator ID', 'Date/Time']),
+    ('Xray Source', ['Name', 'Voltage', 'Current', 'Focal spot size']),
+    ('Detector', ['Name', 'Pixel pitch', 'Gain', 'Binning', 'Framerate', 'Flip', 'Rotation', 'Crop', 'ROI',
+                  'Defect map', 'Offset map', 'Gain map 0', 'Gain map 1', 'Gain map 2', 'Gain map 3',
+                  'Gain map 4']),
+    ('Distances', ['Source to detector', 'Source to object', 'Calculated Ug', 'Zoom factor',
+                   'Effective pixel pitch']),
+    ('Motion Positions', ['Table rotate', 'Table left/right', 'Table up/down', 'Detector up/down',
+                          'Table mag', 'Detector mag', 'Detector left/right']),
+    ('Setup', ['Fixturing', 'Filter']),
+    ('CT Scan', ['Project name', 'Project folder', '# Frames averaged', '# Skip frames', 'Monitor xray down',
+                 'Type', '# Projections', 'Start', 'End', 'Duration']),
+]
 
-def parse_geometric_formula(rtf_content):
-    """Parse the Geometric Unsharpness Custom Formula section."""
-    cleaned_text = clean_rtf_content(rtf_content)
-    
-    section_match = re.search(
-        r"Geometric Unsharpness Custom Formula:.*?(?=Motion Positions:|$)",
-        cleaned_text,
-        re.DOTALL
-    )
-    
-    if not section_match:
-        return {}
-    
-    section_text = section_match.group(0)
+# "Name:" is shared, so it is read from the first one after the section heading
+SCOPED_FIELD = 'Name'
+FORMULA_SECTION = 'Geometric Unsharpness Custom Formula'
+FORMULA_END = 'Motion Positions:'
+
+# Field lookup table: label -> (section, field)
+FIELDS = {field: (section, field) for section, fields in SECTIONS for field in fields if field != SCOPED_FIELD}
+# No label is a suffix of another, so one leftmost scan per line finds each label's first use
+_FIELD_RE = re.compile('(?:' + '|'.join(re.escape(label) for label in sorted(FIELDS, key=len, reverse=True)) + '):')
+_SCOPED_HEADINGS = [section for section, fields in SECTIONS if SCOPED_FIELD in fields]
+_FORMULA_RE = re.compile(r'(Name:|Expression:|Value:)')
+
+def report_lines(rtf_content):
+    """Convert the RTF once and split the plain text into lines."""
+    return clean_rtf_content(rtf_content).split('\n')
+
+def _value_after(lines, index, column):
+    """The text following a label, skipping blank space as "label:\\s*" would."""
+    rest = lines[index][column:].lstrip()
+    while not rest and index + 1 < len(lines):
+        index += 1
+        rest = lines[index].lstrip()
+    return clean_value(rest)
+
+def _between(tokens, texts, first, last):
+    """Text from after tokens[first] up to tokens[last], including any tokens in between."""
+    return texts[first] + ''.join(tokens[k] + texts[k] for k in range(first + 1, last))
+
+def parse_formulas(section_text):
+    """Split the formula section into Name/Expression/Value blocks.
+
+    The section is tokenized once on the three labels; a block's name runs
+    to the next Expression:, its expression to the next Value: and its value
+    to the next Name:.
+    """
+    parts = _FORMULA_RE.split(section_text)
+    tokens = parts[1::2]
+    texts = parts[2::2]
     formulas = {}
-    
-    formula_blocks = re.finditer(
-        r"Name:\s*(.*?)(?:\s*\[.*?\])?\s*Expression:\s*(.*?)\s*Value:\s*(.*?)(?=Name:|$)",
-        section_text,
-        re.DOTALL
-    )
-    
-    for block in formula_blocks:
-        name = block.group(1).strip()
-        name = re.sub(r'\s*\[.*?\]', '', name)
-        name = name.replace('|', '').strip()
-        
+    position = 0
+    while True:
+        try:
+            name_at = tokens.index('Name:', position)
+            expression_at = tokens.index('Expression:', name_at + 1)
+            value_at = tokens.index('Value:', expression_at + 1)
+        except ValueError:
+            break
+        position = tokens.index('Name:', value_at + 1) if 'Name:' in tokens[value_at + 1:] else len(tokens)
+
+        name = _between(tokens, texts, name_at, expression_at).strip()
+        name = re.sub(r'\s*\[.*?\]', '', name).replace('|', '').strip()
         if not name or name.startswith('\\') or name.endswith('cell'):
             continue
-            
-        expression = block.group(2).strip().replace('|', '').strip()
-        value = block.group(3).strip().replace('|', '').strip()
-        expression = expression.replace('Math.', '')
-        
+        expression = _between(tokens, texts, expression_at, value_at).strip().replace('|', '').strip()
+        value = _between(tokens, texts, value_at, position).strip().replace('|', '').strip()
         formulas[name] = {
-            'Expression': expression,
+            'Expression': expression.replace('Math.', ''),
             'Value': value
         }
-    
     return formulas
 
+def parse_report(lines):
+    """Fill every section from the report lines in one pass.
+
+    Returns (fields, formula section text): fields maps (section, field)
+    to its cleaned value.
+    """
+    found = {}
+    heading_seen = {}
+    formula_parts = None
+    formula_done = False
+    for index, line in enumerate(lines):
+        for match in _FIELD_RE.finditer(line):
+            key = FIELDS[match.group()[:-1]]
+            if key not in found:
+                found[key] = _value_after(lines, index, match.end())
+
+        for heading in _SCOPED_HEADINGS:
+            key = (heading, SCOPED_FIELD)
+            if key in found:
+                continue
+            start = 0
+            if heading not in heading_seen:
+                column = line.find(heading)
+                if column < 0:
+                    continue
+                heading_seen[heading] = index
+                start = column + len(heading)
+            column = line.find(SCOPED_FIELD + ':', start)
+            if column >= 0:
+                found[key] = _value_after(lines, index, column + len(SCOPED_FIELD) + 1)
+
+        if formula_done:
+            continue
+        if formula_parts is None:
+            column = line.find(FORMULA_SECTION + ':')
+            if column < 0:
+                continue
+            line = line[column:]
+            formula_parts = []
+            search_from = len(FORMULA_SECTION) + 1
+        else:
+            search_from = 0
+        end = line.find(FORMULA_END, search_from)
+        if end >= 0:
+            formula_parts.append(line[:end])
+            formula_done = True
+        else:
+            formula_parts.append(line)
+
+    formula_text = '\n'.join(formula_parts) if formula_parts is not None else None
+    return found, formula_text
+
+def parse_rtf_to_dict(rtf_content):
+    """Parse RTF content into a structured dictionary."""
+    return _build_sections(parse_report(report_lines(rtf_content))[0])
+
+def parse_geometric_formula(rtf_content):
+    """Parse the Geometric Unsharpness Custom Formula section."""
+    formula_text = parse_report(report_lines(rtf_content))[1]
+    return parse_formulas(formula_text) if formula_text is not None else {}
+
+def _build_sections(found):
+    parsed_data = {}
+    for section_name, fields in SECTIONS:
+        values = {field: found.get((section_name, field)) for field in fields}
+        values = {field: value for field, value in values.items() if value}
+        if section_name is None:
+            parsed_data.update(values)
+        elif values:
+            parsed_data[section_name] = values
+    return parsed_data
+
+def convert_rtf(rtf_content):
+    """Parse a technique report into the dictionary written as JSON.
+
+    The RTF is converted to text once and every section, including the
+    formulas, is filled in a single pass over its lines.
+    """
+    found, formula_text = parse_report(report_lines(rtf_content))
+    parsed_data = _build_sections(found)
+    formulas = parse_formulas(formula_text) if formula_text is not None else {}
+    if formulas:
+        parsed_data[FORMULA_SECTION] = formulas
+    return parsed_data
+
 def process_rtf_file(input_path):
     """Process RTF file and create JSON output."""
     try:
@@ -191,22 +221,7 @@ def process_rtf_file(input_path):
         with open(input_path, 'r', encoding='utf-8') as file:
             rtf_content = file.read()
         
-        # Parse main content
-        parsed_data = parse_rtf_to_dict(rtf_content)
-        
-        # Parse geometric formulas
-        formulas = parse_geometric_formula(rtf_content)
-        if formulas:
-            parsed_data['Geometric Unsharpness Custom Formula'] = formulas
-        
-        # Remove empty sections and None values
-        def clean_dict(d):
-            if not isinstance(d, dict):
-                return d
-            return {k: clean_dict(v) for k, v in d.items() 
-                   if v is not None and (not isinstance(v, dict) or v)}
-        
-        parsed_data = clean_dict(parsed_data)
+        parsed_data = convert_rtf(rtf_content)
         
         # Save parsed data
         with open(output_file, 'w', encoding='utf-8') as json_file:
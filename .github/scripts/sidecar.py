@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Binary Sidecar Tables
+Moves the numeric columns of a projection table (PCJ [Data], PCP measurements)
+out of the JSON and into an uncompressed .npz next to it. Each column is one
+contiguous typed array, so a reader can memory-map the file and get arrays
+back without allocating an object per row. The JSON keeps the table's schema,
+constant and mixed columns, and a pointer to the sidecar.
+
+numpy is optional: without it, writers fall back to plain JSON tables and
+only load_columns/resolve need it. Loading checks the sidecar against the
+sha256 and array shapes recorded in the JSON and raises ValueError if a
+truncated or stale file no longer matches.
+"""
+import hashlib
+import importlib.util
+import mmap
+import os
+import struct
+import zipfile
+from typing import Any, Dict, Iterable, Optional
+
+import columnar
+
+LAYOUT = 'sidecar'
+SCHEMA_VERSION = 1
+FORMAT = 'npz'
+
+# Columnar types that are stored as arrays, and their numpy dtypes
+_DTYPES = {'int': 'int64', 'float': 'float64', 'datetime': 'datetime64[s]', 'str': 'U'}
+
+def available() -> bool:
+    """True if numpy is installed, so sidecars can be written and read."""
+    return importlib.util.find_spec('numpy') is not None
+
+def is_sidecar(table: Any) -> bool:
+    """True if table is a sidecar pointer rather than an inline table."""
+    return isinstance(table, dict) and table.get('schema', {}).get('layout') == LAYOUT
+
+def sidecar_name(json_filename: str) -> str:
+    """Sidecar file name for a JSON output, e.g. scan.pcj.json -> scan.pcj.npz."""
+    stem = json_filename[:-len('.json')] if json_filename.endswith('.json') else json_filename
+    return f"{stem}.{FORMAT}"
+
+def file_sha256(path: str) -> str:
+    """Hex SHA-256 of a file, read in 1 MiB chunks."""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def _to_array(np, values, column_type: str):
+    """values as a typed array, or None if they do not fit the column's dtype."""
+    if column_type not in _DTYPES or any(v is None for v in values):
+        return None
+    try:
+        if column_type == 'datetime':
+            array = np.array(values, dtype=_DTYPES['datetime'])
+            # Keep the JSON text exact: sub-second or zoned timestamps stay inline
+            if not (np.datetime_as_string(array) == np.array(values)).all():
+                return None
+            return array
+        return np.array(values, dtype=_DTYPES[column_type])
+    except (ValueError, OverflowError, TypeError):
+        return None
+
+def split_table(table, member_prefix: str = ''):
+    """Split a table into a sidecar pointer and the arrays it refers to.
+
+    Returns (pointer, arrays); arrays maps npz member names to numpy arrays.
+    The pointer has no 'sidecar' entry yet, write() fills it in.
+    """
+    import numpy as np
+
+    if not columnar.is_columnar(table):
+        table = columnar.to_columnar(table)
+    schema = table['schema']
+    columns = []
+    inline = {}
+    arrays = {}
+    for meta in schema['columns']:
+        name = meta['name']
+        values = table['columns'][name]
+        array = None if meta['constant'] else _to_array(np, values, meta['type'])
+        if array is None:
+            columns.append(dict(meta))
+            inline[name] = values
+            continue
+        member = f"{member_prefix}{len(arrays)}"
+        arrays[member] = array
+        columns.append({**meta, 'dtype': array.dtype.str, 'member': member})
+    pointer = {
+        'schema': {
+            'layout': LAYOUT,
+            'version': SCHEMA_VERSION,
+            'rows': schema['rows'],
+            'columns': columns,
+        },
+        'columns': inline,
+    }
+    return pointer, arrays
+
+def write(document: Dict, tables: Iterable[str], path: str) -> Dict:
+    """Move the tables named in tables to a sidecar at path.
+
+    Returns a copy of document whose tables point at the sidecar; the
+    document is returned unchanged if none of the tables has an array column.
+    The sidecar is written to a temp file and renamed into place.
+    """
+    import numpy as np
+
+    result = dict(document)
+    pointers = {}
+    arrays = {}
+    for key in tables:
+        if key not in document:
+            continue
+        pointer, table_arrays = split_table(document[key], member_prefix=f"{key}.")
+        if table_arrays:
+            pointers[key] = pointer
+            arrays.update(table_arrays)
+    if not arrays:
+        return result
+
+    tmp_path = os.path.join(os.path.dirname(path) or '.', f".{os.path.basename(path)}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            # savez stores members uncompressed, which is what makes them mappable
+            np.savez(f, **arrays)
+        sha256 = file_sha256(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    for key, pointer in pointers.items():
+        pointer['schema']['sidecar'] = {
+            'path': os.path.basename(path),
+            'format': FORMAT,
+            'sha256': sha256,
+        }
+        result[key] = pointer
+    return result
+
+def _member_offsets(f, archive: zipfile.ZipFile) -> Dict[str, int]:
+    """Byte offset of each stored .npy member's data in the zip file."""
+    offsets = {}
+    for info in archive.infolist():
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError(f"Sidecar member {info.filename} is compressed and cannot be mapped")
+        f.seek(info.header_offset)
+        header = f.read(30)
+        name_length, extra_length = struct.unpack('<HH', header[26:30])
+        offsets[info.filename[:-len('.npy')]] = info.header_offset + 30 + name_length + extra_length
+    return offsets
+
+def load_arrays(path: str, mmap_mode: bool = True) -> Dict[str, Any]:
+    """Every array in a sidecar, by member name.
+
+    With mmap_mode the arrays are read-only views over one memory map of the
+    file; pages are only read when a column is used.
+    """
+    import numpy as np
+
+    if not mmap_mode:
+        with np.load(path) as npz:
+            return {name: npz[name] for name in npz.files}
+    arrays = {}
+    with open(path, 'rb') as f, zipfile.ZipFile(f) as archive:
+        offsets = _member_offsets(f, archive)
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if offsets else None
+        for name, offset in offsets.items():
+            f.seek(offset)
+            if np.lib.format.read_magic(f) == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            count = 1
+            for size in shape:
+                count *= size
+            array = np.frombuffer(mapped, dtype=dtype, count=count, offset=f.tell())
+            arrays[name] = array.reshape(shape, order='F' if fortran_order else 'C')
+    return arrays
+
+def verify(table: Dict, directory: str) -> None:
+    """Raise ValueError unless the table's sidecar has the sha256 recorded in the JSON."""
+    info = table['schema']['sidecar']
+    path = os.path.join(directory, info['path'])
+    if 'sha256' in info and file_sha256(path) != info['sha256']:
+        raise ValueError(f"Sidecar {path} does not match its JSON (sha256 differs)")
+
+def load_columns(table: Dict, directory: str, mmap_mode: bool = True,
+                 arrays: Optional[Dict[str, Any]] = None, check_hash: bool = True) -> Dict[str, Any]:
+    """Columns of a sidecar table by name: arrays for sidecar columns, the
+    JSON values (or constant scalars) for the rest.
+
+    Raises ValueError if the sidecar fails its hash check (unless check_hash
+    is False) or an array's shape or dtype differs from the schema.
+    """
+    schema = table['schema']
+    path = os.path.join(directory, schema['sidecar']['path'])
+    if arrays is None:
+        if check_hash:
+            verify(table, directory)
+        arrays = load_arrays(path, mmap_mode)
+    columns = {}
+    for meta in schema['columns']:
+        name = meta['name']
+        if 'member' not in meta:
+            columns[name] = table['columns'][name]
+            continue
+        array = arrays.get(meta['member'])
+        if array is None or array.shape != (schema['rows'],) or array.dtype.str != meta['dtype']:
+            found = 'missing' if array is None else f"{array.dtype.str}{list(array.shape)}"
+            raise ValueError(f"Sidecar {path} column {name} is {found}, "
+                             f"expected {meta['dtype']}[{schema['rows']}]")
+        columns[name] = array
+    return columns
+
+def resolve(document: Dict, directory: str, mmap_mode: bool = True, check_hash: bool = True) -> Dict:
+    """Replace every sidecar table in document with a columnar table backed by
+    the sidecar's arrays, so columnar.as_rows and columnar.column work on it.
+
+    Raises ValueError if a sidecar does not match the JSON, see load_columns.
+    """
+    result = dict(document)
+    loaded = {}
+    for key, table in document.items():
+        if not is_sidecar(table):
+            continue
+        path = table['schema']['sidecar']['path']
+        if path not in loaded:
+            if check_hash:
+                verify(table, directory)
+            loaded[path] = load_arrays(os.path.join(directory, path), mmap_mode)
+        schema = table['schema']
+        result[key] = {
+            'schema': {
+                'layout': columnar.LAYOUT,
+                'version': columnar.SCHEMA_VERSION,
+                'rows': schema['rows'],
+                'columns': [{'name': c['name'], 'type': c['type'], 'constant': c['constant']}
+                            for c in schema['columns']],
+            },
+            'columns': load_columns(table, directory, arrays=loaded[path]),
+        }
+    return result
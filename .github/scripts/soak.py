@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Soak Test Harness
+Runs pca_parser.py end to end against local stand-ins for its environment:
+temp directories for the input, output, archive and SMB share, and a bare
+git repository as origin. Synthetic scans (synthetic.py) are written into
+the share at a fixed rate and a weighted mix of sizes, the way an
+instrument drops a run of scans, and the harness reports drop-to-commit
+latency percentiles (file written to the share -> its JSON on origin),
+throughput, outputs that never arrived, duplicate conversions, and the
+daemon's RSS, ingest queue depth and git backlog over time.
+
+Usage: python soak.py [--scans N] [--rate SCANS_PER_SEC] [--mix KIND:WEIGHT,...] [--workdir DIR] [--report FILE]
+"""
+import argparse
+import collections
+import configparser
+import json
+import math
+import os
+import random
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from converters import service_output_name
+import synthetic
+
+PARSER = Path(__file__).resolve().parents[2] / 'pca_parser.py'
+BRANCH = 'soak'
+KINDS = {  # Scan kind -> the files dropped for it
+    'pca': ('pca',),
+    'scan': ('pca', 'pcj', 'pcp', 'pcr'),
+    'large': ('pca', 'pcj', 'pcp', 'pcr', 'vgl'),
+}
+PERCENTILES = (50, 90, 95, 99)
+READY_LINE = 'File monitoring started'
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """'pca:8,scan:2,large:1' -> {'pca': 8.0, 'scan': 2.0, 'large': 1.0}."""
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(','))):
+        kind, _, weight = part.partition(':')
+        if kind not in KINDS:
+            raise ValueError(f"Unknown scan kind {kind!r} (one of {', '.join(KINDS)})")
+        mix[kind] = float(weight or 1)
+        if mix[kind] < 0:
+            raise ValueError(f"Negative weight for {kind}")
+    if not mix or not sum(mix.values()):
+        raise ValueError("The mix has no scan kind with a weight")
+    return mix
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+def _git(*args, cwd=None) -> str:
+    return subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+def process_rss(pid: int) -> Optional[int]:
+    """Resident set size of a process in bytes, where /proc has it."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def read_gauges(metrics_file: Path, names: Tuple[str, ...]) -> Dict[str, float]:
+    """Unlabelled gauges from the service's Prometheus text file."""
+    gauges = {}
+    try:
+        text = metrics_file.read_text()
+    except OSError:
+        return gauges
+    for line in text.splitlines():
+        name, _, value = line.partition(' ')
+        if name in names:
+            gauges[name] = float(value)
+    return gauges
+
+class Environment:
+    """The daemon's directories, config and a bare origin with a checkout, under one work directory."""
+
+    def __init__(self, workdir: Path, options: argparse.Namespace):
+        self.workdir = workdir
+        self.share = workdir / 'share'
+        self.input = workdir / 'input'
+        self.output = workdir / 'output'
+        self.archive = workdir / 'archive'
+        self.origin = workdir / 'origin.git'
+        self.checkout = workdir / 'gitrepo'
+        self.config_path = workdir / 'config.ini'
+        self.log_path = workdir / 'pca_parser.log'
+        self.metrics_path = workdir / 'metrics.prom'
+        self.options = options
+
+    def create(self) -> None:
+        for path in (self.share, self.input, self.output, self.archive):
+            path.mkdir(parents=True, exist_ok=True)
+        _git('init', '--bare', '-q', str(self.origin))
+        _git('clone', '-q', str(self.origin), str(self.checkout))
+        _git('checkout', '-q', '-b', BRANCH, cwd=self.checkout)
+        (self.checkout / 'README.md').write_text("Soak test origin\n")
+        _git('add', 'README.md', cwd=self.checkout)
+        _git('-c', 'user.name=soak', '-c', 'user.email=soak@localhost', 'commit', '-q', '-m', 'Soak test origin',
+             cwd=self.checkout)
+        _git('push', '-q', '-u', 'origin', BRANCH, cwd=self.checkout)
+
+        config = configparser.ConfigParser()
+        config['Paths'] = {
+            'input_dir': str(self.input),
+            'output_dir': str(self.output),
+            'archive_dir': str(self.archive),
+            'git_repo_dir': str(self.checkout),
+            'network_share': str(self.share),
+        }
+        config['Processing'] = {
+            'workers': str(self.options.workers),
+            'queue_size': str(self.options.queue_size),
+            'quiet_period': str(self.options.quiet_period),
+            'pcp_monitor': 'true',
+            'trajectory_check': 'true',
+            'ledger_path': str(self.workdir / 'ingest_ledger.db'),
+        }
+        config['Metrics'] = {'port': '0', 'file': str(self.metrics_path), 'interval': '1'}
+        config['SharedDrive'] = {'mount': 'false'}
+        config['Git'] = {
+            'BRANCH': BRANCH,
+            'USERNAME': 'soak',
+            'EMAIL': 'soak@localhost',
+            'BATCH_WINDOW': str(self.options.batch_window),
+            'BATCH_SIZE': str(self.options.batch_size),
+        }
+        with open(self.config_path, 'w') as f:
+            config.write(f)
+
+class OriginWatcher:
+    """Polls the bare origin and notes when each json/ file first lands on the branch."""
+
+    def __init__(self, origin: Path, interval: float = 0.2):
+        self.origin = origin
+        self.interval = interval
+        self.seen: Dict[str, float] = {}
+        self.commits = 0
+        self._head = self._rev()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='origin-watcher', daemon=True)
+
+    def _rev(self) -> str:
+        return _git('--git-dir', str(self.origin), 'rev-parse', f'refs/heads/{BRANCH}').strip()
+
+    def poll(self) -> None:
+        head = self._rev()
+        if head == self._head:
+            return
+        now = time.time()
+        log = _git('--git-dir', str(self.origin), 'log', '--format=%x00%H', '--name-only', f'{self._head}..{head}')
+        self.commits += log.count('\0')
+        for line in log.splitlines():
+            if line.startswith('json/'):
+                self.seen.setdefault(line[len('json/'):], now)
+        self._head = head
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.poll()
+
+class Sampler:
+    """Samples the daemon's RSS and its queue/git gauges once per interval."""
+
+    GAUGES = ('pca_parser_queue_depth', 'pca_parser_git_pending')
+
+    def __init__(self, pid: int, metrics_path: Path, started: float, interval: float = 1.0):
+        self.pid = pid
+        self.metrics_path = metrics_path
+        self.started = started
+        self.interval = interval
+        self.samples: List[List[Optional[float]]] = []  # [seconds, rss, queue depth, git pending]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sampler', daemon=True)
+
+    def sample(self) -> None:
+        gauges = read_gauges(self.metrics_path, self.GAUGES)
+        self.samples.append([round(time.time() - self.started, 2), process_rss(self.pid),
+                             *(gauges.get(name) for name in self.GAUGES)])
+
+    def _run(self) -> None:
+        while True:
+            self.sample()
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+def write_scan(directory: Path, name: str, kind: str, index: int, options: argparse.Namespace) -> List[Path]:
+    """Write one scan's files in place, as the instrument does; returns their paths in write order."""
+    large = kind == 'large'
+    projections = (options.large_projections if large else options.projections) + index % 100
+    paths = []
+    for ext in KINDS[kind]:
+        path = directory / f"{name}.{ext}"
+        if ext == 'pca':
+            synthetic.write_pca(path, projections, comment=name)
+        elif ext == 'pcj':
+            synthetic.write_pcj(path, projections, start=index * 1000)
+        elif ext == 'pcp':
+            synthetic.write_pcp(path, projections, seed=index)
+        elif ext == 'pcr':
+            synthetic.write_pcr(path, projections, name)
+        else:
+            synthetic.write_vgl(path, int(options.large_vgl_mb * (1 << 20)), projections, name)
+        paths.append(path)
+    return paths
+
+def start_daemon(env: Environment, timeout: float = 60.0) -> subprocess.Popen:
+    """Start pca_parser.py on the environment and wait until its observers run."""
+    daemon_env = dict(os.environ, PCA_PARSER_LOG=str(env.log_path))
+    process = subprocess.Popen([sys.executable, str(PARSER), '--config', str(env.config_path)],
+                               cwd=env.workdir, env=daemon_env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if env.log_path.exists() and READY_LINE in env.log_path.read_text(errors='replace'):
+            return process
+        if process.poll() is not None:
+            break
+        time.sleep(0.1)
+    stop_daemon(process)
+    tail = env.log_path.read_text(errors='replace')[-2000:] if env.log_path.exists() else ''
+    raise RuntimeError(f"pca_parser.py did not start (exit {process.returncode}):\n{tail}")
+
+def stop_daemon(process: subprocess.Popen) -> None:
+    if process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+def log_counts(log_path: Path) -> Dict[str, object]:
+    """Conversions per source file, failures and content reuse, from the daemon's log."""
+    completed = collections.Counter()
+    failed = reused = 0
+    text = log_path.read_text(errors='replace') if log_path.exists() else ''
+    for match in re.finditer(r'File processing complete: (.+)$', text, re.MULTILINE):
+        completed[match.group(1)] += 1
+    failed = len(re.findall(r'Conversion failed|Error processing file', text))
+    reused = text.count('Identical content already ingested')
+    duplicates = {name: count for name, count in completed.items() if count > 1}
+    return {'converted': len(completed), 'duplicates': duplicates, 'failed': failed, 'reused': reused}
+
+def run_soak(options: argparse.Namespace, workdir: Path) -> Dict:
+    """Run one soak test in workdir and return its report."""
+    mix = parse_mix(options.mix)
+    rng = random.Random(options.seed)
+    env = Environment(workdir, options)
+    env.create()
+    target = env.share if options.target == 'share' else env.input
+    staging = workdir / 'staging'
+
+    process = start_daemon(env)
+    started = time.time()
+    origin = OriginWatcher(env.origin)
+    sampler = Sampler(process.pid, env.metrics_path, started, options.sample_interval)
+    origin.start()
+    sampler.start()
+    dropped: Dict[str, Tuple[float, int, str]] = {}  # output name -> (dropped at, bytes, kind)
+    kinds = collections.Counter()
+    try:
+        t0 = time.monotonic()
+        for index in range(options.scans):
+            delay = t0 + index / options.rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            kind = rng.choices(list(mix), weights=list(mix.values()))[0]
+            kinds[kind] += 1
+            name = f"soak-{index:05d}-{kind}"
+            if options.atomic:
+                # Written elsewhere and renamed in, as a copy tool would
+                staging.mkdir(exist_ok=True)
+                paths = [Path(shutil.move(str(path), str(target / path.name)))
+                         for path in write_scan(staging, name, kind, index, options)]
+            else:
+                paths = write_scan(target, name, kind, index, options)
+            now = time.time()
+            for path in paths:
+                dropped[service_output_name(path.name)] = (now, path.stat().st_size, kind)
+        injected = time.time()
+
+        deadline = time.monotonic() + options.drain_timeout
+        while time.monotonic() < deadline and not set(dropped) <= set(origin.seen):
+            if process.poll() is not None:
+                break
+            time.sleep(0.2)
+    finally:
+        sampler.sample()
+        sampler.stop()
+        origin.stop()
+        stop_daemon(process)
+
+    latencies = {name: origin.seen[name] - at for name, (at, _, _) in dropped.items() if name in origin.seen}
+    by_kind = collections.defaultdict(list)
+    for name, latency in latencies.items():
+        by_kind[dropped[name][2]].append(latency)
+    missing = sorted(set(dropped) - set(origin.seen))
+    committed_bytes = sum(dropped[name][1] for name in latencies)
+    last_seen = max((origin.seen[name] for name in latencies), default=started)
+    first_drop = min((at for at, _, _ in dropped.values()), default=started)
+    busy = max(last_seen - first_drop, 1e-9)
+    rss = [sample[1] for sample in sampler.samples if sample[1] is not None]
+    counts = log_counts(env.log_path)
+
+    def summary(values: List[float]) -> Dict[str, Optional[float]]:
+        stats = {f"p{q}": percentile(values, q) for q in PERCENTILES}
+        stats['max'] = max(values) if values else None
+        stats['mean'] = sum(values) / len(values) if values else None
+        return {key: round(value, 3) if value is not None else None for key, value in stats.items()}
+
+    return {
+        'settings': {key: value for key, value in vars(options).items() if key not in ('report', 'keep')},
+        'scans': dict(kinds),
+        'files': len(dropped),
+        'bytes': sum(size for _, size, _ in dropped.values()),
+        'injection_seconds': round(injected - first_drop, 3) if dropped else 0.0,
+        'committed': len(latencies),
+        'missing': missing,
+        'commits': origin.commits,
+        'latency': summary(list(latencies.values())),
+        'latency_by_kind': {kind: summary(values) for kind, values in sorted(by_kind.items())},
+        'throughput': {
+            'files_per_second': round(len(latencies) / busy, 3),
+            'mb_per_second': round(committed_bytes / busy / (1 << 20), 3),
+        },
+        'conversions': counts,
+        'memory': {
+            'start': rss[0] if rss else None,
+            'peak': max(rss) if rss else None,
+            'end': rss[-1] if rss else None,
+        },
+        'timeline': sampler.samples,
+    }
+
+def format_report(report: Dict) -> List[str]:
+    latency = report['latency']
+    memory = report['memory']
+    mib = lambda value: f"{value / (1 << 20):.1f} MiB" if value is not None else "n/a"
+    lines = [
+        f"Injected {sum(report['scans'].values())} scans ({', '.join(f'{k} {v}' for k, v in report['scans'].items())}), "
+        f"{report['files']} files, {report['bytes'] / (1 << 20):.1f} MiB in {report['injection_seconds']:.1f}s",
+        f"Committed {report['committed']}/{report['files']} outputs in {report['commits']} commits, "
+        f"{report['throughput']['files_per_second']:.2f} files/s, {report['throughput']['mb_per_second']:.2f} MiB/s",
+        "Drop-to-commit latency: " + ", ".join(
+            f"{key} {value:.2f}s" for key, value in latency.items() if value is not None),
+    ]
+    for kind, stats in report['latency_by_kind'].items():
+        lines.append(f"  {kind:<6} p50 {stats['p50']:.2f}s  p95 {stats['p95']:.2f}s  max {stats['max']:.2f}s")
+    conversions = report['conversions']
+    lines.append(f"Conversions: {conversions['converted']} files, {len(conversions['duplicates'])} converted more than once, "
+                 f"{conversions['failed']} failed, {conversions['reused']} reused")
+    lines.append(f"Daemon RSS: start {mib(memory['start'])}, peak {mib(memory['peak'])}, end {mib(memory['end'])}")
+    if report['missing']:
+        lines.append(f"Missing on origin: {len(report['missing'])} ({', '.join(report['missing'][:10])})")
+    return lines
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Soak test pca_parser.py against a local share and git origin")
+    kinds = ', '.join(f"{kind} ({'+'.join(exts)})" for kind, exts in KINDS.items())
+    parser.add_argument('--scans', type=int, default=24, help="Scans to drop (default 24)")
+    parser.add_argument('--rate', type=float, default=0.5, help="Scans dropped per second (default 0.5)")
+    parser.add_argument('--mix', default='pca:6,scan:3,large:1',
+                        help=f"Weighted scan kinds, from {kinds} "
+                             "(default pca:6,scan:3,large:1)")
+    parser.add_argument('--projections', type=int, default=2800, help="Projections of pca/scan scans (default 2800)")
+    parser.add_argument('--large-projections', type=int, default=100000,
+                        help="Projections of large scans (default 100000)")
+    parser.add_argument('--large-vgl-mb', type=float, default=64, help="VGL project size of large scans (default 64)")
+    parser.add_argument('--target', choices=('share', 'input'), default='share',
+                        help="Drop into the share stand-in or the local input directory (default share)")
+    parser.add_argument('--atomic', action='store_true', help="Write each file elsewhere and rename it in")
+    parser.add_argument('--workers', type=int, default=2, help="[Processing] workers (default 2)")
+    parser.add_argument('--queue-size', type=int, default=100, help="[Processing] queue_size (default 100)")
+    parser.add_argument('--quiet-period', type=float, default=2.0, help="[Processing] quiet_period (default 2.0)")
+    parser.add_argument('--batch-window', type=float, default=30, help="[Git] BATCH_WINDOW (default 30)")
+    parser.add_argument('--batch-size', type=int, default=20, help="[Git] BATCH_SIZE (default 20)")
+    parser.add_argument('--drain-timeout', type=float, default=180,
+                        help="Seconds to wait for outstanding outputs after the last drop (default 180)")
+    parser.add_argument('--sample-interval', type=float, default=1.0, help="Seconds between RSS samples (default 1)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the scan kind sequence")
+    parser.add_argument('--workdir', type=Path, help="Work directory (default: a temp directory, removed afterwards)")
+    parser.add_argument('--keep', action='store_true', help="Keep the temp work directory")
+    parser.add_argument('--report', type=Path, help="Write the JSON report here (default <workdir>/soak-report.json)")
+    return parser
+
+def main(argv: Optional[List[str]] = None):
+    options = build_parser().parse_args(argv)
+    try:
+        parse_mix(options.mix)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+    if options.rate <= 0 or options.scans < 1:
+        print("Error: --rate and --scans must be positive", file=sys.stderr)
+        sys.exit(2)
+
+    workdir = options.workdir or Path(tempfile.mkdtemp(prefix='pca-soak-'))
+    workdir.mkdir(parents=True, exist_ok=True)
+    try:
+        report = run_soak(options, workdir)
+        report_path = options.report or workdir / 'soak-report.json'
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        for line in format_report(report):
+            print(line)
+        print(f"Report: {report_path}" if options.report or options.workdir or options.keep else
+              "Report: not kept (use --report FILE or --keep)")
+    finally:
+        if options.workdir is None and not options.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(1 if report['missing'] or report['conversions']['duplicates'] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Synthetic Scans
+Writes a complete scan (PCA, PCJ, PCP, PCR and VGL) of any size in the
+layout of the data/input corpus, for benchmarks and load tests. The PCJ and
+PCP tables get one row per projection over a full turn, and the VGL project
+gets one TransformMatrixList entry per volume slice, as many as it takes to
+reach the requested uncompressed size. Every file is written a block of
+rows at a time, so millions of projections or a multi-GB VGL take constant
+memory to generate.
+
+Usage: python synthetic.py <output_dir> [--name NAME] [--projections N] [--vgl-mb MB] [--seed N]
+"""
+import argparse
+import gzip
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable
+
+FOD = 436.723875
+FDD = 802.77534791
+VOXEL_SIZE = 0.108803510665893555
+DETECTOR = 2024
+BLOCK_ROWS = 4096  # Rows formatted per write
+
+def _write_blocks(f, lines: Iterable[str]) -> None:
+    block = []
+    for line in lines:
+        block.append(line)
+        if len(block) >= BLOCK_ROWS:
+            f.write(''.join(block))
+            block = []
+    f.write(''.join(block))
+
+def write_pca(path, projections: int, comment: str = '') -> None:
+    """A PCA with the corpus sections the converters and the trajectory check read."""
+    with open(path, 'w', encoding='utf-8', newline='\r\n') as f:
+        f.write(
+            f"[General]\nVersion=2.8.2.20099\nVersion-pca=2\nComment={comment}\nLoadDefault=1\nSystemName=v|tome|x m\n\n"
+            f"[Geometry]\nFDD={FDD:.8f}\nFOD={FOD:.8f}\nMagnification={FDD / FOD:.8f}\n"
+            f"VoxelSizeX={VOXEL_SIZE:.8f}\nVoxelSizeY={VOXEL_SIZE:.8f}\nCalibValue=-0.916\n"
+            f"cx={DETECTOR / 2 - 0.5:.8f}\ncy={DETECTOR / 2 - 0.5:.8f}\n\n"
+            f"[CT]\nType=0\nNumberImages={projections}\nStartImg={projections + 1}\nRotationSector=360.00000000\n"
+            f"NoRotation=0\nNrImgDone={projections + 1}\nNrImgCmplScan={projections + 1}\n\n"
+            "[CalibValue]\nNumberImages=18\nAveraging=2\nSkip=3\n\n"
+            f"[Image]\nTop=0\nLeft=0\nBottom={DETECTOR - 1}\nRight={DETECTOR - 1}\nDimX={DETECTOR}\nDimY={DETECTOR}\n"
+            "FreeRay=7993\n\n"
+            "[Xray]\nName=XWT-240-SE\nVoltage=220\nCurrent=450\nFilter=0.5Cu\n"
+        )
+
+def write_pcj(path, projections: int, start: int = 0) -> None:
+    """A PCJ trajectory of projections + 1 rows from 0 to 360 degrees at the PCA's FOD.
+
+    start is the first TimeStamp (ms), so scans of the same size can differ in content.
+    """
+    step = 360.0 / projections
+    with open(path, 'w', encoding='utf-8', newline='\r\n') as f:
+        f.write(f"[Info]\nTrajectoryType=0\nSystemType=5\nSystemName=v|tome|x m\nNumImages={projections}\n"
+                "NumSensors=1\n\n[Data]\n"
+                ";ImgNr\tXS\t\tYS\t\tZS\t\tRS\t\tXD\t\tWarmup\tVSenCnt\tTimeStamp\tChangeCnt\n")
+        _write_blocks(f, (
+            f"{i + 1}\t0.0000000\t158.0001875\t{-FOD:.7f}\t{i * step:.7f}\t0.0000000\t0\t0\t{start + i * 1670}\t0\t\n"
+            for i in range(projections + 1)
+        ))
+
+def write_pcp(path, projections: int, seed: int = 0) -> None:
+    """A PCP of projections + 1 rows of noisy but stable tube and detector readings."""
+    rng = random.Random(seed)
+    start = datetime(2021, 8, 26, 17, 37, 36)
+    step = 360.0 / projections
+    with open(path, 'w', encoding='utf-8', newline='\r\n') as f:
+        f.write("datos|x 2 acquisition 2.8.2\nImgNr\tRotPos\tU\tI\tMeanGV\tDevGV\tDose\tUse\tCValue\tXDShift\tTime\n")
+        _write_blocks(f, (
+            f"{i + 1}\t{i * step:.3f}\t220\t{448 + rng.randint(-2, 1)}\t{7914 + rng.uniform(-15, 15):.1f}\t"
+            f"{rng.uniform(-0.9, -0.5):.1f}\t0.0\t1\t0.000\t0\t"
+            f"{(start + timedelta(seconds=(i * 5) // 3)).strftime('%Y-%m-%d %H:%M:%S')}\n"
+            for i in range(projections + 1)
+        ))
+
+def write_pcr(path, projections: int, name: str) -> None:
+    """A PCR reconstruction log for the scan."""
+    with open(path, 'w', encoding='utf-8', newline='\r\n') as f:
+        f.write(
+            "[Versions]\nVersion-PCR=2\nVersion-datos|x=2.8.2.20099 - RTM\n[General]\nParameterSetOnly=0\n"
+            f"[ImageData]\nPCA_File=S:\\CT_DATA\\SYNTHETIC\\{name}.pca\n"
+            f"[ROI]\nROI_SizeX={DETECTOR}\nROI_SizeY={DETECTOR}\nROI_SizeZ={DETECTOR}\n"
+            f"[Reconstruction Settings]\nFreeRay=7993\nCorrectionValue=-0.916\nObjectRotation=0\n"
+            f"RecFilterKernel=2\nStartImage=1\nLastImage={projections}\n"
+            f"[VolumeData]\nVolume_SizeX={DETECTOR}\nVolume_SizeY={DETECTOR}\nVolume_SizeZ={DETECTOR}\n"
+            f"VoxelSizeRec={VOXEL_SIZE}\nResolution=1\nFormat=5\nVOL_File=S:\\CT_DATA\\SYNTHETIC\\{name}.vol\n"
+        )
+
+def write_vgl(path, size_bytes: int, projections: int, name: str, compresslevel: int = 1) -> int:
+    """A gzip VGStudio project of about size_bytes uncompressed; returns the number of slices.
+
+    The slices are TransformMatrixList entries of the volume import, which is
+    where real projects spend their size, and they come before every value
+    the converter reads except the voxel size, so the whole document is parsed.
+    """
+    head = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n<Project>\n'
+        '<version identifier="4.2.0.999999" appname="VGStudio MAX" appversion="5.5.0.999999" >\n'
+        f'  <file_location>\n    <filename>S:/CT_DATA/SYNTHETIC/{name}.vgl</filename>\n  </file_location>\n'
+        '  <initial_app_version>\n    5.3.0.999999\n  </initial_app_version>\n</version>\n'
+        '<units>\n  <unit quantity="Length" name="MilliMeter" abbreviation="mm" factor="0.001" isInternalUnit="1"/>\n'
+        '</units>\n <vgl>\n  <object class="VGQApplication" id="VGL_1">\n'
+        '   <property minIndex="0" name="ScanInfo" type="stringpairarray" maxIndex="7">\n'
+        '    <string>Tube voltage</string>\n    <string>220 kV</string>\n'
+        '    <string>Tube current</string>\n    <string>450 uA</string>\n'
+        f'    <string>Geometry</string>\n    <string>FDD = {FDD:.3f}, FOD = {FOD:.3f}</string>\n'
+        f'    <string>Number of projections</string>\n    <string>{projections}</string>\n'
+        '   </property>\n'
+        '   <object class="VGLSampleGridImportRaw" id="VGL_2">\n'
+        '    <property name="ImportSettingsFileInfo" type="objectlink">\n     <objectlink>\n'
+        '      <object class="VGLVolumeImportSettings::FileInfo" id="VGL_3">\n'
+    )
+    scale = f'       <matrix4>{VOXEL_SIZE:.18f} 0 0 0 0 {VOXEL_SIZE:.18f} 0 0 0 0 {VOXEL_SIZE:.18f} 0 0 0 '
+    line_bytes = len(f'{scale}{0:020.12f} 1</matrix4>\n')
+    slices = max(1, (size_bytes - len(head) - 1024) // line_bytes)
+    tail = (
+        '       </property>\n'
+        f'       <property name="GridSize" type="vector4">\n        <vector4>{DETECTOR} {DETECTOR} {slices} 1</vector4>\n'
+        '       </property>\n'
+        '       <property name="SampleDataType" type="typeinfo">\n        <typeinfo>UInt16</typeinfo>\n       </property>\n'
+        '      </object>\n     </objectlink>\n    </property>\n'
+        '    <property name="ByteOrder" type="enum">\n     <enum>LittleEndian</enum>\n    </property>\n'
+        f'    <property name="FileName" type="string">\n     <string>S:/CT_DATA/SYNTHETIC/{name}.vol</string>\n'
+        '    </property>\n   </object>\n  </object>\n </vgl>\n</Project>\n'
+    )
+    with gzip.open(path, 'wt', encoding='utf-8', compresslevel=compresslevel) as f:
+        f.write(head)
+        f.write(f'       <property minIndex="0" name="TransformMatrixList" type="matrix4array" maxIndex="{slices - 1}">\n')
+        _write_blocks(f, (
+            f'{scale}{(z + 0.5) * VOXEL_SIZE:020.12f} 1</matrix4>\n' for z in range(slices)
+        ))
+        f.write(tail)
+    return slices
+
+def write_scan(directory, name: str = 'Synthetic scan', projections: int = 100000,
+               vgl_bytes: int = 256 << 20, seed: int = 0) -> Dict[str, Path]:
+    """Write <name>.pca/.pcj/.pcp/.pcr/.vgl into directory; returns extension -> path."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = {ext: directory / f"{name}.{ext}" for ext in ('pca', 'pcj', 'pcp', 'pcr', 'vgl')}
+    write_pca(paths['pca'], projections)
+    write_pcj(paths['pcj'], projections)
+    write_pcp(paths['pcp'], projections, seed)
+    write_pcr(paths['pcr'], projections, name)
+    write_vgl(paths['vgl'], vgl_bytes, projections, name)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic scan of any size")
+    parser.add_argument('output_dir', type=Path, help="Directory for the scan's files")
+    parser.add_argument('--name', default='Synthetic scan', help="File name stem")
+    parser.add_argument('--projections', type=int, default=100000, help="Projections per turn (default 100000)")
+    parser.add_argument('--vgl-mb', type=float, default=256, help="Uncompressed VGL project size in MiB (default 256)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the PCP readings' noise")
+    args = parser.parse_args()
+
+    paths = write_scan(args.output_dir, args.name, args.projections, int(args.vgl_mb * (1 << 20)), args.seed)
+    for path in paths.values():
+        print(f"{path}  {path.stat().st_size / 1024:.1f} KiB")
+
+if __name__ == "__main__":
+    main()
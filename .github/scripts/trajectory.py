@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+PCJ Trajectory Check
+Compares the motion positions a PCJ file logged for every projection with
+the nominal geometry of the scan's PCA: the rotation axis RS must advance by
+RotationSector/NumberImages per image and the source stage ZS must sit at
+-FOD. The [Data] table is read into NumPy arrays in one call and every check
+is an array expression, so a scan of thousands of projections takes a few
+milliseconds. numpy is imported only when a check runs.
+
+Usage: python trajectory.py <pcj_file> [<pca_file>]
+"""
+import io
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from pca_to_json import parse_pca
+
+ANGLE_TOL = 0.01  # Degrees
+POSITION_TOL = 0.01  # mm
+MAX_RANGES = 20  # Flagged image ranges listed in a report
+
+COLUMNS = ('ImgNr', 'XS', 'YS', 'ZS', 'RS', 'XD')
+
+def read_trajectory(text: str) -> Dict[str, Any]:
+    """The ImgNr and motion position columns of PCJ text as float arrays."""
+    import numpy as np
+    _, found, data = text.partition('[Data]')
+    if not found:
+        raise ValueError("No [Data] section")
+    lines = data.lstrip('\r\n').split('\n', 1)
+    header = [name.strip() for name in lines[0].lstrip(';').split('\t') if name.strip()]
+    missing = [name for name in COLUMNS if name not in header]
+    if missing:
+        raise ValueError(f"[Data] has no {', '.join(missing)} column")
+    body = lines[1] if len(lines) > 1 else ''
+    table = np.loadtxt(io.StringIO(body), usecols=[header.index(name) for name in COLUMNS], ndmin=2)
+    return {name: table[:, i] for i, name in enumerate(COLUMNS)}
+
+def nominal_geometry(pca: Dict[str, Dict[str, Any]]) -> Dict[str, Optional[float]]:
+    """FOD, FDD, NumberImages and RotationSector from a sectioned PCA.
+
+    The flat PCA layout cannot be used: [CalibImages] has its own NumberImages.
+    """
+    geometry = pca.get('Geometry', {})
+    ct = pca.get('CT', {})
+    return {
+        'FOD': geometry.get('FOD'),
+        'FDD': geometry.get('FDD'),
+        'NumberImages': ct.get('NumberImages'),
+        'RotationSector': ct.get('RotationSector'),
+    }
+
+def _ranges(np, images, flagged) -> List[List[int]]:
+    """Consecutive flagged images as [first, last] pairs."""
+    picked = images[flagged].astype(int)
+    if not picked.size:
+        return []
+    breaks = np.flatnonzero(np.diff(picked) != 1)
+    firsts = np.concatenate(([picked[0]], picked[breaks + 1]))
+    lasts = np.concatenate((picked[breaks], [picked[-1]]))
+    return [[int(first), int(last)] for first, last in zip(firsts, lasts)]
+
+def check_trajectory(columns: Dict[str, Any], nominal: Optional[Dict[str, Any]] = None,
+                     angle_tol: float = ANGLE_TOL, position_tol: float = POSITION_TOL) -> Dict[str, Any]:
+    """Per-scan report of the projections whose RS or ZS is out of tolerance.
+
+    Without a nominal RotationSector/NumberImages the scan's own mean step is
+    used, so only uneven rotation is caught; without FOD ZS is not checked.
+    """
+    import numpy as np
+    nominal = nominal or {}
+    images, rs, zs = columns['ImgNr'], columns['RS'], columns['ZS']
+    count = len(images)
+    report: Dict[str, Any] = {'projections': count}
+    flagged = np.zeros(count, dtype=bool)
+
+    sector, planned = nominal.get('RotationSector'), nominal.get('NumberImages')
+    if sector is not None and planned:
+        step = sector / planned
+        # A full turn logs both 0 and 360 degrees
+        report['expected_projections'] = planned + 1 if sector % 360 == 0 else planned
+    else:
+        step = (rs[-1] - rs[0]) / (images[-1] - images[0]) if count > 1 and images[-1] != images[0] else None
+    if step is not None and count:
+        angle_dev = rs - (rs[0] + (images - images[0]) * step)
+        step_dev = np.diff(rs) - np.diff(images) * step
+        # A projection is flagged by its own angle; one bad step is also a bad
+        # step back, so the step deviation is only reported
+        bad_angle = np.abs(angle_dev) > angle_tol
+        flagged |= bad_angle
+        report['rotation'] = {
+            'nominal_step': step if sector is not None and planned else None,
+            'step_mean': float(np.diff(rs).mean() / np.diff(images).mean()) if count > 1 else None,
+            'step_max_dev': float(np.abs(step_dev).max()) if count > 1 else 0.0,
+            'angle_max_dev': float(np.abs(angle_dev).max()),
+            'out_of_tolerance': int(bad_angle.sum()),
+        }
+
+    fod = nominal.get('FOD')
+    if fod is not None and count:
+        z_dev = zs + fod
+        bad_z = np.abs(z_dev) > position_tol
+        flagged |= bad_z
+        report['source_z'] = {
+            'nominal': -fod,
+            'max_dev': float(np.abs(z_dev).max()),
+            'out_of_tolerance': int(bad_z.sum()),
+        }
+
+    # Stages that should not move during a circular scan
+    report['travel'] = {name: float(np.ptp(columns[name])) if count else 0.0 for name in ('XS', 'YS', 'XD')}
+
+    problems = []
+    if report.get('expected_projections') not in (None, count):
+        problems.append('projection_count')
+    if flagged.any():
+        problems.append('out_of_tolerance')
+    ranges = _ranges(np, images, flagged)
+    report['flagged'] = int(flagged.sum())
+    report['ranges'] = ranges[:MAX_RANGES]
+    report['truncated'] = len(ranges) > MAX_RANGES
+    report['status'] = 'mismatch' if problems else 'ok'
+    report['problems'] = problems
+    return report
+
+def check_files(pcj_path, pca_path=None) -> Dict[str, Any]:
+    """Trajectory report of a PCJ file against its PCA, if there is one."""
+    with open(pcj_path, 'r', encoding='utf-8', errors='replace') as f:
+        columns = read_trajectory(f.read())
+    nominal = None
+    if pca_path is not None:
+        with open(pca_path, 'rb') as f:
+            nominal = nominal_geometry(parse_pca(f.read()))
+    report = check_trajectory(columns, nominal)
+    return {'file': Path(pcj_path).name, 'pca': Path(pca_path).name if pca_path else None, **report}
+
+def trajectory_name(json_filename: str) -> str:
+    """Report file name for a PCJ JSON output, e.g. scan.pcj.json -> scan.pcj-trajectory.json."""
+    stem = json_filename[:-len('.json')] if json_filename.endswith('.json') else json_filename
+    return f"{stem}-trajectory.json"
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python trajectory.py <pcj_file> [<pca_file>]")
+        sys.exit(1)
+
+    input_path = Path(sys.argv[1])
+    pca_path = Path(sys.argv[2]) if len(sys.argv) == 3 else input_path.with_suffix('.pca')
+    if not input_path.exists():
+        print(f"Error: Input file '{input_path}' does not exist")
+        sys.exit(1)
+
+    output_path = Path('data/output') / trajectory_name(f"{input_path.stem}.pcj.json")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    report = check_files(input_path, pca_path if pca_path.exists() else None)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"{input_path.name}: {report['status']} ({report['flagged']} of {report['projections']} projections flagged)")
+
+if __name__ == "__main__":
+    main()
@@ -1,102 +1,213 @@
 #!/usr/bin/env python3
 """
 VGL to JSON Converter
-This script converts VGL binary files to JSON format.
-It handles binary data and produces structured JSON output.
+This script converts VGStudio VGL project files to JSON format.
+A VGL file is a gzip-compressed XML project document (plain XML is accepted
+too). The document is decompressed and parsed incrementally through a bounded
+buffer, and reading stops as soon as the requested sections are complete, so
+metadata from a large project costs a prefix read at constant memory.
 """
 import json
 import sys
-import struct
+import zlib
 from pathlib import Path
-from typing import Dict, Any, BinaryIO
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+GZIP_MAGIC = b'\x1f\x8b'
+SECTIONS = ('metadata', 'scan_info', 'volumes')
+READ_SIZE = 1 << 14  # Compressed bytes read per step
+DECOMPRESS_LIMIT = 1 << 16  # Most uncompressed bytes inflated per step
 
 class VGLConverter:
-    def __init__(self):
-        self.data = {}
-        self.current_offset = 0
-        
-    def read_string(self, file: BinaryIO, max_length: int = 256) -> str:
-        """Read a null-terminated string from the binary file."""
-        chars = []
-        while True:
-            if len(chars) >= max_length:
-                break
-            char = file.read(1)
-            if not char or char == b'\x00':
-                break
-            try:
-                chars.append(char.decode('utf-8'))
-            except UnicodeDecodeError:
-                # Skip invalid characters
-                continue
-        return ''.join(chars)
-    
-    def read_int32(self, file: BinaryIO) -> int:
-        """Read a 32-bit integer from the binary file."""
-        data = file.read(4)
-        if len(data) != 4:
-            raise EOFError("End of file reached while reading int32")
-        return struct.unpack('<i', data)[0]
-    
-    def read_float32(self, file: BinaryIO) -> float:
-        """Read a 32-bit float from the binary file."""
-        data = file.read(4)
-        if len(data) != 4:
-            raise EOFError("End of file reached while reading float32")
-        return struct.unpack('<f', data)[0]
-    
-    def read_header(self, file: BinaryIO) -> Dict[str, Any]:
-        """Read the VGL file header."""
-        header = {}
-        
-        # Read magic number or identifier if present
-        magic = file.read(4)
-        if magic:
-            header['magic'] = magic.hex()
-        
-        return header
-    
-    def read_metadata(self, file: BinaryIO) -> Dict[str, Any]:
-        """Read metadata section of the VGL file."""
-        metadata = {}
-        
-        try:
-            # Attempt to read basic metadata fields
-            metadata['version'] = self.read_int32(file)
-            metadata['timestamp'] = self.read_int32(file)
-            
-            # Read name or identifier string
-            name = self.read_string(file)
-            if name:
-                metadata['name'] = name
-                
-        except (EOFError, struct.error):
-            pass
-            
-        return metadata
-    
-    def convert_file(self, input_path: Path) -> Dict[str, Any]:
+    def __init__(self, read_size: int = READ_SIZE):
+        self.read_size = read_size
+        self.data: Dict[str, Any] = {}
+        self.bytes_read = 0
+
+    def iter_document(self, file: BinaryIO) -> Iterable[bytes]:
+        """Yield the uncompressed project document in bounded chunks.
+
+        Gzip streams are inflated incrementally; bytes after the end of the
+        gzip member are ignored. Anything else is passed through as is.
+        """
+        head = file.read(len(GZIP_MAGIC))
+        self.bytes_read = len(head)
+        if head != GZIP_MAGIC:
+            self.data['header']['compression'] = None
+            if head:
+                yield head
+            while True:
+                chunk = file.read(self.read_size)
+                if not chunk:
+                    return
+                self.bytes_read += len(chunk)
+                yield chunk
+
+        self.data['header']['compression'] = 'gzip'
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        pending = head
+        while not inflater.eof:
+            if not pending:
+                pending = file.read(self.read_size)
+                if not pending:
+                    raise ValueError("VGL gzip stream is truncated")
+                self.bytes_read += len(pending)
+            chunk = inflater.decompress(pending, DECOMPRESS_LIMIT)
+            pending = inflater.unconsumed_tail
+            if chunk:
+                yield chunk
+
+    def convert_file(self, input_path: Path, sections: Iterable[str] = SECTIONS) -> Dict[str, Any]:
         """Convert VGL file to dictionary structure."""
-        self.data = {}
-        
+        with open(input_path, 'rb') as file:
+            return self.convert_stream(file, sections)
+
+    def convert_stream(self, file: BinaryIO, sections: Iterable[str] = SECTIONS) -> Dict[str, Any]:
+        """Convert an open VGL stream, reading only as far as the requested sections need."""
+        wanted = set(sections)
+        unknown = wanted - set(SECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown VGL section(s): {', '.join(sorted(unknown))}")
+        self.data = {'header': {}}
+        document = _ProjectDocument(wanted)
+        parser = XMLPullParser(events=('start', 'end'))
         try:
-            with open(input_path, 'rb') as file:
-                # Read file header
-                self.data['header'] = self.read_header(file)
-                
-                # Read metadata
-                self.data['metadata'] = self.read_metadata(file)
-                
-                # Store binary content info
-                file.seek(0, 2)  # Seek to end
-                self.data['file_size'] = file.tell()
-                
-        except (IOError, EOFError, struct.error) as e:
-            print(f"Error processing file: {e}")
-            return {}
-            
+            for chunk in self.iter_document(file):
+                parser.feed(chunk)
+                for event, element in parser.read_events():
+                    document.handle(event, element)
+                if document.complete():
+                    break
+            else:
+                parser.close()
+                for event, element in parser.read_events():
+                    document.handle(event, element)
+        except ParseError as e:
+            raise ValueError(f"VGL project document is not valid XML: {e}") from e
+
+        if not document.seen_project:
+            raise ValueError("No VGL project document found")
+        self.data['header']['bytes_read'] = self.bytes_read
+        self.data['header']['complete'] = document.complete()
+        self.data.update(document.result())
+        if file.seekable():
+            # File size is known without reading the rest of the stream
+            file.seek(0, 2)
+            self.data['file_size'] = file.tell()
         return self.data
 
+class _ProjectDocument:
+    """Collects the parts of a VGStudio project from XMLPullParser events.
+
+    Elements are dropped from the tree as soon as they end, so only the
+    path from the root to the current element is held in memory.
+    """
+
+    def __init__(self, sections: Iterable[str]):
+        self.sections = set(sections)
+        self.done = set()
+        self.seen_project = False
+        self.stack: List[Any] = []
+        self.properties: List[Optional[str]] = []  # Name of the innermost open property per level
+        self.metadata: Dict[str, Any] = {}
+        self.scan_info: Dict[str, str] = {}
+        self.scan_pairs: Optional[List[str]] = None
+        self.volumes: List[Dict[str, Any]] = []
+        self.volume: Optional[Dict[str, Any]] = None
+        self.volume_depth = 0
+
+    def complete(self) -> bool:
+        return self.sections <= self.done
+
+    def result(self) -> Dict[str, Any]:
+        result = {}
+        if 'metadata' in self.sections:
+            result['metadata'] = self.metadata
+        if 'scan_info' in self.sections:
+            result['scan_info'] = self.scan_info
+        if 'volumes' in self.sections:
+            result['volumes'] = self.volumes
+        return result
+
+    def property_name(self) -> Optional[str]:
+        return self.properties[-1] if self.properties else None
+
+    def handle(self, event: str, element) -> None:
+        if event == 'start':
+            self.start(element)
+            self.stack.append(element)
+            return
+        self.stack.pop()
+        self.end(element)
+        if self.stack:
+            self.stack[-1].remove(element)
+
+    def start(self, element) -> None:
+        tag = element.tag
+        if tag == 'Project':
+            self.seen_project = True
+        elif tag == 'version' and 'metadata' in self.sections:
+            for key in ('identifier', 'appname', 'appversion'):
+                if key in element.attrib:
+                    self.metadata[key] = element.attrib[key]
+        elif tag == 'unit' and element.get('quantity') == 'Length':
+            self.metadata['length_unit'] = element.get('abbreviation')
+        elif tag == 'property':
+            self.properties.append(element.get('name'))
+            if element.get('name') == 'ScanInfo' and 'scan_info' not in self.done:
+                self.scan_pairs = []
+        elif tag == 'object' and self.volume is None and 'volumes' in self.sections \
+                and element.get('class', '').startswith('VGLSampleGridImport'):
+            self.volume = {'importer': element.get('class')}
+            self.volume_depth = len(self.stack)
+
+    def end(self, element) -> None:
+        tag = element.tag
+        text = (element.text or '').strip()
+        parent = self.stack[-1].tag if self.stack else None
+        if tag == 'property':
+            if self.properties.pop() == 'ScanInfo' and self.scan_pairs is not None:
+                pairs = self.scan_pairs
+                self.scan_info = {k: v.strip(' ,') for k, v in zip(pairs[::2], pairs[1::2])
+                                  if k and v.strip(' ,')}
+                self.scan_pairs = None
+                self.done.add('scan_info')
+        elif tag == 'units':
+            self.done.add('metadata')
+        elif tag == 'filename' and parent in ('file_location', 'archive_file_location'):
+            if text:
+                self.metadata[parent] = text
+        elif tag in ('initial_app_version', 'user_product_info') and parent == 'version':
+            self.metadata[tag] = text
+        elif tag == 'vgl' or tag == 'Project':
+            self.done.update(self.sections)
+        elif self.scan_pairs is not None and tag == 'string' and self.property_name() == 'ScanInfo':
+            self.scan_pairs.append(text)
+        elif self.volume is not None:
+            self.volume_value(tag, text, element)
+            if tag == 'object' and len(self.stack) == self.volume_depth:
+                self.volumes.append(self.volume)
+                self.volume = None
+
+    def volume_value(self, tag: str, text: str, element) -> None:
+        """Pick the volume file, grid and voxel size out of an import object."""
+        name = self.property_name()
+        volume = self.volume
+        if name == 'FileName' and tag == 'string':
+            volume['file_name'] = text
+        elif name == 'ByteOrder' and tag == 'enum':
+            volume['byte_order'] = text
+        elif name == 'GridSize' and tag == 'vector4' and 'grid_size' not in volume:
+            volume['grid_size'] = [int(float(v)) for v in text.split()[:3]]
+        elif name == 'SampleDataType' and tag == 'typeinfo' and 'data_type' not in volume:
+            volume['data_type'] = text
+        elif name == 'TransformMatrixList' and tag == 'matrix4' and 'voxel_size' not in volume:
+            matrix = [float(v) for v in text.split()]
+            if len(matrix) == 16:
+                # Diagonal of the first slice's scale matrix, in the project's length unit
+                volume['voxel_size'] = [matrix[0], matrix[5], matrix[10]]
+
 def main():
     if len(sys.argv) != 2:
         print("Usage: python vgl_to_json.py <vgl_file>")
@@ -104,7 +215,7 @@ def main():
 
     input_file = sys.argv[1]
     input_path = Path(input_file)
-    
+
     if not input_path.exists():
         print(f"Error: Input file '{input_path}' does not exist")
         sys.exit(1)
@@ -118,7 +229,7 @@ def main():
     # Convert the file
     converter = VGLConverter()
     data = converter.convert_file(input_path)
-    
+
     # Write JSON output
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(data, f, indent=2)
@@ -18,7 +18,7 @@ apt-get update -y
 apt-get install -y python3 python3-pip git
 
 echo "Installing Python dependencies..."
-pip3 install gitpython configparser watchdog
+pip3 install gitpython configparser watchdog striprtf  # striprtf: .rtf conversion
 
 # Define installation directory and create structure
 INSTALL_DIR="/opt/pca_parser"
@@ -37,6 +37,7 @@ chmod -R 755 "$INSTALL_DIR"
 
 echo "Copying program files..."
 cp pca_parser.py "$INSTALL_DIR/pca_parser.py"
+cp .github/scripts/*.py "$INSTALL_DIR/"  # Converters shared with the GitHub workflows
 cp config.ini "$INSTALL_DIR/config.ini"
 chmod +x "$INSTALL_DIR/pca_parser.py"
 
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import argparse
 import configparser
 import json
 import os
@@ -8,18 +9,37 @@ import logging
 import traceback
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from watchdog.observers.polling import PollingObserver
 import time
 from git import Repo
 import re
 import datetime
+import queue
+import contextlib
+import collections
+import threading
+import hashlib
+import sqlite3
+import sys
+import http.server
+
+# Converters live in .github/scripts (install.sh copies them next to this file)
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.github', 'scripts')
+if os.path.isdir(SCRIPTS_DIR) and SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+from pca_to_json import parse_pca
+from converters import SNIFF_BYTES, get_converter, service_output_name, supported_extensions
+from pcp_monitor import anomaly_name, monitor_file
+import profiling
+import sidecar
+from trajectory import check_files, trajectory_name
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('/var/log/pca_parser.log'),
+        logging.FileHandler(os.environ.get('PCA_PARSER_LOG', '/var/log/pca_parser.log')),
         logging.StreamHandler()  # Add console output
     ]
 )
@@ -27,15 +47,981 @@ logger = logging.getLogger(__name__)
 
 __version__ = '1.0.0'
 
+DEFAULT_LEDGER_PATH = '/opt/pca_parser/ingest_ledger.db'
+
+# File types the service converts, from the converter registry; formats whose
+# dependencies are not installed (e.g. striprtf for .rtf) are left out
+SUPPORTED_EXTENSIONS = tuple(supported_extensions(available_only=True))
+
+@contextlib.contextmanager
+def atomic_output(path, mode='wb', mtime=None, encoding=None):
+    """Open a temp file next to path for writing; it replaces path only if the block succeeds"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, mode, encoding=encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        if mtime is not None:
+            os.utime(tmp_path, (mtime, mtime))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def write_atomic(path, data, mtime=None):
+    """Write bytes to a temp file next to path, then rename it into place"""
+    with atomic_output(path, 'wb', mtime) as f:
+        f.write(data)
+
+def hash_file(path, copy_to=None, chunk_size=1 << 20):
+    """SHA-256 and first bytes of a file, read in chunks.
+
+    With copy_to the bytes are also written there atomically (keeping the
+    source mtime), so a share file is copied and hashed in a single read.
+    Returns (sha256 hex, head bytes for format sniffing).
+    """
+    digest = hashlib.sha256()
+    head = b''
+    with open(path, 'rb') as source:
+        st = os.fstat(source.fileno())
+        with contextlib.ExitStack() as stack:
+            copy = stack.enter_context(atomic_output(copy_to, 'wb', st.st_mtime)) if copy_to else None
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                if len(head) < SNIFF_BYTES:
+                    head += chunk[:SNIFF_BYTES - len(head)]
+                if copy is not None:
+                    copy.write(chunk)
+    return digest.hexdigest(), head
+
+def config_value(config, section, key, fallback=None, cast=str):
+    """Read a config value from a ConfigParser or plain dict, with a fallback"""
+    try:
+        value = config[section][key]
+    except (KeyError, TypeError):
+        return fallback
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        logger.warning(f"Invalid value for [{section}] {key}: {value!r}, using {fallback!r}")
+        return fallback
+
+def parse_bool(value):
+    """Parse a config flag the way ConfigParser.getboolean does"""
+    if isinstance(value, bool):
+        return value
+    try:
+        return configparser.ConfigParser.BOOLEAN_STATES[str(value).strip().lower()]
+    except KeyError:
+        raise ValueError(f"Not a boolean: {value!r}")
+
+class MetricsRegistry:
+    """In-process counters, gauges and latency histograms in Prometheus text format.
+
+    Metrics are declared once with their type, help text and (for histograms)
+    bucket bounds; samples are keyed by their label values. Collectors are
+    callables run on every render to refresh gauges owned by other objects,
+    e.g. the ingest queue depth. All methods are thread-safe.
+    """
+
+    STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+    LAG_BUCKETS = (1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}  # name -> (type, help, buckets)
+        self._samples = {}  # name -> {label tuple: value, or [bucket counts, sum, count]}
+        self._collectors = {}
+
+    def declare(self, name, kind, help_text, buckets=None):
+        """Declare a counter, gauge or histogram; declaring it again is a no-op"""
+        with self._lock:
+            if name not in self._meta:
+                self._meta[name] = (kind, help_text, tuple(buckets or self.STAGE_BUCKETS))
+                self._samples[name] = {}
+
+    def collector(self, key, func):
+        """Run func() on every render; a later collector with the same key replaces it, None removes it"""
+        with self._lock:
+            if func is None:
+                self._collectors.pop(key, None)
+            else:
+                self._collectors[key] = func
+
+    def inc(self, name, value=1, **labels):
+        """Add to a counter"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            samples = self._samples[name]
+            samples[key] = samples.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """Set a gauge"""
+        with self._lock:
+            self._samples[name][tuple(sorted(labels.items()))] = value
+
+    def observe(self, name, value, **labels):
+        """Record one histogram observation"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            buckets = self._meta[name][2]
+            sample = self._samples[name].get(key)
+            if sample is None:
+                sample = self._samples[name][key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    sample[0][i] += 1
+            sample[1] += value
+            sample[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, name, **labels):
+        """Observe the wall time of the block, whether or not it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def value(self, name, **labels):
+        """Current value of a counter or gauge, or (count, sum) of a histogram; None if unset"""
+        with self._lock:
+            sample = self._samples[name].get(tuple(sorted(labels.items())))
+        if isinstance(sample, list):
+            return sample[2], sample[1]
+        return sample
+
+    def clear(self):
+        """Drop every sample, keeping declarations and collectors"""
+        with self._lock:
+            for samples in self._samples.values():
+                samples.clear()
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            collectors = list(self._collectors.values())
+        for func in collectors:
+            try:
+                func()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {str(e)}")
+
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, buckets) in self._meta.items():
+                samples = self._samples[name]
+                if not samples:
+                    continue
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, sample in sorted(samples.items()):
+                    if kind != 'histogram':
+                        lines.append(f"{name}{_format_labels(key)} {_format_number(sample)}")
+                        continue
+                    counts, total, count = sample
+                    for bound, bucket_count in zip(buckets, counts):
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', _format_number(bound)),))} {bucket_count}")
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_number(total)}")
+                    lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return '\n'.join(lines) + '\n'
+
+def _format_labels(key):
+    if not key:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in key)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + '}'
+
+def _format_number(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+METRICS = MetricsRegistry()
+METRICS.declare('pca_parser_info', 'gauge', 'Service version')
+METRICS.declare('pca_parser_stage_seconds', 'histogram',
+                'Time spent per ingest stage (read, convert, check, archive, publish) by source')
+METRICS.declare('pca_parser_file_seconds', 'histogram', 'Time to ingest one file, end to end, by source')
+METRICS.declare('pca_parser_ingest_lag_seconds', 'histogram',
+                'Time from a source file\'s last modification to its ingest finishing', MetricsRegistry.LAG_BUCKETS)
+METRICS.declare('pca_parser_files_total', 'counter', 'Files ingested by source, format and result')
+METRICS.declare('pca_parser_bytes_total', 'counter', 'Source bytes read by source')
+METRICS.declare('pca_parser_queue_depth', 'gauge', 'Paths waiting for an ingest worker')
+METRICS.declare('pca_parser_queue_in_flight', 'gauge', 'Paths being processed by an ingest worker')
+METRICS.declare('pca_parser_queue_events_total', 'counter', 'Ingest queue submissions, duplicates and outcomes')
+METRICS.declare('pca_parser_stabilizer_pending', 'gauge', 'Paths waiting for their writer to finish')
+METRICS.declare('pca_parser_git_seconds', 'histogram', 'Time per git operation (commit, fetch, pull, push)')
+METRICS.declare('pca_parser_git_batches_total', 'counter', 'Git batches by result (pushed, failed, unchanged)')
+METRICS.declare('pca_parser_git_files_total', 'counter', 'Outputs pushed to the git remote')
+METRICS.declare('pca_parser_git_pending', 'gauge', 'Outputs waiting for the next git batch')
+METRICS.declare('pca_parser_git_oldest_pending_seconds', 'gauge', 'Age of the oldest output waiting for git')
+METRICS.declare('pca_parser_share_poll_seconds', 'histogram', 'Time per scan of the network share')
+METRICS.declare('pca_parser_share_poll_errors_total', 'counter', 'Failed scans of the network share')
+METRICS.declare('pca_parser_share_entries', 'gauge', 'Directory entries seen by the last share scan')
+METRICS.declare('pca_parser_share_mounted', 'gauge', 'Whether the network share was reachable at the last mount check')
+METRICS.declare('pca_parser_remount_attempts_total', 'counter', 'Attempts to remount the network share by result')
+METRICS.declare('pca_parser_observer_restarts_total', 'counter', 'Observer restarts by reason')
+METRICS.set('pca_parser_info', 1, version=__version__)
+
+class MetricsServer:
+    """Serves METRICS on http://host:port/metrics from a daemon thread"""
+
+    def __init__(self, registry, port, host='127.0.0.1'):
+        registry_ref = registry
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry_ref.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes would flood the service log
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        logger.info(f"Serving metrics on http://{self.server.server_address[0]}:{self.port}/metrics")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+class IngestQueue:
+    """Bounded work queue that feeds file paths to a pool of worker threads.
+
+    Watchdog observers only enqueue paths, so event delivery never waits on
+    conversion or git. When the queue is full, submit() blocks the observer
+    thread (backpressure) and reports the current depth.
+    """
+
+    def __init__(self, process_func, workers=2, max_size=100, high_water=None):
+        self.process_func = process_func
+        self.workers = max(1, workers)
+        self.max_size = max(1, max_size)
+        self.high_water = high_water or max(1, int(self.max_size * 0.8))
+        self._queue = queue.Queue(maxsize=self.max_size)
+        self._pending = set()  # Paths queued or in flight
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()  # Set when stop() gives up on draining
+        self._threads = []
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.duplicates = 0
+
+    def start(self):
+        """Start the worker threads"""
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"ingest-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.workers} ingest workers (queue size {self.max_size})")
+
+    def stop(self, timeout=30):
+        """Let workers drain queued work, then stop them; gives up after timeout seconds"""
+        deadline = time.monotonic() + timeout
+        for _ in self._threads:
+            try:
+                self._queue.put(None, timeout=max(0, deadline - time.monotonic()))
+            except queue.Full:
+                logger.warning(f"Ingest queue still full after {timeout}s, dropping {self._queue.qsize()} queued paths")
+                self._stopping.set()
+                break
+        for thread in self._threads:
+            thread.join(max(0, deadline - time.monotonic()))
+        alive = [t.name for t in self._threads if t.is_alive()]
+        if alive:
+            self._stopping.set()
+            logger.warning(f"Ingest workers still busy after {timeout}s: {alive}")
+        self._threads = []
+
+    def depth(self):
+        """Number of paths waiting for a worker"""
+        return self._queue.qsize()
+
+    def collect_metrics(self):
+        """Refresh the queue depth gauges"""
+        stats = self.stats()
+        METRICS.set('pca_parser_queue_depth', stats['depth'])
+        METRICS.set('pca_parser_queue_in_flight', stats['in_flight'])
+
+    def stats(self):
+        """Snapshot of queue counters"""
+        with self._lock:
+            return {
+                'depth': self._queue.qsize(),
+                'in_flight': len(self._pending) - self._queue.qsize(),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'duplicates': self.duplicates,
+            }
+
+    def submit(self, file_path):
+        """Queue a path for processing; returns False if it is already pending"""
+        with self._lock:
+            if file_path in self._pending:
+                self.duplicates += 1
+                METRICS.inc('pca_parser_queue_events_total', event='duplicate')
+                logger.debug(f"Already queued: {file_path}")
+                return False
+            self._pending.add(file_path)
+            self.submitted += 1
+        METRICS.inc('pca_parser_queue_events_total', event='submitted')
+
+        depth = self._queue.qsize()
+        if depth >= self.high_water:
+            logger.warning(f"Ingest queue depth {depth}/{self.max_size}, observer may block")
+        try:
+            self._queue.put(file_path, timeout=1)
+        except queue.Full:
+            logger.warning(f"Ingest queue full ({self.max_size}), waiting for a worker: {file_path}")
+            while True:  # Block the observer until there is room, or the queue stops
+                if self._stopping.is_set():
+                    with self._lock:
+                        self._pending.discard(file_path)
+                    return False
+                try:
+                    self._queue.put(file_path, timeout=1)
+                    break
+                except queue.Full:
+                    pass
+        return True
+
+    def _worker(self):
+        while not self._stopping.is_set():
+            try:
+                file_path = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            if file_path is None:
+                self._queue.task_done()
+                return
+            ok = False
+            try:
+                self.process_func(file_path)
+                ok = True
+            except Exception as e:
+                logger.error(f"Worker failed on {file_path}: {str(e)}\n{traceback.format_exc()}")
+            finally:
+                with self._lock:
+                    self._pending.discard(file_path)
+                    if ok:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                METRICS.inc('pca_parser_queue_events_total', event='completed' if ok else 'failed')
+                self._queue.task_done()
+
+class IngestLedger:
+    """Persistent SQLite record of every file the service has ingested.
+
+    Entries are keyed by path, size and mtime for a cheap stat-based check,
+    and indexed by SHA-256 so byte-identical scans are recognised even under
+    a different filename. The database lives on disk, so nothing is lost on
+    restart, and retention keeps it to max_entries rows and retention_days.
+    """
+
+    PRUNE_EVERY = 100  # Inserts between retention passes
+
+    def __init__(self, db_path, max_entries=100000, retention_days=365):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.retention_days = retention_days
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS ingested (
+                path TEXT NOT NULL,
+                size INTEGER,
+                mtime REAL,
+                sha256 TEXT,
+                output TEXT,
+                ingested_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_ingested_stat ON ingested (path, size, mtime);
+            CREATE INDEX IF NOT EXISTS idx_ingested_sha256 ON ingested (sha256);
+            CREATE INDEX IF NOT EXISTS idx_ingested_time ON ingested (ingested_at);
+        """)
+        self._conn.commit()
+        self._inserts = 0
+        self.prune()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def contains(self, file_path):
+        """True if this path, at its current size and mtime, was already ingested"""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            # File is gone (archived or removed); match on the path alone
+            query, args = 'SELECT 1 FROM ingested WHERE path = ? LIMIT 1', (file_path,)
+        else:
+            query = 'SELECT 1 FROM ingested WHERE path = ? AND size = ? AND mtime = ? LIMIT 1'
+            args = (file_path, st.st_size, st.st_mtime)
+        with self._lock:
+            return self._conn.execute(query, args).fetchone() is not None
+
+    def find_hash(self, sha256):
+        """Return the path of an earlier ingest with identical content, if any"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT path FROM ingested WHERE sha256 = ? LIMIT 1', (sha256,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def find_output(self, sha256):
+        """Return (path, output) of the latest ingest with identical content that wrote an output"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT path, output FROM ingested WHERE sha256 = ? AND output IS NOT NULL '
+                'ORDER BY ingested_at DESC, rowid DESC LIMIT 1', (sha256,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def record(self, file_path, size=None, mtime=None, sha256=None, output=None):
+        """Record an ingested file; committed immediately so it survives a crash"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO ingested (path, size, mtime, sha256, output, ingested_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (file_path, size, mtime, sha256, output, time.time())
+            )
+            self._conn.commit()
+            self._inserts += 1
+            due = self._inserts % self.PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def prune(self):
+        """Apply the retention policy"""
+        cutoff = time.time() - self.retention_days * 86400
+        with self._lock:
+            self._conn.execute('DELETE FROM ingested WHERE ingested_at < ?', (cutoff,))
+            self._conn.execute(
+                'DELETE FROM ingested WHERE rowid NOT IN '
+                '(SELECT rowid FROM ingested ORDER BY ingested_at DESC, rowid DESC LIMIT ?)',
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM ingested').fetchone()[0]
+
+class PublishError(Exception):
+    """Raised when a batch could not be rebased onto the remote and pushed"""
+
+class GitPublisher:
+    """Collects finished JSON outputs and publishes them in batches.
+
+    add() only records where each output is; flush() copies the batch into
+    the checkout's json/ directory under the git lock, so a rebase never sees
+    a file change underneath it. Once the oldest pending file is batch_window
+    seconds old, or batch_size files are pending, the whole batch goes out as
+    one commit with a single fetch/rebase/push. A batch that cannot be pushed is rolled back and
+    requeued, so only pushed commits are appended to publish_log.
+    """
+
+    COMMITS_KEPT = 1000  # Recent json filename -> commit sha entries kept in memory
+
+    def __init__(self, repo_dir, branch, username, email='jtrue15@ufl.edu',
+                 batch_window=30, batch_size=20, publish_log=None, remote='origin'):
+        self.repo_dir = repo_dir
+        self.branch = branch
+        self.username = username
+        self.email = email
+        self.batch_window = batch_window
+        self.batch_size = max(1, batch_size)
+        self.publish_log = publish_log
+        self.remote = remote
+        self.json_repo_path = os.path.join(repo_dir, 'json')
+        self.commits = collections.OrderedDict()  # json filename -> pushed commit sha
+        self.failed_batches = 0
+        self._pending = []  # (json_filename, queued_at)
+        self._sources = {}  # json_filename -> output path copied in at the next flush
+        self._cond = threading.Condition()
+        self._git_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self._configured = False
+        self.profiler = profiling.Profiler()  # Set by main() to profile a sample of batches
+
+    def start(self):
+        """Start the background thread that flushes batches"""
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="git-publisher", daemon=True)
+        self._thread.start()
+        logger.info(f"Git publisher started (window {self.batch_window}s, batch size {self.batch_size})")
+
+    def stop(self, timeout=60):
+        """Stop the background thread and publish anything still pending"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def collect_metrics(self):
+        """Refresh the pending-output gauges"""
+        with self._cond:
+            pending = len(self._pending)
+            oldest = time.monotonic() - self._pending[0][1] if self._pending else 0.0
+        METRICS.set('pca_parser_git_pending', pending)
+        METRICS.set('pca_parser_git_oldest_pending_seconds', round(oldest, 3))
+
+    def add(self, json_path, json_filename):
+        """Queue a JSON output for the next commit"""
+        with self._cond:
+            self._sources[json_filename] = json_path
+            if json_filename not in (name for name, _ in self._pending):
+                self._pending.append((json_filename, time.monotonic()))
+            logger.info(f"Queued {json_filename} for git ({len(self._pending)} pending)")
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping and not self._batch_ready():
+                    if self._pending:
+                        age = time.monotonic() - self._pending[0][1]
+                        self._cond.wait(max(0.05, self.batch_window - age))
+                    else:
+                        self._cond.wait()
+                if self._stopping:
+                    return
+            with self.profiler.profile('git-batch'):
+                self.flush()
+
+    def _batch_ready(self):
+        if not self._pending:
+            return False
+        if len(self._pending) >= self.batch_size:
+            return True
+        return time.monotonic() - self._pending[0][1] >= self.batch_window
+
+    def _configure(self, repo):
+        if not self._configured:
+            repo.git.config('--local', 'user.name', self.username)
+            repo.git.config('--local', 'user.email', self.email)
+            self._configured = True
+
+    def _requeue(self, batch):
+        """Put a batch that did not reach the remote back at the front of the queue"""
+        with self._cond:
+            queued = {name for name, _ in self._pending}
+            now = time.monotonic()
+            self._pending[:0] = [(name, now) for name in batch if name not in queued]
+
+    def flush(self):
+        """Commit and push every pending file as one commit; returns the pushed commit sha"""
+        with self._git_lock:
+            with self._cond:
+                batch = [name for name, _ in self._pending]
+                sources = {name: self._sources[name] for name in batch}
+                self._pending = []
+            if not batch:
+                return None
+
+            try:
+                repo = Repo(self.repo_dir)
+                self._configure(repo)
+                self._abort_rebase(repo)
+                base = repo.head.commit.hexsha
+                batch = self._copy_in(batch, sources)
+                if not batch:
+                    return None
+                repo.git.add(*[os.path.join(self.json_repo_path, name) for name in batch])
+
+                if not repo.git.diff('--cached', '--name-only'):
+                    logger.info(f"No changes to {', '.join(batch)}")
+                    self._forget(batch)
+                    METRICS.inc('pca_parser_git_batches_total', result='unchanged')
+                    return None
+
+                if len(batch) == 1:
+                    commit_message = f"Auto-commit: Added {batch[0]}"
+                else:
+                    commit_message = f"Auto-commit: Added {len(batch)} files\n\n" + "\n".join(f"- {name}" for name in batch)
+                with METRICS.time('pca_parser_git_seconds', op='commit'):
+                    repo.index.commit(commit_message)
+
+                try:
+                    self._sync_and_push(repo)
+                except PublishError as publish_error:
+                    self._rollback(repo, base)
+                    self._requeue(batch)
+                    self.failed_batches += 1
+                    METRICS.inc('pca_parser_git_batches_total', result='failed')
+                    logger.error(f"Git: {publish_error}; {len(batch)} file(s) requeued for the next batch")
+                    return None
+
+                sha = repo.head.commit.hexsha
+                self._forget(batch)
+                self._record(batch, sha)
+                METRICS.inc('pca_parser_git_batches_total', result='pushed')
+                METRICS.inc('pca_parser_git_files_total', len(batch))
+                logger.info(f"Git: Committed and pushed {len(batch)} file(s) in {sha[:8]}")
+                return sha
+
+            except Exception as git_error:
+                self._requeue(batch)
+                self.failed_batches += 1
+                METRICS.inc('pca_parser_git_batches_total', result='failed')
+                logger.error(f"Git operation failed: {str(git_error)}\n{traceback.format_exc()}")
+                return None
+
+    def _copy_in(self, batch, sources):
+        """Copy the batch's outputs into json/; returns the names that were copied"""
+        os.makedirs(self.json_repo_path, exist_ok=True)
+        copied = []
+        for name in batch:
+            try:
+                shutil.copy2(sources[name], os.path.join(self.json_repo_path, name))
+                copied.append(name)
+            except OSError as copy_error:
+                logger.error(f"Git: cannot copy {sources[name]} into the checkout, skipping it: {copy_error}")
+        self._forget([name for name in batch if name not in copied])
+        return copied
+
+    def _forget(self, batch):
+        """Drop the source paths of published files that were not queued again"""
+        with self._cond:
+            queued = {name for name, _ in self._pending}
+            for name in batch:
+                if name not in queued:
+                    self._sources.pop(name, None)
+
+    def _abort_rebase(self, repo):
+        """Abort a rebase left in progress so the checkout has no unmerged entries"""
+        git_dir = repo.git_dir
+        if os.path.isdir(os.path.join(git_dir, 'rebase-merge')) or os.path.isdir(os.path.join(git_dir, 'rebase-apply')):
+            logger.warning("Aborting an unfinished rebase in the git checkout")
+            repo.git.rebase('--abort')
+
+    def _rollback(self, repo, base):
+        """Drop the unpushed batch commit, keeping its files in the working tree"""
+        self._abort_rebase(repo)
+        target = f"{self.remote}/{self.branch}"
+        try:
+            repo.git.rev_parse('--verify', target)
+        except Exception:
+            target = base
+        repo.git.reset('--mixed', target)
+
+    def _sync_and_push(self, repo):
+        """Rebase the local commit onto the remote branch and push, with retries.
+
+        When the remote changed the same outputs the rebase is aborted and
+        retried keeping the local versions, which are the newer conversions.
+        Raises PublishError if the batch still cannot be pushed.
+        """
+        max_retries = 3
+        for attempt in range(1, max_retries + 1):
+            try:
+                with METRICS.time('pca_parser_git_seconds', op='fetch'):
+                    repo.git.fetch(self.remote)
+                try:
+                    with METRICS.time('pca_parser_git_seconds', op='pull'):
+                        repo.git.pull('--rebase', '--autostash', self.remote, self.branch)
+                except Exception as rebase_error:
+                    logger.warning(f"Rebase onto {self.remote}/{self.branch} failed, retrying with local outputs preferred: {rebase_error}")
+                    self._abort_rebase(repo)
+                    # During a rebase "theirs" is the commit being replayed, i.e. this batch
+                    with METRICS.time('pca_parser_git_seconds', op='pull'):
+                        repo.git.pull('--rebase', '--autostash', '-X', 'theirs', self.remote, self.branch)
+                with METRICS.time('pca_parser_git_seconds', op='push'):
+                    repo.git.push(self.remote, self.branch)
+                return
+            except Exception as push_error:
+                self._abort_rebase(repo)
+                if attempt == max_retries:
+                    raise PublishError(f"push failed after {max_retries} attempts: {push_error}")
+                logger.warning(f"Push attempt {attempt} failed, retrying...")
+                time.sleep(2)  # Wait before retry
+
+    def _record(self, batch, sha):
+        """Remember which pushed commit each file landed in"""
+        timestamp = datetime.datetime.now().isoformat()
+        for name in batch:
+            self.commits.pop(name, None)
+            self.commits[name] = sha
+        while len(self.commits) > self.COMMITS_KEPT:
+            self.commits.popitem(last=False)
+        if self.publish_log:
+            with open(self.publish_log, 'a') as log_file:
+                for name in batch:
+                    log_file.write(json.dumps({'file': name, 'commit': sha, 'pushed': True, 'time': timestamp}) + "\n")
+
+class ShareWatcher:
+    """Watches a network share with os.scandir instead of full snapshots.
+
+    Keeps a compact name -> (size, mtime, inode) map of supported files and
+    calls callback(path) for anything new or changed. Polling runs every
+    min_interval seconds right after activity and backs off towards
+    max_interval while the share is idle. Quacks like a watchdog observer
+    (start/stop/is_alive/join) so main() can manage it alongside them.
+    """
+
+    def __init__(self, path, callback, extensions=SUPPORTED_EXTENSIONS,
+                 min_interval=1.0, max_interval=30.0, backoff=1.5):
+        self.path = path
+        self.callback = callback
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.snapshot = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.polls = 0
+        self.errors = 0
+        self.last_poll_seconds = 0.0
+        self.total_poll_seconds = 0.0
+        self.max_poll_seconds = 0.0
+        self.last_entries = 0
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="share-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def poll(self):
+        """Scan the share once; returns the paths reported as new or changed"""
+        started = time.perf_counter()
+        current = {}
+        entries = 0
+        with os.scandir(self.path) as it:
+            for entry in it:
+                entries += 1
+                if not entry.name.lower().endswith(self.extensions):
+                    continue
+                try:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue  # Removed between listing and stat
+                current[entry.name] = (st.st_size, st.st_mtime_ns, st.st_ino)
+
+        changed = [name for name, sig in current.items() if self.snapshot.get(name) != sig]
+        self.snapshot = current
+
+        elapsed = time.perf_counter() - started
+        self.polls += 1
+        self.last_entries = entries
+        self.last_poll_seconds = elapsed
+        self.total_poll_seconds += elapsed
+        self.max_poll_seconds = max(self.max_poll_seconds, elapsed)
+        METRICS.observe('pca_parser_share_poll_seconds', elapsed)
+        METRICS.set('pca_parser_share_entries', entries)
+        if elapsed > 1.0:
+            logger.warning(f"Slow share poll: {elapsed:.2f}s for {entries} entries in {self.path}")
+
+        # Poll fast after activity, back off while idle
+        if changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+
+        paths = [os.path.join(self.path, name) for name in sorted(changed)]
+        for file_path in paths:
+            self.callback(file_path)
+        return paths
+
+    def stats(self):
+        """Per-poll cost of watching the share"""
+        return {
+            'polls': self.polls,
+            'errors': self.errors,
+            'entries': self.last_entries,
+            'tracked': len(self.snapshot),
+            'interval': round(self.interval, 2),
+            'last_poll_ms': round(self.last_poll_seconds * 1000, 2),
+            'avg_poll_ms': round(self.total_poll_seconds * 1000 / self.polls, 2) if self.polls else 0.0,
+            'max_poll_ms': round(self.max_poll_seconds * 1000, 2),
+        }
+
+    def _run(self):
+        logger.info(f"Share watcher started for {self.path}")
+        while not self._stop_event.is_set():
+            try:
+                self.poll()
+            except OSError as e:
+                # Share dropped; keep retrying while the mount check remounts it
+                self.errors += 1
+                METRICS.inc('pca_parser_share_poll_errors_total')
+                self.interval = min(self.interval * self.backoff, self.max_interval)
+                logger.error(f"Share poll failed for {self.path}: {str(e)}")
+            except Exception as e:
+                self.errors += 1
+                METRICS.inc('pca_parser_share_poll_errors_total')
+                logger.error(f"Share poll error: {str(e)}\n{traceback.format_exc()}")
+            self._stop_event.wait(self.interval)
+
+def observer_paths(observer):
+    """Paths watched by a watchdog observer or ShareWatcher, for logging"""
+    if isinstance(observer, ShareWatcher):
+        return [observer.path]
+    return [w.path for w in observer._watches]
+
+class FileStabilizer:
+    """Holds paths until their writer has finished with them.
+
+    A path is handed to ready_func once its size and mtime have not changed
+    for quiet_period seconds, or straight away after a close or rename signal.
+    Any number of events for the same path collapse into one entry, and
+    nothing is released while a sibling "<name>.lock" file exists.
+    """
+
+    def __init__(self, ready_func, quiet_period=2.0, interval=0.5):
+        self.ready_func = ready_func
+        self.quiet_period = quiet_period
+        self.interval = interval
+        self._watching = {}  # path -> {'size', 'mtime', 'stable_since', 'signalled'}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.events = 0
+        self.collapsed = 0
+        self.released = 0
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="file-stabilizer", daemon=True)
+        self._thread.start()
+        logger.info(f"File stabilizer started (quiet period {self.quiet_period}s)")
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._watching)
+
+    def observe(self, file_path, ready=False):
+        """Note activity on a path; ready=True marks an explicit completion signal"""
+        with self._lock:
+            self.events += 1
+            entry = self._watching.get(file_path)
+            if entry is None:
+                self._watching[file_path] = {
+                    'size': None, 'mtime': None,
+                    'stable_since': time.monotonic(), 'signalled': ready
+                }
+            else:
+                self.collapsed += 1
+                entry['signalled'] = entry['signalled'] or ready
+
+    def check(self):
+        """Stat every watched path once and release the ones that are complete"""
+        now = time.monotonic()
+        released = []
+        with self._lock:
+            for file_path, entry in list(self._watching.items()):
+                try:
+                    st = os.stat(file_path)
+                except OSError:
+                    # Deleted or renamed away before it settled
+                    del self._watching[file_path]
+                    continue
+                if os.path.exists(file_path + '.lock'):
+                    entry['stable_since'] = now
+                    continue
+                changed = (st.st_size, st.st_mtime) != (entry['size'], entry['mtime'])
+                entry['size'], entry['mtime'] = st.st_size, st.st_mtime
+                if entry['signalled'] and st.st_size > 0:
+                    released.append(file_path)
+                elif changed or st.st_size == 0:
+                    entry['stable_since'] = now
+                elif now - entry['stable_since'] >= self.quiet_period:
+                    released.append(file_path)
+            for file_path in released:
+                del self._watching[file_path]
+            self.released += len(released)
+
+        for file_path in released:
+            logger.info(f"File is complete, handing off: {file_path}")
+            try:
+                self.ready_func(file_path)
+            except Exception as e:
+                logger.error(f"Failed to hand off {file_path}: {str(e)}\n{traceback.format_exc()}")
+        return released
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.check()
+
 class FileHandler(FileSystemEventHandler):
     def __init__(self, input_dir, output_dir, archive_dir, config):
         self.input_dir = input_dir
         self.output_dir = output_dir
         self.archive_dir = archive_dir
         self.config = config  # Store config
-        self.processed_files = set()  # Track processed files
+        self.share_dir = config_value(config, 'Paths', 'network_share', '/mnt/windows_share')
+        # Persistent record of ingested files
+        self.ledger = IngestLedger(
+            config_value(config, 'Processing', 'ledger_path', DEFAULT_LEDGER_PATH),
+            max_entries=config_value(config, 'Processing', 'ledger_max_entries', 100000, int),
+            retention_days=config_value(config, 'Processing', 'ledger_retention_days', 365, int)
+        )
+        self.ingest_queue = None  # Set by main() to process files off the observer thread
+        self.git_publisher = None  # Set by main() to commit outputs in batches
+        self.stabilizer = None  # Set by main() to wait for writes to finish
+        self.profiler = profiling.Profiler()  # Set by main() to profile a sample of files
         logger.info(f"Initialized handler with: input={input_dir}, output={output_dir}, archive={archive_dir}")
-        logger.info(f"Git config: username={self.config['Git']['USERNAME']}, branch={self.config['Git']['BRANCH']}")
+        logger.info(f"Git config: username={config_value(config, 'Git', 'USERNAME')}, branch={config_value(config, 'Git', 'BRANCH')}")
 
     def on_any_event(self, event):
         """Catch all events for debugging"""
@@ -44,86 +1030,144 @@ class FileHandler(FileSystemEventHandler):
             
         logger.info(f"Event type: {event.event_type}, path: {event.src_path}")
         
+        if self.stabilizer is not None:
+            # Only track convertible files, not e.g. our own readme files
+            path = event.dest_path if event.event_type == 'moved' else event.src_path
+            if not path.lower().endswith(SUPPORTED_EXTENSIONS):
+                return
+            # Let the stabilizer decide when the file is complete
+            if event.event_type in ('created', 'modified'):
+                self.stabilizer.observe(event.src_path)
+            elif event.event_type == 'closed':
+                self.stabilizer.observe(event.src_path, ready=True)
+            elif event.event_type == 'moved':
+                # Writers that rename into place signal completion; ignore moves out (e.g. to archive)
+                if os.path.dirname(event.dest_path) == os.path.dirname(event.src_path):
+                    self.stabilizer.observe(event.dest_path, ready=True)
+            return
+        
         # Only process created events for network share
-        if '/mnt/windows_share' in event.src_path:
+        if self.is_share_path(event.src_path):
             if event.event_type == 'created':
-                self.process_file(event.src_path)
+                self.dispatch_file(event.src_path)
         # For local directory, only process modified events
         elif event.event_type == 'modified':
-            self.process_file(event.src_path)
+            self.dispatch_file(event.src_path)
+
+    def observe_path(self, file_path):
+        """Entry point for the share watcher: new or changed file on the share"""
+        if not file_path.lower().endswith(SUPPORTED_EXTENSIONS):
+            return
+        if self.stabilizer is not None:
+            self.stabilizer.observe(file_path)
+        else:
+            self.dispatch_file(file_path)
+
+    def dispatch_file(self, file_path):
+        """Hand a file to the worker pool, or process it inline if there is none"""
+        if self.is_processed(file_path):
+            logger.debug(f"Skipping already processed file: {file_path}")
+            return
+        if self.ingest_queue is not None:
+            self.ingest_queue.submit(file_path)
+        else:
+            self.process_file(file_path)
+
+    def is_processed(self, file_path):
+        return self.ledger.contains(file_path)
+
+    def mark_processed(self, file_path, stat_result=None, content_hash=None, output=None):
+        if stat_result is None:
+            try:
+                stat_result = os.stat(file_path)
+            except OSError:
+                stat_result = None
+        self.ledger.record(
+            file_path,
+            size=stat_result.st_size if stat_result else None,
+            mtime=stat_result.st_mtime if stat_result else None,
+            sha256=content_hash,
+            output=output
+        )
+
+    def is_share_path(self, file_path):
+        return os.path.abspath(file_path).startswith(self.share_dir.rstrip('/') + '/')
 
     def process_file(self, file_path):
+        """Hash, convert, archive and publish a file, streaming it from local disk"""
+        with self.profiler.profile(os.path.basename(file_path)):
+            self._process_file(file_path)
+
+    def _process_file(self, file_path):
         try:
             # Skip if file was already processed
-            if file_path in self.processed_files:
+            if self.is_processed(file_path):
                 logger.debug(f"Skipping already processed file: {file_path}")
                 return
 
             logger.info(f"Processing file: {file_path}")
-            if not file_path.endswith('.pca'):
-                logger.info(f"Skipping non-PCA file: {file_path}")
+            if not file_path.lower().endswith(SUPPORTED_EXTENSIONS):
+                logger.info(f"Skipping unsupported file: {file_path}")
                 return
 
             # Replace spaces with underscores in filename
             filename = os.path.basename(file_path)
             safe_filename = filename.replace(' ', '_')
+            from_share = self.is_share_path(file_path)
+            source = 'share' if from_share else 'local'
+            started = time.perf_counter()
             
-            logger.info(f"Processing PCA file: {filename} (safe name: {safe_filename})")
+            logger.info(f"Processing file: {filename} (safe name: {safe_filename}, from share: {from_share})")
 
-            # If file is from network share, copy to input directory
-            if '/mnt/windows_share' in file_path:
-                logger.info(f"File from network share, copying to input directory")
-                local_path = os.path.join(self.input_dir, safe_filename)
-                
-                # Ensure input directory exists
-                os.makedirs(self.input_dir, exist_ok=True)
-                
-                try:
-                    shutil.copy2(file_path, local_path)
-                    logger.info(f"Copied to: {local_path}")
-                    # Remove original file from share
-                    os.remove(file_path)
-                    logger.info(f"Removed original file from share")
-                    # Add both paths to processed files
-                    self.processed_files.add(file_path)
-                    self.processed_files.add(local_path)
-                    return  # Let the local file watcher handle the processing
-                except Exception as copy_error:
-                    logger.error(f"Failed to copy file: {str(copy_error)}\n{traceback.format_exc()}")
-                    return
-
-            # Convert PCA to JSON
+            # Convert to JSON
+            staged_path = None
+            file_format = 'unknown'
             try:
-                with open(file_path, 'r') as pca_file:
-                    pca_data = pca_file.read()
-                    
-                # Parse PCA data and convert to JSON
-                json_data = self.convert_pca_to_json(pca_data)
+                file_stat = os.stat(file_path)
+                with METRICS.time('pca_parser_stage_seconds', stage='read', source=source):
+                    if from_share:
+                        # One read over SMB: copy to a local staging file, hashing on the way
+                        staged_path = os.path.join(self.archive_dir, f".{safe_filename}.staged")
+                        content_hash, head = hash_file(file_path, copy_to=staged_path)
+                    else:
+                        content_hash, head = hash_file(file_path)
+                METRICS.inc('pca_parser_bytes_total', file_stat.st_size, source=source)
+                local_path = staged_path or file_path
+                converter = get_converter(safe_filename, head)
+                file_format = converter.name if converter else 'unknown'
                 
-                # Save JSON file - use safe filename
-                json_filename = os.path.splitext(safe_filename)[0] + '.json'
+                json_filename = service_output_name(safe_filename, head)
                 json_path = os.path.join(self.output_dir, json_filename)
                 
-                # Ensure output directory exists
-                os.makedirs(self.output_dir, exist_ok=True)
-                
-                with open(json_path, 'w') as json_file:
-                    json.dump(json_data, json_file, indent=4)
+                # Reuse the output of an earlier ingest with identical content
+                duplicate = self.ledger.find_output(content_hash)
+                earlier_output = os.path.join(self.output_dir, duplicate[1]) if duplicate else None
+                reused = bool(earlier_output and os.path.exists(earlier_output))
+                if reused:
+                    logger.info(f"Identical content already ingested from {duplicate[0]}, reusing {duplicate[1]}")
+                    if os.path.abspath(earlier_output) != os.path.abspath(json_path):
+                        with atomic_output(json_path) as out, open(earlier_output, 'rb') as earlier_file:
+                            shutil.copyfileobj(earlier_file, out)
+                    sidecar_path = None
+                else:
+                    # Stream the conversion from the local copy - use safe filename
+                    with METRICS.time('pca_parser_stage_seconds', stage='convert', source=source):
+                        sidecar_path = self.convert_to_file(local_path, safe_filename, head, json_path)
                 logger.info(f"Created JSON file: {json_path}")
+                with METRICS.time('pca_parser_stage_seconds', stage='check', source=source):
+                    anomaly_path = self.monitor_pcp(local_path, safe_filename, head, json_path)
+                    trajectory_path = self.check_trajectory(file_path, local_path, safe_filename, head, json_path)
                 
-                # Move original PCA file to archive - use safe filename
-                archive_path = os.path.join(self.archive_dir, safe_filename)
-                
-                # Ensure archive directory exists
-                os.makedirs(self.archive_dir, exist_ok=True)
-                
-                shutil.move(file_path, archive_path)
-                logger.info(f"Moved PCA file to archive: {archive_path}")
+                # Archive the original - use safe filename
+                with METRICS.time('pca_parser_stage_seconds', stage='archive', source=source):
+                    self.archive_source(file_path, safe_filename, staged_path)
+                staged_path = None
                 
                 # Create readme file
                 base_name = os.path.splitext(filename)[0]
                 readme_filename = f"{base_name}_metadataparser_readme.txt"
                 readme_path = os.path.join(self.input_dir, readme_filename)
+                os.makedirs(self.input_dir, exist_ok=True)
                 with open(readme_path, "w") as readme_file:
                     readme_file.write(
                         f"This file indicates that '{filename}' has been parsed and archived.\n"
@@ -131,117 +1175,148 @@ class FileHandler(FileSystemEventHandler):
                         f"A copy of the original is in '{self.archive_dir}'"
                     )
                 
-                # Git operations
-                try:
-                    repo_dir = "/opt/pca_parser/gitrepo"
-                    # Create json directory in repo if it doesn't exist
-                    json_repo_path = os.path.join(repo_dir, 'json')
-                    os.makedirs(json_repo_path, exist_ok=True)
-                    
-                    # Copy JSON to git repo
-                    repo_json_path = os.path.join(json_repo_path, json_filename)
-                    shutil.copy2(json_path, repo_json_path)
-                    
-                    # Git operations
-                    repo = Repo(repo_dir)
-                    repo.git.config('--local', 'user.name', self.config['Git']['USERNAME'])
-                    repo.git.config('--local', 'user.email', 'jtrue15@ufl.edu')
-                    
-                    # Fetch and pull latest changes
-                    try:
-                        origin = repo.remote('origin')
-                        fetch_info = origin.fetch()
-                        if fetch_info:
-                            logger.info("Fetched latest changes")
-                            # Stash any uncommitted changes
-                            if repo.is_dirty(untracked_files=True):
-                                logger.info("Stashing uncommitted changes")
-                                repo.git.stash('save')
-                            
-                            # Pull with rebase strategy
-                            repo.git.pull('--rebase', 'origin', self.config['Git']['BRANCH'])
-                            
-                            # Pop stash if we stashed changes
-                            if repo.git.stash('list'):
-                                logger.info("Popping stashed changes")
-                                repo.git.stash('pop')
-                    except Exception as fetch_error:
-                        logger.warning(f"Error lines received while fetching: {str(fetch_error)}")
-                    
-                    # Only add the specific JSON file
-                    repo.git.add(repo_json_path)
-                    
-                    # Check if there are changes to the specific file
-                    if repo.git.diff('--cached', '--name-only'):
-                        commit_message = f"Auto-commit: Added {json_filename}"
-                        repo.index.commit(commit_message)
-                        
-                        # Try push with retries
-                        max_retries = 3
-                        retry_count = 0
-                        while retry_count < max_retries:
-                            try:
-                                origin.push(self.config['Git']['BRANCH'])
-                                logger.info(f"Git: Committed and pushed {json_filename}")
-                                break
-                            except Exception as push_error:
-                                retry_count += 1
-                                if retry_count == max_retries:
-                                    raise
-                                logger.warning(f"Push attempt {retry_count} failed, retrying...")
-                                time.sleep(2)  # Wait before retry
-                    else:
-                        logger.info(f"No changes to {json_filename}")
-                        
-                except Exception as git_error:
-                    logger.error(f"Git operation failed: {str(git_error)}\n{traceback.format_exc()}")
+                # Hand off to the batched git publisher
+                with METRICS.time('pca_parser_stage_seconds', stage='publish', source=source):
+                    if sidecar_path:
+                        self.publish_json(sidecar_path, os.path.basename(sidecar_path))
+                    for report_path in (anomaly_path, trajectory_path):
+                        if report_path:
+                            self.publish_json(report_path, os.path.basename(report_path))
+                    self.publish_json(json_path, json_filename)
                 
             except Exception as convert_error:
                 logger.error(f"Conversion failed: {str(convert_error)}\n{traceback.format_exc()}")
+                METRICS.inc('pca_parser_files_total', source=source, format=file_format, result='failed')
                 return
+            finally:
+                if staged_path and os.path.exists(staged_path):
+                    os.remove(staged_path)
             
             logger.info(f"File processing complete: {filename}")
-            self.processed_files.add(file_path)
-            
-            # Periodically clean up processed files list (keep last 1000)
-            if len(self.processed_files) > 1000:
-                self.processed_files = set(list(self.processed_files)[-1000:])
+            self.mark_processed(file_path, file_stat, content_hash, json_filename)
+            METRICS.inc('pca_parser_files_total', source=source, format=file_format, result='reused' if reused else 'converted')
+            METRICS.observe('pca_parser_file_seconds', time.perf_counter() - started, source=source)
+            METRICS.observe('pca_parser_ingest_lag_seconds', max(0.0, time.time() - file_stat.st_mtime), source=source)
 
         except Exception as e:
             logger.error(f"Error processing file {file_path}: {str(e)}\n{traceback.format_exc()}")
 
-    def convert_pca_to_json(self, pca_data):
-        """Convert PCA data to JSON format using configparser"""
+    def archive_source(self, file_path, safe_filename, staged_path=None):
+        """Move the source into the archive directory.
+
+        Share files were already copied to staged_path in the archive
+        directory; that copy is renamed into place and the share file is
+        removed, so it is never read twice over SMB.
+        """
+        archive_path = os.path.join(self.archive_dir, safe_filename)
+        if staged_path:
+            os.replace(staged_path, archive_path)
+            os.remove(file_path)
+            logger.info(f"Archived share file to {archive_path} and removed it from the share")
+        else:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            shutil.move(file_path, archive_path)
+            logger.info(f"Moved source file to archive: {archive_path}")
+        return archive_path
+
+    def publish_json(self, json_path, json_filename):
+        """Queue a JSON output for the next batched git commit"""
+        if self.git_publisher is None:
+            logger.info(f"Git publishing disabled, not committing {json_filename}")
+            return
+        self.git_publisher.add(json_path, json_filename)
+
+    def convert_to_file(self, source_path, safe_filename, head, json_path):
+        """Convert a local source file into json_path.
+
+        Registry formats stream from the source through Converter.write, so
+        PCJ files never hold the whole file or every row in memory. Outputs
+        use the same JSON layout as the workflows and the converters CLI.
+        With [Processing] sidecar enabled, numeric PCJ/PCP columns are written
+        to a .npz next to the JSON; returns its path, or None.
+        """
+        converter = get_converter(safe_filename, head)
+        if converter is None:
+            raise ValueError(f"No converter for {safe_filename}")
+        if converter.name == 'pca':
+            # PCA keeps its nested sections and the service's indent=4 layout
+            with open(source_path, 'rb') as source:
+                json_data = self.convert_pca_to_json(source.read())
+            write_atomic(json_path, json.dumps(json_data, indent=4).encode('utf-8'))
+            return None
+        columnar_tables = config_value(self.config, 'Processing', 'columnar', False, parse_bool)
+        use_sidecar = config_value(self.config, 'Processing', 'sidecar', False, parse_bool)
+        if use_sidecar and converter.tables and not sidecar.available():
+            logger.warning(f"sidecar is enabled but numpy is not installed; writing {safe_filename} as plain JSON")
+            use_sidecar = False
+        with open(source_path, 'rb') as source, atomic_output(json_path, 'w', encoding='utf-8') as out:
+            if use_sidecar and converter.tables:
+                sidecar_path = os.path.join(os.path.dirname(json_path),
+                                            sidecar.sidecar_name(os.path.basename(json_path)))
+                if converter.write_with_sidecar(source, out, sidecar_path, columnar=columnar_tables):
+                    return sidecar_path
+                return None
+            converter.write(source, out, columnar=columnar_tables)
+        return None
+
+    def monitor_pcp(self, source_path, safe_filename, head, json_path):
+        """Write the tube/detector stability summary of a PCP file next to its JSON.
+
+        Runs when [Processing] pcp_monitor is enabled; the file is read one
+        line at a time with constant memory. Returns the summary path, or None.
+        """
+        if not config_value(self.config, 'Processing', 'pcp_monitor', False, parse_bool):
+            return None
+        converter = get_converter(safe_filename, head)
+        if converter is None or converter.name != 'pcp':
+            return None
+        summary = monitor_file(source_path)
+        summary['file'] = safe_filename
+        anomaly_path = os.path.join(os.path.dirname(json_path), anomaly_name(os.path.basename(json_path)))
+        write_atomic(anomaly_path, json.dumps(summary, indent=2).encode('utf-8'))
+        if summary['status'] != 'ok':
+            counts = ', '.join(f"{name} x{count}" for name, count in summary['counts'].items())
+            logger.warning(f"Stability anomalies in {safe_filename}: {counts}")
+        return anomaly_path
+
+    def check_trajectory(self, file_path, source_path, safe_filename, head, json_path):
+        """Write the trajectory report of a PCJ file next to its JSON.
+
+        Runs when [Processing] trajectory_check is enabled. The nominal
+        geometry comes from the scan's PCA, looked up next to the PCJ and then
+        in the archive. Returns the report path, or None.
+        """
+        if not config_value(self.config, 'Processing', 'trajectory_check', False, parse_bool):
+            return None
+        converter = get_converter(safe_filename, head)
+        if converter is None or converter.name != 'pcj':
+            return None
+        if not sidecar.available():
+            logger.warning(f"trajectory_check is enabled but numpy is not installed; not checking {safe_filename}")
+            return None
+        pca_path = next((path for path in (
+            f"{os.path.splitext(file_path)[0]}.pca",
+            os.path.join(self.archive_dir, f"{os.path.splitext(safe_filename)[0]}.pca"),
+        ) if os.path.exists(path)), None)
         try:
-            # Create a ConfigParser instance
-            parser = configparser.ConfigParser(interpolation=None)  # Disable interpolation
-            parser.optionxform = str  # Preserve case in keys
-            
-            # Read PCA data from string
-            parser.read_string(pca_data)
-            
-            # Convert to dictionary with proper type conversion
-            data_dict = {}
-            for section in parser.sections():
-                section_dict = {}
-                for key, value in parser.items(section):
-                    try:
-                        # Convert to float if decimal point present, else try integer
-                        if "." in value and not value.endswith('.tif'):  # Skip .tif files
-                            section_dict[key] = float(value)
-                        else:
-                            try:
-                                section_dict[key] = int(value)
-                            except ValueError:
-                                # Keep as string if conversion fails
-                                section_dict[key] = value
-                    except ValueError:
-                        # Keep as string if conversion fails
-                        section_dict[key] = value
-                data_dict[section] = section_dict
-                
-            return data_dict
-            
+            report = check_files(source_path, pca_path)
+        except ValueError as e:
+            logger.warning(f"Could not check the trajectory of {safe_filename}: {e}")
+            return None
+        report['file'] = safe_filename
+        if pca_path is None:
+            logger.info(f"No PCA found for {safe_filename}; checking rotation steps only")
+        report_path = os.path.join(os.path.dirname(json_path), trajectory_name(os.path.basename(json_path)))
+        write_atomic(report_path, json.dumps(report, indent=2).encode('utf-8'))
+        if report['status'] != 'ok':
+            logger.warning(f"Trajectory of {safe_filename} does not match its PCA: {', '.join(report['problems'])}, "
+                           f"{report['flagged']} of {report['projections']} projections flagged")
+        return report_path
+
+    def convert_pca_to_json(self, pca_data, flat=False):
+        """Convert PCA data (str or bytes) to a dict of sections, or one flat dict"""
+        try:
+            return parse_pca(pca_data, flat=flat)
         except Exception as e:
             logger.error(f"PCA to JSON conversion failed: {str(e)}\n{traceback.format_exc()}")
             raise
@@ -285,6 +1360,7 @@ def check_and_remount_share(config_path='/root/.smbcredentials'):
         ping_result = os.system(f"ping -c 1 -W 2 {windows_ip} >/dev/null 2>&1")
         if ping_result != 0:
             logger.error(f"Windows host {windows_ip} is not responding")
+            METRICS.set('pca_parser_share_mounted', 0)
             return False
 
         # Ensure mount point exists
@@ -320,17 +1396,23 @@ def check_and_remount_share(config_path='/root/.smbcredentials'):
                     try:
                         os.listdir('/mnt/windows_share')
                         logger.info(f"Successfully remounted share with SMB {vers}")
+                        METRICS.inc('pca_parser_remount_attempts_total', result='ok')
+                        METRICS.set('pca_parser_share_mounted', 1)
                         return True
                     except Exception:
                         logger.warning(f"Mount succeeded but share not accessible with SMB {vers}")
                         continue
             
             logger.error("Failed to remount share with all SMB versions")
+            METRICS.inc('pca_parser_remount_attempts_total', result='failed')
+            METRICS.set('pca_parser_share_mounted', 0)
             return False
             
+        METRICS.set('pca_parser_share_mounted', 1)
         return True
     except Exception as e:
         logger.error(f"Error in remount attempt: {str(e)}\n{traceback.format_exc()}")
+        METRICS.set('pca_parser_share_mounted', 0)
         return False
 
 def wait_for_network_and_mount():
@@ -372,19 +1454,50 @@ def wait_for_network_and_mount():
     logger.error("Failed to establish connection after 2 minutes")
     return False
 
-def main():
+def share_ready(path, managed=True):
+    """True if the share can be watched: mounted, or just present when the mount is not managed here"""
+    return os.path.ismount(path) if managed else os.path.isdir(path)
+
+def make_profiler(options, config):
+    """Profiler from --profile (or PCA_PROFILE), else from the [Profiling] section"""
+    limits = {
+        'max_dumps': config_value(config, 'Profiling', 'max_dumps', 500, int),
+        'summary_interval': config_value(config, 'Profiling', 'summary_interval', 300.0, float),
+    }
+    if options.profile:
+        return profiling.from_args(options, **limits)
+    return profiling.Profiler(
+        config_value(config, 'Profiling', 'dir', ''),
+        rate=config_value(config, 'Profiling', 'rate', 0.1, float),
+        top=config_value(config, 'Profiling', 'top', 30, int),
+        **limits
+    )
+
+def main(argv=None):
     """Main execution function."""
+    arg_parser = argparse.ArgumentParser(description="Watch for scan files, convert them to JSON and publish them")
+    arg_parser.add_argument('--config', default='/opt/pca_parser/config.ini', help="Config file (default /opt/pca_parser/config.ini)")
+    profiling.add_arguments(arg_parser)
+    options = arg_parser.parse_args(argv)
+
+    # The share is a CIFS mount this service keeps alive, unless [SharedDrive] mount is off
+    boot_config = configparser.ConfigParser()
+    boot_config.read(options.config)
+    share_managed = config_value(boot_config, 'SharedDrive', 'mount', True, parse_bool)
+
     # Add boot-time network and mount check
-    if not wait_for_network_and_mount():
+    if share_managed and not wait_for_network_and_mount():
         logger.error("Initial mount failed, continuing with local-only mode")
     
+    metrics_server = None
+    profiler = None
     while True:  # Outer loop for continuous service
         try:
             logger.info("Starting PCA parser service")
             
             # Read config
             config = configparser.ConfigParser()
-            config_path = '/opt/pca_parser/config.ini'
+            config_path = options.config
             logger.info(f"Reading config from: {config_path}")
             
             if not os.path.exists(config_path):
@@ -412,6 +1525,57 @@ def main():
             # Create handler with config
             event_handler = FileHandler(input_dir, output_dir, archive_dir, config)
             
+            # cProfile a sample of files and git batches when profiling is switched on
+            if profiler is None:
+                profiler = make_profiler(options, config)
+                if profiler.enabled:
+                    logger.info(f"Profiling {profiler.rate:.0%} of files and git batches into {profiler.output_dir}")
+            event_handler.profiler = profiler
+            
+            # Convert on worker threads so observers only enqueue paths
+            ingest_queue = IngestQueue(
+                event_handler.process_file,
+                workers=config_value(config, 'Processing', 'workers', 2, int),
+                max_size=config_value(config, 'Processing', 'queue_size', 100, int)
+            )
+            ingest_queue.start()
+            event_handler.ingest_queue = ingest_queue
+            
+            # Commit finished outputs in batches instead of one push per file
+            git_repo_dir = config_value(config, 'Paths', 'git_repo_dir', '/opt/pca_parser/gitrepo')
+            git_publisher = GitPublisher(
+                git_repo_dir,
+                branch=config_value(config, 'Git', 'BRANCH'),
+                username=config_value(config, 'Git', 'USERNAME'),
+                email=config_value(config, 'Git', 'EMAIL', 'jtrue15@ufl.edu'),
+                batch_window=config_value(config, 'Git', 'BATCH_WINDOW', 30, float),
+                batch_size=config_value(config, 'Git', 'BATCH_SIZE', 20, int),
+                publish_log=os.path.join(os.path.dirname(git_repo_dir), 'published.jsonl')
+            )
+            git_publisher.profiler = profiler
+            git_publisher.start()
+            event_handler.git_publisher = git_publisher
+            
+            # Only hand files on once the writer has finished with them
+            stabilizer = FileStabilizer(
+                event_handler.dispatch_file,
+                quiet_period=config_value(config, 'Processing', 'quiet_period', 2.0, float)
+            )
+            stabilizer.start()
+            event_handler.stabilizer = stabilizer
+            
+            # Per-stage latency, queue depth and git/share health for Prometheus
+            METRICS.collector('ingest_queue', ingest_queue.collect_metrics)
+            METRICS.collector('git_publisher', git_publisher.collect_metrics)
+            METRICS.collector('stabilizer', lambda: METRICS.set('pca_parser_stabilizer_pending', stabilizer.pending_count()))
+            metrics_port = config_value(config, 'Metrics', 'port', 0, int)
+            if metrics_server is None and metrics_port:
+                metrics_server = MetricsServer(METRICS, metrics_port, config_value(config, 'Metrics', 'host', '127.0.0.1'))
+                metrics_server.start()
+            metrics_file = config_value(config, 'Metrics', 'file', '')
+            metrics_interval = datetime.timedelta(seconds=config_value(config, 'Metrics', 'interval', 15.0, float))
+            last_metrics_write = datetime.datetime.min
+            
             # Set up observers
             observers = []
             
@@ -422,12 +1586,11 @@ def main():
             observers.append(observer_local)
             
             # Network share observer
-            if os.path.ismount(network_share):
+            if share_ready(network_share, share_managed):
                 logger.info(f"Setting up network share monitoring: {network_share}")
                 try:
-                    # Use PollingObserver for network share
-                    observer_network = PollingObserver(timeout=2)  # 2 second polling interval
-                    observer_network.schedule(event_handler, network_share, recursive=False)
+                    # Poll the share with scandir, backing off while idle
+                    observer_network = ShareWatcher(network_share, event_handler.observe_path)
                     observers.append(observer_network)
                     logger.info("Network share observer scheduled successfully")
                 except Exception as e:
@@ -445,13 +1608,15 @@ def main():
             # Start all observers
             for observer in observers:
                 observer.start()
-                logger.info(f"Started observer for paths: {[w.path for w in observer._watches]}")
+                logger.info(f"Started observer for paths: {observer_paths(observer)}")
             
             logger.info("File monitoring started")
             
             # Track last mount check time
             last_mount_check = datetime.datetime.now()
             mount_check_interval = datetime.timedelta(seconds=15)  # Check every 15 seconds
+            last_stats_log = datetime.datetime.now()
+            stats_log_interval = datetime.timedelta(seconds=60)  # Share poll cost, once a minute
             
             # Inner service loop
             while True:
@@ -459,11 +1624,26 @@ def main():
                 
                 # Check mount status periodically
                 now = datetime.datetime.now()
+                if metrics_file and now - last_metrics_write >= metrics_interval:
+                    last_metrics_write = now
+                    try:
+                        write_atomic(metrics_file, METRICS.render().encode('utf-8'))
+                    except OSError as e:
+                        logger.warning(f"Could not write metrics to {metrics_file}: {str(e)}")
                 if now - last_mount_check > mount_check_interval:
                     last_mount_check = now
                     
+                    queue_stats = ingest_queue.stats()
+                    if queue_stats['depth'] or queue_stats['in_flight']:
+                        logger.info(f"Ingest queue: {queue_stats}")
+                    if now - last_stats_log >= stats_log_interval:
+                        last_stats_log = now
+                        for observer in observers:
+                            if isinstance(observer, ShareWatcher):
+                                logger.info(f"Share watcher: {observer.stats()}")
+                    
                     # Check and remount if needed
-                    if not check_and_remount_share():
+                    if share_managed and not check_and_remount_share():
                         logger.warning("Mount check failed, will retry in 15 seconds")
                         # Force observer restart on next successful mount
                         for observer in observers:
@@ -477,6 +1657,7 @@ def main():
                     # If mount was restored, restart observers
                     if not any(observer.is_alive() for observer in observers):
                         logger.info("Restarting observers after mount recovery")
+                        METRICS.inc('pca_parser_observer_restarts_total', reason='mount_recovery')
                         try:
                             # Stop any existing observers
                             for observer in observers:
@@ -493,15 +1674,14 @@ def main():
                             observers.append(observer_local)
                             
                             # Recreate network observer if mount is available
-                            if os.path.ismount(network_share):
-                                observer_network = PollingObserver(timeout=2)
-                                observer_network.schedule(event_handler, network_share, recursive=False)
+                            if share_ready(network_share, share_managed):
+                                observer_network = ShareWatcher(network_share, event_handler.observe_path)
                                 observers.append(observer_network)
                             
                             # Start new observers
                             for observer in observers:
                                 observer.start()
-                                logger.info(f"Restarted observer for paths: {[w.path for w in observer._watches]}")
+                                logger.info(f"Restarted observer for paths: {observer_paths(observer)}")
                         except Exception as restart_error:
                             logger.error(f"Failed to restart observers: {str(restart_error)}")
                             # Don't raise, let the loop retry
@@ -510,6 +1690,7 @@ def main():
                 # Check if observers are alive
                 if not any(observer.is_alive() for observer in observers):
                     logger.error("All observers died, attempting recovery")
+                    METRICS.inc('pca_parser_observer_restarts_total', reason='died')
                     # Try to restart observers
                     try:
                         for observer in observers:
@@ -524,14 +1705,13 @@ def main():
                         observer_local.schedule(event_handler, input_dir, recursive=False)
                         observers.append(observer_local)
                         
-                        if os.path.ismount(network_share):
-                            observer_network = PollingObserver(timeout=2)
-                            observer_network.schedule(event_handler, network_share, recursive=False)
+                        if share_ready(network_share, share_managed):
+                            observer_network = ShareWatcher(network_share, event_handler.observe_path)
                             observers.append(observer_network)
                         
                         for observer in observers:
                             observer.start()
-                            logger.info(f"Restarted observer for paths: {[w.path for w in observer._watches]}")
+                            logger.info(f"Restarted observer for paths: {observer_paths(observer)}")
                         
                         if not any(observer.is_alive() for observer in observers):
                             raise RuntimeError("Failed to restart observers")
@@ -551,6 +1731,27 @@ def main():
                     observer.stop()
             except Exception:
                 pass
+            # Let workers finish what was already queued, then publish it
+            try:
+                stabilizer.stop()
+            except Exception:
+                pass
+            try:
+                ingest_queue.stop()
+            except Exception:
+                pass
+            try:
+                git_publisher.stop()
+            except Exception:
+                pass
+            try:
+                event_handler.ledger.close()
+            except Exception:
+                pass
+            try:
+                profiler.close()
+            except Exception:
+                pass
             time.sleep(5)  # Wait before restart
             continue  # Restart the service
 
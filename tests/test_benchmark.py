@@ -0,0 +1,41 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts'))
+import benchmark
+from benchmark import compare_baseline, convert_files, run_isolated, save_baseline
+
+INPUT_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'input')
+
+def test_isolated_cases_report_their_own_peak_rss():
+    """Test each case runs in its own process and reports time, output size and peak RSS"""
+    pcp = os.path.join(INPUT_DIR, 'TV Vizio PCB.pcp')
+    pca = os.path.join(INPUT_DIR, 'TV Vizio PCB.pca')
+    big, small = run_isolated([(convert_files, ([pcp], 1)), (convert_files, ([pca], 1))])
+    assert big['files'] == small['files'] == 1 and big['bytes'] > small['bytes'] > 0
+    if benchmark.peak_rss() is not None:
+        assert big['rss'] > small['rss'] > 0
+
+def test_baseline_round_trip_and_regressions(tmp_path):
+    """Test a saved baseline flags slower, larger and bigger results but not noise or new results"""
+    results = [
+        {'name': 'convert/pcp corpus', 'files': 3, 'seconds': 0.100, 'rss': 30 << 20, 'bytes': 1000},
+        {'name': 'convert/pca corpus', 'files': 17, 'seconds': 0.001, 'rss': 20 << 20, 'bytes': 500},
+    ]
+    path = tmp_path / 'baselines' / 'baseline.json'
+    save_baseline(path, results, {'repeat': 5})
+    baseline = json.loads(path.read_text())
+    assert baseline['settings'] == {'repeat': 5} and baseline['results']['convert/pca corpus']['bytes'] == 500
+    assert compare_baseline(results, baseline) == []
+
+    later = [
+        {'name': 'convert/pcp corpus', 'files': 3, 'seconds': 0.200, 'rss': 31 << 20, 'bytes': 2000},
+        {'name': 'convert/pca corpus', 'files': 17, 'seconds': 0.003, 'rss': 40 << 20, 'bytes': 500},
+        {'name': 'convert/vgl corpus', 'files': 2, 'seconds': 9.0},
+    ]
+    regressions = compare_baseline(later, baseline)
+    assert [line.split(' ', 2)[:2] for line in regressions] == \
+        [['convert/pcp', 'corpus:'], ['convert/pcp', 'corpus:'], ['convert/pca', 'corpus:']]
+    assert 'seconds 0.1 -> 0.2 (+100%)' in regressions[0] and 'bytes' in regressions[1] and 'rss' in regressions[2]
+    assert compare_baseline(later, baseline, tolerance=2.0) == []
@@ -0,0 +1,177 @@
+import pytest
+import json
+import os
+import shutil
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts'))
+from bulk import expand_inputs, main, summarize
+from converters import convert_bytes
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+INPUTS = ['Nano Di Side.pca', 'Nano Di Side.pcj', 'Nano Di Side.pcp', 'TV Vizio PCB.vgl']
+
+@pytest.fixture
+def tree(tmp_path):
+    """A small input tree with a nested folder and a file that is not an instrument file"""
+    root = tmp_path / 'input'
+    (root / 'nested').mkdir(parents=True)
+    for name in INPUTS[:2]:
+        shutil.copy(os.path.join(DATA_DIR, 'input', name), root / name)
+    for name in INPUTS[2:]:
+        shutil.copy(os.path.join(DATA_DIR, 'input', name), root / 'nested' / name)
+    (root / 'notes.txt').write_text('not a scan')
+    return root
+
+def test_expand_inputs_walks_dirs_and_globs(tree):
+    """Test directories keep their layout, globs go to the root and duplicates are dropped"""
+    inputs = expand_inputs([str(tree), str(tree / '*.pca'), str(tree / 'Nano Di Side.pcj')])
+    names = [(path.name, str(subdir)) for path, subdir in inputs]
+    assert names == [
+        ('Nano Di Side.pca', '.'),
+        ('Nano Di Side.pcj', '.'),
+        ('Nano Di Side.pcp', 'nested'),
+        ('TV Vizio PCB.vgl', 'nested'),
+    ]
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_convert_tree_matches_registry(tree, tmp_path, jobs):
+    """Test a bulk run writes the registry output for every file, mirroring the tree"""
+    out = tmp_path / 'output'
+    with pytest.raises(SystemExit) as exit_info:
+        main(['convert', str(tree), '--output-dir', str(out), '--jobs', jobs])
+    assert exit_info.value.code == 0
+
+    written = sorted(str(p.relative_to(out)) for p in out.rglob('*') if p.is_file())
+    assert written == [
+        'Nano Di Side.pca.json',
+        'Nano Di Side.pcj.json',
+        os.path.join('nested', 'Nano Di Side.pcp.json'),
+        os.path.join('nested', 'TV Vizio PCB.vgl.json'),
+    ]
+    for path in out.rglob('*.json'):
+        source = tree / path.relative_to(out).parent / path.name[:-len('.json')]
+        converter, result = convert_bytes(source.read_bytes(), source.name)
+        assert path.read_text(encoding='utf-8') == converter.dumps(result)
+
+def test_colliding_outputs_fail(tmp_path, capsys):
+    """Test two inputs with the same output name are refused rather than overwritten"""
+    for folder in ('a', 'b'):
+        (tmp_path / folder).mkdir()
+        shutil.copy(os.path.join(DATA_DIR, 'input', 'Nano Di Side.pca'), tmp_path / folder / 'Nano Di Side.pca')
+    out = tmp_path / 'output'
+    with pytest.raises(SystemExit) as exit_info:
+        main(['convert', str(tmp_path / '*' / '*.pca'), '--output-dir', str(out), '--jobs', '1'])
+    assert exit_info.value.code == 1
+    assert 'same output as' in capsys.readouterr().err
+    assert [p.name for p in out.iterdir()] == ['Nano Di Side.pca.json']
+
+def test_failed_file_leaves_no_output(tmp_path, capsys):
+    """Test a file that cannot be converted is reported and leaves nothing behind"""
+    (tmp_path / 'broken.vgl').write_bytes(b'\x1f\x8bnot gzip')
+    out = tmp_path / 'output'
+    with pytest.raises(SystemExit) as exit_info:
+        main(['convert', str(tmp_path / 'broken.vgl'), '--output-dir', str(out)])
+    assert exit_info.value.code == 1
+    assert 'Error converting' in capsys.readouterr().err
+    assert list(out.iterdir()) == []
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_profile_dumps_every_file_and_summarises(tree, tmp_path, capsys, jobs):
+    """Test --profile leaves one dump per converted file and a summary over all of them"""
+    out, profile_dir = tmp_path / 'output', tmp_path / 'profile'
+    with pytest.raises(SystemExit) as exit_info:
+        main(['convert', str(tree), '--output-dir', str(out), '--jobs', jobs, '--profile', str(profile_dir)])
+    assert exit_info.value.code == 0
+
+    names = sorted(os.listdir(profile_dir))
+    assert names[-2:] == ['aggregate.prof', 'summary.txt']
+    assert sorted(name.split('-', 3)[3] for name in names[:-2]) == sorted(f"{name.replace(' ', '_')}.prof" for name in INPUTS)
+    summary = (profile_dir / 'summary.txt').read_text()
+    assert summary.startswith('4 profiled') and 'convert_path' in summary
+    assert f"Profile summary: {profile_dir / 'summary.txt'}" in capsys.readouterr().out
+
+def test_summarize_reports_per_format_timing():
+    """Test the summary has throughput and one line per format"""
+    results = [
+        {'format': 'pcj', 'bytes': 1 << 20, 'seconds': 0.5, 'error': None},
+        {'format': 'pcj', 'bytes': 1 << 20, 'seconds': 0.25, 'error': None},
+        {'format': 'pca', 'bytes': 0, 'seconds': 0.1, 'error': 'ValueError: bad'},
+    ]
+    lines = summarize(results, 1.0)
+    assert lines[0].startswith('2 converted, 1 failed in 1.00s (2.0 files/s, 2.0 MiB/s)')
+    assert len(lines) == 2 and lines[1].split()[:2] == ['pcj', '2']
+
+def build(tree, out, *extra):
+    """Run bulk.py build inline and return its exit code"""
+    with pytest.raises(SystemExit) as exit_info:
+        main(['build', str(tree), '--output-dir', str(out), '--jobs', '1', *extra])
+    return exit_info.value.code
+
+def rebuilt(capsys):
+    """Names of the inputs the last build reconverted"""
+    return sorted(line.split(': ')[0].split(os.sep)[-1] for line in capsys.readouterr().out.splitlines()
+                  if line.startswith('Rebuild '))
+
+def test_build_skips_unchanged_inputs(tree, tmp_path, capsys):
+    """Test a second build converts nothing and a changed input is the only one redone"""
+    out = tmp_path / 'output'
+    assert build(tree, out) == 0
+    assert len(rebuilt(capsys)) == 4
+    assert build(tree, out) == 0
+    assert rebuilt(capsys) == []
+
+    with open(tree / 'Nano Di Side.pca', 'a') as f:
+        f.write('Comment=edited\n')
+    assert build(tree, out) == 0
+    assert rebuilt(capsys) == ['Nano Di Side.pca']
+
+def test_build_redoes_one_format_after_converter_change(tree, tmp_path, capsys, monkeypatch):
+    """Test changing one converter's version reconverts only that format"""
+    from converters import CONVERTERS
+    out = tmp_path / 'output'
+    assert build(tree, out) == 0
+    capsys.readouterr()
+    monkeypatch.setattr(CONVERTERS['pcp'], 'version', '2')
+    assert build(tree, out) == 0
+    assert rebuilt(capsys) == ['Nano Di Side.pcp']
+
+def test_build_redoes_modified_outputs(tree, tmp_path, capsys):
+    """Test an output edited or deleted by hand is rebuilt"""
+    out = tmp_path / 'output'
+    assert build(tree, out) == 0
+    capsys.readouterr()
+    (out / 'Nano Di Side.pcj.json').write_text('{}')
+    (out / 'nested' / 'TV Vizio PCB.vgl.json').unlink()
+    assert build(tree, out) == 0
+    assert rebuilt(capsys) == ['Nano Di Side.pcj', 'TV Vizio PCB.vgl']
+    assert (out / 'Nano Di Side.pcj.json').read_text() != '{}'
+
+def test_build_reports_and_prunes_orphans(tree, tmp_path, capsys):
+    """Test outputs of deleted inputs are reported, and removed with --prune"""
+    out = tmp_path / 'output'
+    assert build(tree, out) == 0
+    (tree / 'Nano Di Side.pca').unlink()
+    (out / 'notes.md').write_text('kept')
+    assert build(tree, out, '--dry-run') == 0
+    assert 'Orphaned output' in capsys.readouterr().out
+    assert build(tree, out, '--prune') == 0
+    assert not (out / 'Nano Di Side.pca.json').exists()
+    assert (out / 'notes.md').exists()
+    with open(out / '.manifest.json') as f:
+        assert sorted(key.split('/')[-1] for key in json.load(f)['entries']) == INPUTS[1:]
+
+def test_build_tracks_sidecars(tree, tmp_path, capsys):
+    """Test sidecars are recorded, and dropped when a later build turns them off"""
+    pytest.importorskip('numpy')
+    out = tmp_path / 'output'
+    assert build(tree, out, '--sidecar') == 0
+    with open(out / '.manifest.json') as f:
+        entries = json.load(f)['entries']
+    pcj = entries[(tree / 'Nano Di Side.pcj').as_posix()]
+    assert pcj['sidecar'] == 'Nano Di Side.pcj.npz' and (out / pcj['sidecar']).exists()
+    capsys.readouterr()
+
+    assert build(tree, out) == 0
+    assert rebuilt(capsys) == ['Nano Di Side.pcj', 'Nano Di Side.pcp']
+    assert not (out / 'Nano Di Side.pcj.npz').exists()
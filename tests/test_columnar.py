@@ -0,0 +1,81 @@
+import pytest
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts'))
+from columnar import RowView, as_rows, column, dumps, is_columnar, to_columnar
+from converters import CONVERTERS
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+@pytest.mark.parametrize("name,table_key", [
+    ('Nano Di Side.pcj', 'data'),
+    ('TV Vizio PCB.pcj', 'data'),
+    ('Nano Di Side.pcp', 'measurements'),
+    ('TV Vizio PCB.pcp', 'measurements'),
+])
+def test_row_view_round_trip(name, table_key):
+    """Test columnar output reads back as the original rows"""
+    converter = CONVERTERS[os.path.splitext(name)[1][1:]]
+    with open(os.path.join(DATA_DIR, 'input', name), 'rb') as f:
+        raw = f.read()
+
+    rows = converter.convert(raw)[table_key]
+    document = json.loads(converter.dumps(converter.convert(raw, columnar=True)))
+    table = document[table_key]
+
+    assert is_columnar(table)
+    assert table['schema']['rows'] == len(rows)
+    assert list(RowView(table)) == rows
+    assert as_rows(table)[-1] == rows[-1]
+    assert len(converter.dumps(document)) < len(converter.dumps(converter.convert(raw))) / 3
+
+def test_constant_columns_collapse():
+    """Test constant columns become scalars and types are recorded"""
+    table = to_columnar([
+        {'ImgNr': 1, 'XS': 0.0, 'Time': 'a'},
+        {'ImgNr': 2, 'XS': 0.0, 'Time': 'b'},
+        {'ImgNr': 3, 'XS': 0.0},
+    ])
+    schema = {c['name']: c for c in table['schema']['columns']}
+
+    assert table['columns']['XS'] == 0.0
+    assert schema['XS'] == {'name': 'XS', 'type': 'float', 'constant': True}
+    assert schema['ImgNr']['type'] == 'int'
+    assert table['columns']['Time'] == ['a', 'b', None]
+    assert column(table, 'XS') == [0.0, 0.0, 0.0]
+    assert RowView(table)[2] == {'ImgNr': 3, 'XS': 0.0}
+    assert RowView(table)[0:2] == [{'ImgNr': 1, 'XS': 0.0, 'Time': 'a'}, {'ImgNr': 2, 'XS': 0.0, 'Time': 'b'}]
+
+def test_mixed_int_float_column_keeps_values():
+    """Test a column mixing ints and floats is not coerced"""
+    rows = [{'v': 1}, {'v': 1.5}]
+    table = to_columnar(rows)
+    assert table['schema']['columns'][0]['type'] == 'mixed'
+    assert list(RowView(table)) == rows
+
+def test_dumps_matches_json():
+    """Test compact column arrays still produce equivalent JSON"""
+    document = {'info': {'a': 1}, 'data': to_columnar([{'x': i, 'y': 'k'} for i in range(5)])}
+    text = dumps(document, indent=2)
+    assert json.loads(text) == document
+    assert '"x": [0,1,2,3,4]' in text
+
+@pytest.mark.parametrize("name", ['Nano Di Side.pcj', 'Nano Di Side.pcp'])
+def test_script_columnar_output_matches_registry(name, tmp_path):
+    """Test pcj_to_json/pcp_to_json --columnar write the same compact text as the registry"""
+    from pcj_to_json import XRayLogParser
+    from pcp_to_json import PCPConverter
+
+    source = os.path.join(DATA_DIR, 'input', name)
+    output = tmp_path / 'out.json'
+    if name.endswith('.pcj'):
+        XRayLogParser(source).save_json(str(output), columnar=True)
+    else:
+        PCPConverter(source).save_json(str(output), columnar=True)
+
+    converter = CONVERTERS[os.path.splitext(name)[1][1:]]
+    with open(source, 'rb') as f:
+        expected = converter.dumps(converter.convert(f.read(), columnar=True))
+    assert output.read_text() == expected
@@ -0,0 +1,95 @@
+import pytest
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts'))
+from converters import CONVERTERS, convert_bytes, get_converter, service_output_name, supported_extensions
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+def corpus_files():
+    """Input files that have a committed output to compare against"""
+    cases = []
+    for name in sorted(os.listdir(os.path.join(DATA_DIR, 'input'))):
+        converter = get_converter(name)
+        if converter is None:
+            continue
+        output = os.path.join(DATA_DIR, 'output', converter.output_name(os.path.splitext(name)[0]))
+        if os.path.exists(output):
+            cases.append((name, output))
+    return cases
+
+@pytest.mark.parametrize("name,output", corpus_files())
+def test_registry_reproduces_committed_outputs(name, output):
+    """Test every format converts from bytes to the committed JSON"""
+    if name.endswith('.rtf'):
+        pytest.importorskip('striprtf')
+    with open(os.path.join(DATA_DIR, 'input', name), 'rb') as f:
+        data = f.read()
+    with open(output, 'r', encoding='utf-8') as f:
+        expected = json.load(f)
+
+    converter, result = convert_bytes(data, name)
+    assert json.loads(converter.dumps(result)) == expected
+
+@pytest.mark.parametrize("name,expected", [
+    ('Nano Di Side.pca', 'pca'),
+    ('Nano Di Side.pcj', 'pcj'),
+    ('Nano Di Side.pcp', 'pcp'),
+    ('TV Vizio PCB.pcr', 'pcr'),
+    ('TV Vizio PCB.vgl', 'vgl'),
+    ('Technique-USNM35717_.rtf', 'rtf'),
+])
+def test_content_sniffing(name, expected):
+    """Test formats are recognised without an extension"""
+    with open(os.path.join(DATA_DIR, 'input', name), 'rb') as f:
+        data = f.read()
+    assert get_converter('renamed.bin', data).name == expected
+    assert get_converter(name).name == expected
+
+def test_registry_metadata():
+    """Test declared extensions and output naming"""
+    assert set(supported_extensions()) == {'.pca', '.pcj', '.pcp', '.pcr', '.vgl', '.rtf'}
+    assert CONVERTERS['pcj'].output_name('Nano Di Side') == 'Nano Di Side.pcj.json'
+    assert CONVERTERS['rtf'].output_name('Technique') == 'Technique.json'
+    assert CONVERTERS['rtf'].requires == ('striprtf',)
+    assert set(supported_extensions(available_only=True)) <= set(supported_extensions())
+    assert get_converter('notes.txt', b'hello') is None
+    with pytest.raises(ValueError):
+        convert_bytes(b'hello', 'notes.txt')
+
+def test_service_output_names():
+    """Test the service's output naming per format, including the PCA/RTF clash"""
+    assert service_output_name('soak-00001-scan.pca') == 'soak-00001-scan.json'
+    assert service_output_name('soak-00001-scan.pcj') == 'soak-00001-scan.pcj.json'
+    assert service_output_name('my scan.vgl') == 'my_scan.vgl.json'
+    assert service_output_name('scan.rtf') == 'scan.rtf.json'
+    assert service_output_name('scan.bin', b'[Info]\n') == 'scan.pcj.json'
+    with pytest.raises(ValueError):
+        service_output_name('notes.txt', b'hello')
+
+def test_fingerprint_covers_the_registry(tmp_path, monkeypatch):
+    """Test editing converters.py itself changes every format's fingerprint"""
+    import converters
+
+    before = {name: converter.fingerprint() for name, converter in CONVERTERS.items()}
+    edited = tmp_path / 'converters.py'
+    with open(converters.__file__) as f:
+        edited.write_text(f.read() + '\n# edited\n')
+    monkeypatch.setattr(converters, '__file__', str(edited))
+    assert all(converter.fingerprint() != before[name] for name, converter in CONVERTERS.items())
+
+@pytest.mark.parametrize("name,output", corpus_files())
+@pytest.mark.parametrize("columnar", [False, True])
+def test_write_matches_dumps(name, output, columnar):
+    """Test the stream entry point writes the same text as dumps(convert())"""
+    import io
+    if name.endswith('.rtf'):
+        pytest.importorskip('striprtf')
+    with open(os.path.join(DATA_DIR, 'input', name), 'rb') as f:
+        data = f.read()
+    converter = get_converter(name)
+    out = io.StringIO()
+    converter.write(io.BytesIO(data), out, columnar=columnar)
+    assert out.getvalue() == converter.dumps(converter.convert(data, columnar=columnar))
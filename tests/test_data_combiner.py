@@ -0,0 +1,158 @@
+import pytest
+import json
+import os
+import shutil
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts'))
+pd = pytest.importorskip('pandas')
+from data_combiner import DataCombiner
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+SCANS = [
+    ('Nano Di Side', 'pca'),
+    ('TV Vizio PCB', 'pcj'),
+    ('Amazon echo 40 micron', 'pcp'),
+    ('TV Vizio PCB', 'pcr'),
+    ('Amazon echo 40 micron', 'vgl'),
+]
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """A working directory with a copy of data/output, as the workflow runs it"""
+    shutil.copytree(os.path.join(DATA_DIR, 'output'), tmp_path / 'data' / 'output')
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def write_scans(path, scans):
+    path.write_text(''.join(f"{name}|{scan_type}\n" for name, scan_type in scans))
+    return path
+
+def load_every_file(combiner, scans):
+    """The table as built before the catalog: one JSON load per scan and a pandas transpose"""
+    combined = {}
+    for name, scan_type in scans:
+        data = combiner.load_json_file(combiner.find_json_file(name, scan_type))
+        combined[f"{name} ({scan_type})"] = combiner.extract_key_metrics(data, scan_type)
+    df = pd.DataFrame(combined).transpose().fillna('N/A')
+    for col in df.columns:
+        df[col] = df[col].apply(lambda x: f"{x:.2f}" if isinstance(x, float) else str(x))
+    return df
+
+def test_catalog_table_matches_per_file_loads(workdir):
+    """Test the catalogued table has the same cells as loading every JSON"""
+    combiner = DataCombiner('data/catalog.db')
+    df, processed = combiner.combine_data(write_scans(workdir / 'scans.txt', SCANS))
+    expected = load_every_file(combiner, SCANS)
+    assert processed == [f"{name}.{scan_type}" for name, scan_type in SCANS]
+    assert list(df.index) == list(expected.index)
+    assert sorted(df.columns) == sorted(expected.columns)
+    pd.testing.assert_frame_equal(df[expected.columns], expected, check_dtype=False)
+
+def test_outputs_are_loaded_once(workdir, monkeypatch):
+    """Test a second run and a new combiner read nothing until an output changes"""
+    scans_file = write_scans(workdir / 'scans.txt', SCANS)
+    DataCombiner('data/catalog.db').combine_data(scans_file)
+
+    combiner = DataCombiner('data/catalog.db')
+    loads = []
+    original = combiner.load_json_file
+    monkeypatch.setattr(combiner, 'load_json_file', lambda path: loads.append(path) or original(path))
+    first, _ = combiner.combine_data(scans_file)
+    assert loads == []
+
+    output = workdir / 'data' / 'output' / 'Nano Di Side.pca.json'
+    data = json.loads(output.read_text())
+    data['Voltage'] = 99
+    output.write_text(json.dumps(data))
+    df, _ = combiner.combine_data(scans_file)
+    assert [path.name for path in loads] == ['Nano Di Side.pca.json']
+    assert df.loc['Nano Di Side (pca)', 'Voltage'] == '99.00'
+    assert df.drop(index='Nano Di Side (pca)').equals(first.drop(index='Nano Di Side (pca)'))
+
+def test_missing_scans_are_skipped(workdir, capsys):
+    """Test unknown scans and types are warned about and left out of the table"""
+    combiner = DataCombiner('data/catalog.db')
+    scans = [('Nano Di Side', 'pca'), ('missing', 'pca'), ('Nano Di Side', '../x'), ('Nano Di Side', 'pca')]
+    df, processed = combiner.combine_data(write_scans(workdir / 'scans.txt', scans))
+    assert processed == ['Nano Di Side.pca']
+    assert list(df.index) == ['Nano Di Side (pca)']
+    out = capsys.readouterr().out
+    assert "No matching file found for 'missing'" in out and 'Invalid scan type' in out
+
+def test_refresh_catalogues_output_dir(workdir):
+    """Test refresh ingests every typed output once and forgets deleted ones"""
+    combiner = DataCombiner('data/catalog.db')
+    loaded = combiner.catalog.refresh('data/output')
+    assert loaded == len(combiner.catalog) > 20
+    assert combiner.catalog.refresh('data/output') == 0
+
+    os.remove('data/output/Nano Di Side.pcj.json')
+    combiner.catalog.refresh('data/output')
+    assert ('Nano Di Side', 'pcj') not in combiner.catalog.metrics([('Nano Di Side', 'pcj')])
+    metrics = combiner.catalog.metrics([('Nano Di Side', 'pca')])[('Nano Di Side', 'pca')]
+    assert metrics == combiner.extract_key_metrics(
+        combiner.load_json_file('data/output/Nano Di Side.pca.json'), 'pca')
+
+def test_metric_types_round_trip(tmp_path):
+    """Test bools, ints, floats, case-folded names and None come back as stored"""
+    combiner = DataCombiner(str(tmp_path / 'catalog.db'))
+    source = tmp_path / 'a.json'
+    source.write_text('{}')
+    metrics = {'Flag': True, 'InitTimeOut': 60000, 'InitTimeout': 8000, 'x': 1.5, 'name': 'v|tome|x', 'gone': None}
+    combiner.catalog.ingest('a', 'pca', source, metrics)
+    combiner.catalog.ingest('b', 'pca', source, {'x': 2, 'Flag': False})
+    stored = combiner.catalog.metrics([('a', 'pca'), ('b', 'pca')])
+    assert stored[('a', 'pca')] == {k: v for k, v in metrics.items() if v is not None}
+    assert stored[('b', 'pca')] == {'x': 2, 'Flag': False}
+    assert type(stored[('a', 'pca')]['Flag']) is bool and type(stored[('b', 'pca')]['x']) is int
+
+def test_series_statistics_match_python(workdir):
+    """Test the NumPy summary of a PCP series matches the statistics module"""
+    import statistics
+    combiner = DataCombiner('data/catalog.db')
+    data = combiner.load_json_file('data/output/Nano Di Side.pcp.json')
+    metrics = combiner.extract_key_metrics(data, 'pcp')
+    rows = data['measurements']
+    for name in ('MeanGV', 'DevGV', 'U', 'I', 'XDShift'):
+        values = [row[name] for row in rows]
+        assert metrics[f"{name}_min"] == min(values) and metrics[f"{name}_max"] == max(values)
+        assert metrics[f"{name}_mean"] == pytest.approx(statistics.fmean(values))
+        assert metrics[f"{name}_std"] == pytest.approx(statistics.pstdev(values))
+        assert metrics[f"{name}_p50"] == statistics.median(values)
+    assert metrics['projections'] == len(rows)
+    assert metrics['duration_s'] == 23 * 60 + 35
+    assert metrics['RotPos_step_mean'] == pytest.approx(0.3)
+    assert metrics['last_ImgNr'] == rows[-1]['ImgNr']
+
+@pytest.mark.parametrize('name,scan_type', [('TV Vizio PCB', 'pcj'), ('Nano Di Side', 'pcp')])
+def test_series_statistics_are_layout_independent(tmp_path, name, scan_type):
+    """Test row, columnar and sidecar outputs of a scan give the same metrics"""
+    from converters import convert_path
+    combiner = DataCombiner(str(tmp_path / 'catalog.db'))
+    source = os.path.join(DATA_DIR, 'input', f"{name}.{scan_type}")
+    results = []
+    for layout, options in [('rows', {}), ('columnar', {'columnar': True}), ('sidecar', {'sidecar_output': True})]:
+        (tmp_path / layout).mkdir()
+        _, output = convert_path(source, tmp_path / layout, **options)
+        results.append(combiner.extract_key_metrics(combiner.load_json_file(output), scan_type))
+    assert (tmp_path / 'sidecar' / f"{name}.{scan_type}.npz").exists()
+    rows, columnar, sidecar = results
+    assert columnar == rows
+    assert sidecar.keys() == rows.keys()
+    for key, value in rows.items():
+        assert str(sidecar[key]) == str(value) if key.startswith('last_') else sidecar[key] == value, key
+
+def test_series_statistics_skip_gaps_and_text():
+    """Test missing values are ignored and columns that are absent or not numeric are left out"""
+    from data_combiner import SERIES, series_statistics
+    rows = [
+        {'RotPos': 0.0, 'MeanGV': 10.0, 'U': 'n/a', 'Time': '2021-07-23T12:00:00'},
+        {'RotPos': 1.0, 'U': 'n/a'},
+        {'RotPos': 2.5, 'MeanGV': 30.0, 'U': 'n/a', 'Time': '2021-07-23T12:00:10'},
+    ]
+    metrics = series_statistics(rows, SERIES['pcp'])
+    assert metrics['MeanGV_mean'] == 20.0 and metrics['MeanGV_p50'] == 20.0
+    assert not any(key.startswith(('U_', 'I_', 'DevGV_')) for key in metrics)
+    assert metrics['duration_s'] == 10.0
+    assert metrics['RotPos_step_mean'] == 1.25 and metrics['RotPos_step_max_dev'] == 0.25
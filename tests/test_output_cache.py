@@ -0,0 +1,82 @@
+import pytest
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts'))
+import output_cache
+from output_cache import OutputCache
+
+def write(path, document):
+    path.write_text(json.dumps(document))
+    return path
+
+def test_unchanged_file_is_a_hit(tmp_path):
+    """Test a second load returns the cached document and a changed file is re-read"""
+    path = write(tmp_path / 'a.json', {'rows': [1, 2, 3]})
+    cache = OutputCache()
+    first = cache.load(path)
+    assert cache.load(str(path)) is first
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+    write(path, {'rows': [1, 2, 3, 4]})
+    assert cache.load(path) == {'rows': [1, 2, 3, 4]}
+    assert cache.stats()['misses'] == 2 and len(cache) == 1
+
+def test_eviction_by_entries_and_bytes(tmp_path):
+    """Test the least recently used entries go first when either cap is exceeded"""
+    paths = [write(tmp_path / f"{i}.json", {'i': i, 'pad': 'x' * 100}) for i in range(4)]
+    size = os.path.getsize(paths[0])
+    cache = OutputCache(max_entries=2)
+    cache.load(paths[0])
+    cache.load(paths[1])
+    cache.load(paths[0])
+    cache.load(paths[2])
+    assert cache.stats()['evictions'] == 1
+    cache.load(paths[0])
+    assert cache.stats()['hits'] == 2
+
+    cache = OutputCache(max_bytes=size * 3)
+    for path in paths:
+        cache.load(path)
+    assert len(cache) == 3 and cache.bytes == size * 3 and cache.stats()['evictions'] == 1
+
+    cache = OutputCache(max_bytes=size - 1)
+    assert cache.load(paths[0])['i'] == 0
+    assert len(cache) == 0
+
+def test_disk_layer_skips_json_decoding(tmp_path, monkeypatch):
+    """Test a new cache over the same directory reads the marshal copy, and not after an edit"""
+    path = write(tmp_path / 'a.json', {'info': {'Version': 2.0}, 'data': [{'ImgNr': 1}]})
+    cache_dir = tmp_path / 'cache'
+    OutputCache(cache_dir=str(cache_dir)).load(path)
+
+    def no_json(f):
+        raise AssertionError("JSON decoded")
+
+    monkeypatch.setattr(output_cache.json, 'load', no_json)
+    cache = OutputCache(cache_dir=str(cache_dir))
+    assert cache.load(path) == {'info': {'Version': 2.0}, 'data': [{'ImgNr': 1}]}
+    assert cache.stats()['disk_hits'] == 1
+
+    monkeypatch.undo()
+    write(path, {'info': {'Version': 3.0}})
+    assert OutputCache(cache_dir=str(cache_dir)).load(path) == {'info': {'Version': 3.0}}
+
+def test_finish_applies_to_memory_only(tmp_path):
+    """Test finish maps what is kept in memory while disk keeps the plain JSON"""
+    path = write(tmp_path / 'a.json', {'n': 1})
+    cache_dir = str(tmp_path / 'cache')
+    assert OutputCache(cache_dir=cache_dir).load(path, lambda d: {**d, 'finished': True}) == {'n': 1, 'finished': True}
+    assert OutputCache(cache_dir=cache_dir).load(path) == {'n': 1}
+
+def test_combiner_metrics_leave_cached_documents_alone(tmp_path):
+    """Test extract_key_metrics copies the sections it extends"""
+    pytest.importorskip('pandas')
+    from data_combiner import DataCombiner
+    path = write(tmp_path / 'scan.pcj.json', {'info': {'Version': 2.0}, 'data': [{'ImgNr': 1, 'XS': 0.5}]})
+    combiner = DataCombiner(str(tmp_path / 'catalog.db'))
+    data = combiner.load_json_file(path)
+    combiner.extract_key_metrics(data, 'pcj')
+    assert combiner.load_json_file(path) is data
+    assert data['info'] == {'Version': 2.0}
@@ -17,6 +17,23 @@ def load_test_files():
     
     return pca_data, expected_json
 
+DATA_INPUT = os.path.join(os.path.dirname(__file__), '..', 'data', 'input')
+
+@pytest.fixture
+def make_handler(tmp_path):
+    """Factory for a FileHandler over fresh input/output/archive dirs; returns (handler, dirs)"""
+    def make(share=False, **processing):
+        names = ['input', 'output', 'archive'] + (['share'] if share else [])
+        dirs = {name: tmp_path / name for name in names}
+        for path in dirs.values():
+            path.mkdir()
+        config = {'Processing': {'ledger_path': str(tmp_path / 'ledger.db'), **processing}}
+        if share:
+            config['Paths'] = {'network_share': str(dirs['share'])}
+        handler = FileHandler(str(dirs['input']), str(dirs['output']), str(dirs['archive']), config)
+        return handler, dirs
+    return make
+
 def test_nano_di_side_conversion():
     """Test conversion of real Nano Di Side PCA file"""
     # Initialize handler
@@ -81,4 +98,669 @@ def test_specific_values(test_input, expected):
     pca_data, _ = load_test_files()
     
     result = handler.convert_pca_to_json(pca_data)
-    assert result[test_input] == expected, f"{test_input} value mismatch" 
\ No newline at end of file
+    assert result[test_input] == expected, f"{test_input} value mismatch" 
+
+def test_ingest_queue_processes_and_dedups():
+    """Test worker pool processes each queued path once"""
+    import threading
+    from pca_parser import IngestQueue
+
+    seen = []
+    release = threading.Event()
+
+    def process(path):
+        release.wait(5)
+        seen.append(path)
+
+    ingest_queue = IngestQueue(process, workers=2, max_size=10)
+    ingest_queue.start()
+    assert ingest_queue.submit('/tmp/a.pca')
+    assert not ingest_queue.submit('/tmp/a.pca'), "Pending path should be deduplicated"
+    assert ingest_queue.submit('/tmp/b.pca')
+    release.set()
+    ingest_queue.stop(timeout=5)
+
+    assert sorted(seen) == ['/tmp/a.pca', '/tmp/b.pca']
+    stats = ingest_queue.stats()
+    assert stats['completed'] == 2
+    assert stats['duplicates'] == 1
+    assert stats['depth'] == 0
+
+
+def test_ingest_queue_counts_failures():
+    """Test a failing job does not kill its worker"""
+    from pca_parser import IngestQueue
+
+    def process(path):
+        if path.endswith('bad.pca'):
+            raise ValueError("bad file")
+
+    ingest_queue = IngestQueue(process, workers=1, max_size=10)
+    ingest_queue.start()
+    ingest_queue.submit('/tmp/bad.pca')
+    ingest_queue.submit('/tmp/good.pca')
+    ingest_queue.stop(timeout=5)
+
+    stats = ingest_queue.stats()
+    assert stats['failed'] == 1
+    assert stats['completed'] == 1
+
+
+def test_ingest_queue_stop_does_not_hang_when_full():
+    """Test stop() returns within its timeout while the queue is full"""
+    import threading
+    import time
+    from pca_parser import IngestQueue
+
+    release = threading.Event()
+    ingest_queue = IngestQueue(lambda path: release.wait(10), workers=1, max_size=2)
+    ingest_queue.start()
+    for name in ('a', 'b', 'c'):
+        ingest_queue.submit(f'/tmp/{name}.pca')
+    time.sleep(0.2)  # Worker holds 'a', the queue holds 'b' and 'c'
+
+    started = time.monotonic()
+    ingest_queue.stop(timeout=1)
+    assert time.monotonic() - started < 3
+    release.set()
+
+
+def _make_origin(tmp_path):
+    """Create a bare origin with one commit and a clone of it"""
+    from git import Repo
+
+    origin_dir = tmp_path / 'origin.git'
+    Repo.init(origin_dir, bare=True, initial_branch='main')
+    clone = Repo.clone_from(str(origin_dir), tmp_path / 'gitrepo')
+    clone.git.config('--local', 'user.name', 'test')
+    clone.git.config('--local', 'user.email', 'test@example.com')
+    (tmp_path / 'gitrepo' / 'README.md').write_text('test\n')
+    clone.git.add('README.md')
+    clone.index.commit('initial')
+    clone.git.push('origin', 'main')
+    return origin_dir, tmp_path / 'gitrepo'
+
+
+def test_git_publisher_batches_files_into_one_commit(tmp_path):
+    """Test several outputs land in one pushed commit"""
+    from git import Repo
+    from pca_parser import GitPublisher
+
+    origin_dir, repo_dir = _make_origin(tmp_path)
+    publish_log = tmp_path / 'published.jsonl'
+    publisher = GitPublisher(str(repo_dir), 'main', 'test', email='test@example.com',
+                             batch_window=60, batch_size=10, publish_log=str(publish_log))
+
+    for name in ['a.json', 'b.json', 'c.json']:
+        src = tmp_path / name
+        src.write_text(json.dumps({'name': name}))
+        publisher.add(str(src), name)
+    assert publisher.pending_count() == 3
+
+    sha = publisher.flush()
+
+    origin = Repo(origin_dir)
+    assert origin.commit('main').hexsha == sha
+    assert len(list(origin.iter_commits('main'))) == 2
+    assert sorted(origin.commit('main').stats.files) == ['json/a.json', 'json/b.json', 'json/c.json']
+    assert publisher.commits == {'a.json': sha, 'b.json': sha, 'c.json': sha}
+    records = [json.loads(line) for line in publish_log.read_text().splitlines()]
+    assert {r['file'] for r in records} == {'a.json', 'b.json', 'c.json'}
+    assert all(r['commit'] == sha and r['pushed'] for r in records)
+
+
+def test_git_publisher_copies_into_checkout_only_on_flush(tmp_path):
+    """Test add() leaves the checkout alone so a rebase in flush() never sees local changes"""
+    from git import Repo
+    from pca_parser import GitPublisher
+
+    origin_dir, repo_dir = _make_origin(tmp_path)
+    publisher = GitPublisher(str(repo_dir), 'main', 'test', email='test@example.com', batch_size=10)
+    src = tmp_path / 'a.json'
+    src.write_text('{"v": 1}')
+    publisher.add(str(src), 'a.json')
+    assert not (repo_dir / 'json' / 'a.json').exists()
+
+    src.write_text('{"v": 2}')  # Re-converted before the batch went out
+    sha = publisher.flush()
+    assert (Repo(origin_dir).commit(sha).tree / 'json' / 'a.json').data_stream.read() == b'{"v": 2}'
+    assert publisher._sources == {}
+
+
+def test_git_publisher_flushes_when_batch_is_full(tmp_path):
+    """Test the background thread publishes once batch_size is reached"""
+    from git import Repo
+    from pca_parser import GitPublisher
+
+    origin_dir, repo_dir = _make_origin(tmp_path)
+    publisher = GitPublisher(str(repo_dir), 'main', 'test', email='test@example.com',
+                             batch_window=60, batch_size=2)
+    publisher.start()
+    for name in ['a.json', 'b.json']:
+        src = tmp_path / name
+        src.write_text('{}')
+        publisher.add(str(src), name)
+
+    import time
+    deadline = time.time() + 10
+    while publisher.pending_count() or len(publisher.commits) < 2:
+        assert time.time() < deadline, "Batch was not flushed"
+        time.sleep(0.05)
+    publisher.stop()
+
+    assert len(list(Repo(origin_dir).iter_commits('main'))) == 2
+
+
+def test_git_publisher_recovers_from_conflicting_remote(tmp_path):
+    """Test a remote change to the same output does not leave the checkout unmerged"""
+    from git import Repo
+    from pca_parser import GitPublisher
+
+    origin_dir, repo_dir = _make_origin(tmp_path)
+    other = Repo.clone_from(str(origin_dir), tmp_path / 'other')
+    other.git.config('--local', 'user.name', 'other')
+    other.git.config('--local', 'user.email', 'other@example.com')
+    (tmp_path / 'other' / 'json').mkdir()
+    (tmp_path / 'other' / 'json' / 'x.json').write_text('{"from": "remote"}')
+    other.git.add('json/x.json')
+    other.index.commit('remote output')
+    other.git.push('origin', 'main')
+
+    publisher = GitPublisher(str(repo_dir), 'main', 'test', email='test@example.com', batch_size=10)
+    src = tmp_path / 'x.json'
+    src.write_text('{"from": "local"}')
+    publisher.add(str(src), 'x.json')
+    sha = publisher.flush()
+
+    origin = Repo(origin_dir)
+    assert sha == origin.commit('main').hexsha
+    assert (origin.commit('main').tree / 'json' / 'x.json').data_stream.read() == b'{"from": "local"}'
+    assert not Repo(repo_dir).index.unmerged_blobs()
+
+    # Later batches keep publishing
+    src.write_text('{}')
+    publisher.add(str(src), 'y.json')
+    assert publisher.flush() == origin.commit('main').hexsha
+
+
+def test_git_publisher_requeues_unpushed_batch(tmp_path, monkeypatch):
+    """Test a failed push is rolled back, requeued and only recorded once pushed"""
+    from git import Repo
+    from pca_parser import GitPublisher
+    import pca_parser
+
+    origin_dir, repo_dir = _make_origin(tmp_path)
+    publish_log = tmp_path / 'published.jsonl'
+    publisher = GitPublisher(str(repo_dir), 'main', 'test', email='test@example.com',
+                             batch_size=10, publish_log=str(publish_log))
+    repo = Repo(repo_dir)
+    repo.git.remote('set-url', 'origin', str(tmp_path / 'missing.git'))
+
+    src = tmp_path / 'a.json'
+    src.write_text('{}')
+    publisher.add(str(src), 'a.json')
+    monkeypatch.setattr(pca_parser.time, 'sleep', lambda seconds: None)
+    assert publisher.flush() is None
+
+    assert publisher.pending_count() == 1
+    assert publisher.failed_batches == 1
+    assert publisher.commits == {}
+    assert not publish_log.exists()
+    assert repo.head.commit.hexsha == Repo(origin_dir).commit('main').hexsha
+
+    repo.git.remote('set-url', 'origin', str(origin_dir))
+    sha = publisher.flush()
+    assert sha == Repo(origin_dir).commit('main').hexsha
+    assert publisher.commits == {'a.json': sha}
+    records = [json.loads(line) for line in publish_log.read_text().splitlines()]
+    assert [r['commit'] for r in records] == [sha]
+
+
+def test_ingest_ledger_survives_restart(tmp_path):
+    """Test ledger entries persist and match on stat or content hash"""
+    from pca_parser import IngestLedger
+
+    scan = tmp_path / 'scan.pca'
+    scan.write_text('[General]\nVersion=1\n')
+    st = scan.stat()
+
+    ledger = IngestLedger(str(tmp_path / 'ledger.db'))
+    ledger.record(str(scan), st.st_size, st.st_mtime, 'abc123', 'scan.json')
+    ledger.close()
+
+    ledger = IngestLedger(str(tmp_path / 'ledger.db'))
+    assert ledger.contains(str(scan))
+    assert ledger.find_hash('abc123') == str(scan)
+    assert ledger.find_hash('other') is None
+
+    # A rewritten file with the same name is not considered processed
+    scan.write_text('[General]\nVersion=22\n')
+    assert not ledger.contains(str(scan))
+
+
+def test_ingest_ledger_retention(tmp_path):
+    """Test the ledger keeps only the newest max_entries rows"""
+    from pca_parser import IngestLedger
+
+    ledger = IngestLedger(str(tmp_path / 'ledger.db'), max_entries=5)
+    for i in range(12):
+        ledger.record(f'/tmp/scan{i}.pca', sha256=f'hash{i}')
+    ledger.prune()
+
+    assert len(ledger) == 5
+    assert ledger.find_hash('hash11') == '/tmp/scan11.pca'
+    assert ledger.find_hash('hash0') is None
+
+
+def test_identical_content_is_converted_once(make_handler):
+    """Test a renamed copy of an ingested scan reuses the earlier output without conversion"""
+    import shutil
+
+    class Published:
+        def __init__(self):
+            self.names = []
+
+        def add(self, json_path, json_filename):
+            self.names.append(json_filename)
+
+    handler, dirs = make_handler()
+    handler.git_publisher = Published()
+
+    source = os.path.join(DATA_INPUT, 'Nano Di Side.pca')
+    shutil.copy(source, dirs['input'] / 'first.pca')
+    shutil.copy(source, dirs['input'] / 'second.pca')
+
+    handler.process_file(str(dirs['input'] / 'first.pca'))
+
+    def no_conversion(source_path, safe_filename, head, json_path):
+        raise AssertionError("identical content was converted again")
+
+    handler.convert_to_file = no_conversion
+    handler.process_file(str(dirs['input'] / 'second.pca'))
+
+    assert sorted(os.listdir(dirs['output'])) == ['first.json', 'second.json']
+    assert (dirs['output'] / 'second.json').read_bytes() == (dirs['output'] / 'first.json').read_bytes()
+    assert handler.git_publisher.names == ['first.json', 'second.json']
+    assert sorted(os.listdir(dirs['archive'])) == ['first.pca', 'second.pca']
+    assert handler.is_processed(str(dirs['input'] / 'second.pca'))
+
+
+def test_stabilizer_waits_for_quiet_period(tmp_path):
+    """Test a growing file is held until its size stops changing"""
+    from pca_parser import FileStabilizer
+
+    released = []
+    stabilizer = FileStabilizer(released.append, quiet_period=0.2)
+    scan = tmp_path / 'scan.pca'
+    scan.write_text('[General]\n')
+
+    # A burst of events for one path collapses into one entry
+    for _ in range(5):
+        stabilizer.observe(str(scan))
+    assert stabilizer.pending_count() == 1
+    assert stabilizer.collapsed == 4
+
+    stabilizer.check()
+    with open(scan, 'a') as f:
+        f.write('Version=1\n')
+    stabilizer.check()
+    assert released == []
+
+    import time
+    time.sleep(0.3)
+    stabilizer.check()
+    assert released == [str(scan)]
+    assert stabilizer.pending_count() == 0
+
+
+def test_stabilizer_honours_signals_and_lock_files(tmp_path):
+    """Test close/rename signals release at once unless a lock file exists"""
+    from pca_parser import FileStabilizer
+
+    released = []
+    stabilizer = FileStabilizer(released.append, quiet_period=60)
+    scan = tmp_path / 'scan.pca'
+    scan.write_text('[General]\n')
+    lock = tmp_path / 'scan.pca.lock'
+    lock.write_text('')
+
+    stabilizer.observe(str(scan), ready=True)
+    stabilizer.check()
+    assert released == []
+
+    lock.unlink()
+    stabilizer.check()
+    assert released == [str(scan)]
+
+    # Files that disappear before settling are dropped
+    gone = tmp_path / 'gone.pca'
+    gone.write_text('x')
+    stabilizer.observe(str(gone))
+    gone.unlink()
+    stabilizer.check()
+    assert stabilizer.pending_count() == 0
+
+
+def test_handler_ignores_unsupported_files(make_handler):
+    """Test readme files and other non-scan events never reach the stabilizer"""
+    from types import SimpleNamespace
+    from pca_parser import FileStabilizer
+
+    handler, dirs = make_handler()
+    handler.stabilizer = FileStabilizer(lambda path: None, quiet_period=60)
+
+    for name in ['scan_metadataparser_readme.txt', 'scan.pca.lock', 'scan.pca']:
+        handler.on_any_event(SimpleNamespace(is_directory=False, event_type='created',
+                                             src_path=str(dirs['input'] / name)))
+    handler.on_any_event(SimpleNamespace(is_directory=False, event_type='moved',
+                                         src_path=str(dirs['input'] / 'a.tmp'),
+                                         dest_path=str(dirs['input'] / 'b.txt')))
+
+    assert handler.stabilizer.pending_count() == 1
+
+
+def test_share_watcher_reports_only_changes(tmp_path):
+    """Test the scandir poller diffs its snapshot and filters extensions"""
+    from pca_parser import ShareWatcher
+
+    seen = []
+    watcher = ShareWatcher(str(tmp_path), seen.append, min_interval=1, max_interval=8, backoff=2)
+    (tmp_path / 'existing.pca').write_text('a')
+    (tmp_path / 'notes.txt').write_text('ignored')
+
+    assert watcher.poll() == [str(tmp_path / 'existing.pca')]
+    assert watcher.poll() == []
+    assert watcher.interval == 2, "Idle polls should back off"
+
+    (tmp_path / 'new.pca').write_text('b')
+    with open(tmp_path / 'existing.pca', 'a') as f:
+        f.write('more')
+    assert watcher.poll() == [str(tmp_path / 'existing.pca'), str(tmp_path / 'new.pca')]
+    assert watcher.interval == 1, "Activity should reset the interval"
+
+    (tmp_path / 'new.pca').unlink()
+    watcher.poll()
+    assert 'new.pca' not in watcher.snapshot
+
+    stats = watcher.stats()
+    assert stats['polls'] == 4
+    assert stats['tracked'] == 1
+    assert len(seen) == 3
+
+
+def test_share_file_ingested_in_one_pass(make_handler):
+    """Test a share file is converted and archived without a copy into input_dir"""
+    import shutil
+
+    handler, dirs = make_handler(share=True)
+
+    source = os.path.join(DATA_INPUT, 'Nano Di Side.pca')
+    shared = dirs['share'] / 'Nano Di Side.pca'
+    shutil.copy2(source, shared)
+    mtime = shared.stat().st_mtime
+
+    handler.process_file(str(shared))
+
+    assert not shared.exists(), "Share file should be removed once archived"
+    assert os.listdir(dirs['input']) == ['Nano Di Side_metadataparser_readme.txt']
+    assert os.listdir(dirs['output']) == ['Nano_Di_Side.json']
+    archived = dirs['archive'] / 'Nano_Di_Side.pca'
+    with open(source, 'rb') as f:
+        assert archived.read_bytes() == f.read()
+    assert archived.stat().st_mtime == mtime
+    assert handler.is_processed(str(shared))
+
+
+def test_service_converts_other_formats(make_handler):
+    """Test non-PCA formats go through the converter registry"""
+    import shutil
+
+    handler, dirs = make_handler()
+
+    source = os.path.join(DATA_INPUT, 'Nano Di Side.pcp')
+    shutil.copy(source, dirs['input'] / 'Nano Di Side.pcp')
+    handler.process_file(str(dirs['input'] / 'Nano Di Side.pcp'))
+
+    with open(dirs['output'] / 'Nano_Di_Side.pcp.json') as f:
+        text = f.read()
+    result = json.loads(text)
+    assert result['measurements'][0]['RotPos'] == 0.0
+    assert os.listdir(dirs['archive']) == ['Nano_Di_Side.pcp']
+
+    # Same JSON layout as the workflows and the converters CLI
+    from converters import CONVERTERS
+    assert text == CONVERTERS['pcp'].dumps(result)
+
+
+def test_rtf_output_does_not_overwrite_pca_output(make_handler):
+    """Test a PCA and an RTF with the same stem get separate outputs"""
+    import shutil
+    pytest.importorskip('striprtf')
+
+    handler, dirs = make_handler()
+
+    shutil.copy(os.path.join(DATA_INPUT, 'Nano Di Side.pca'), dirs['input'] / 'scan.pca')
+    shutil.copy(os.path.join(DATA_INPUT, 'Technique-USNM35717_.rtf'), dirs['input'] / 'scan.rtf')
+    handler.process_file(str(dirs['input'] / 'scan.pca'))
+    handler.process_file(str(dirs['input'] / 'scan.rtf'))
+
+    assert sorted(os.listdir(dirs['output'])) == ['scan.json', 'scan.rtf.json']
+
+
+@pytest.mark.parametrize("columnar_setting", ['false', 'yes'])
+def test_service_streams_pcj_output(make_handler, columnar_setting):
+    """Test PCJ files are streamed into the same JSON text the registry produces"""
+    import shutil
+    from converters import CONVERTERS
+
+    handler, dirs = make_handler(columnar=columnar_setting)
+
+    source = os.path.join(DATA_INPUT, 'Nano Di Side.pcj')
+    shutil.copy(source, dirs['input'] / 'Nano Di Side.pcj')
+    handler.process_file(str(dirs['input'] / 'Nano Di Side.pcj'))
+
+    converter = CONVERTERS['pcj']
+    with open(source, 'rb') as f:
+        expected = converter.dumps(converter.convert(f.read(), columnar=columnar_setting == 'yes'))
+    assert (dirs['output'] / 'Nano_Di_Side.pcj.json').read_text() == expected
+    assert os.listdir(dirs['archive']) == ['Nano_Di_Side.pcj']
+
+
+def test_failed_share_conversion_keeps_share_file(make_handler):
+    """Test a share file that fails to convert stays on the share with no staged copy left"""
+    handler, dirs = make_handler(share=True)
+
+    broken = dirs['share'] / 'broken.pca'
+    broken.write_text('Version=1\n[General]\n')
+    handler.process_file(str(broken))
+
+    assert broken.exists()
+    assert os.listdir(dirs['archive']) == []
+    assert os.listdir(dirs['output']) == []
+    assert not handler.is_processed(str(broken))
+
+
+def test_service_writes_and_publishes_sidecar(make_handler):
+    """Test the sidecar setting writes a .npz next to the JSON and publishes both"""
+    import shutil
+    pytest.importorskip('numpy')
+
+    handler, dirs = make_handler(sidecar='true')
+    published = []
+    handler.publish_json = lambda path, name: published.append(name)
+
+    source = os.path.join(DATA_INPUT, 'Nano Di Side.pcp')
+    shutil.copy(source, dirs['input'] / 'Nano Di Side.pcp')
+    handler.process_file(str(dirs['input'] / 'Nano Di Side.pcp'))
+
+    assert sorted(os.listdir(dirs['output'])) == ['Nano_Di_Side.pcp.json', 'Nano_Di_Side.pcp.npz']
+    assert published == ['Nano_Di_Side.pcp.npz', 'Nano_Di_Side.pcp.json']
+    with open(dirs['output'] / 'Nano_Di_Side.pcp.json') as f:
+        schema = json.load(f)['measurements']['schema']
+    assert schema['sidecar']['path'] == 'Nano_Di_Side.pcp.npz'
+
+
+def test_service_publishes_pcp_stability_summary(make_handler):
+    """Test the pcp_monitor setting writes and publishes an anomaly summary for PCP files only"""
+    import shutil
+
+    handler, dirs = make_handler(pcp_monitor='true')
+    published = []
+    handler.publish_json = lambda path, name: published.append(name)
+
+    for name in ['Amazon echo 40 micron.pcp', 'Nano Di Side.pca']:
+        shutil.copy(os.path.join(DATA_INPUT, name), dirs['input'] / name)
+        handler.process_file(str(dirs['input'] / name))
+
+    assert published == ['Amazon_echo_40_micron.pcp-anomalies.json', 'Amazon_echo_40_micron.pcp.json',
+                         'Nano_Di_Side.json']
+    with open(dirs['output'] / 'Amazon_echo_40_micron.pcp-anomalies.json') as f:
+        summary = json.load(f)
+    assert summary['file'] == 'Amazon_echo_40_micron.pcp'
+    assert summary['status'] == 'anomalies' and summary['counts'] == {'MeanGV_jump': 1}
+
+
+def test_service_checks_pcj_trajectory_against_pca(make_handler):
+    """Test the trajectory_check setting reports a PCJ against the archived PCA and publishes it"""
+    import shutil
+    pytest.importorskip('numpy')
+
+    handler, dirs = make_handler(trajectory_check='true')
+    published = []
+    handler.publish_json = lambda path, name: published.append(name)
+
+    for name in ['TV Vizio PCB.pca', 'TV Vizio PCB.pcj']:
+        shutil.copy(os.path.join(DATA_INPUT, name), dirs['input'] / name)
+        handler.process_file(str(dirs['input'] / name))
+
+    assert published == ['TV_Vizio_PCB.json', 'TV_Vizio_PCB.pcj-trajectory.json', 'TV_Vizio_PCB.pcj.json']
+    with open(dirs['output'] / 'TV_Vizio_PCB.pcj-trajectory.json') as f:
+        report = json.load(f)
+    assert report['file'] == 'TV_Vizio_PCB.pcj' and report['pca'] == 'TV_Vizio_PCB.pca'
+    assert report['status'] == 'ok' and report['problems'] == []
+    assert report['source_z']['nominal'] == -436.723875 and report['projections'] == 2801
+
+
+def test_metrics_registry_renders_prometheus_text():
+    """Test counters, gauges, histograms and collectors render in the exposition format"""
+    from pca_parser import MetricsRegistry
+
+    registry = MetricsRegistry()
+    registry.declare('jobs_total', 'counter', 'Jobs done')
+    registry.declare('depth', 'gauge', 'Queue depth')
+    registry.declare('latency_seconds', 'histogram', 'Latency', buckets=(0.1, 1))
+    registry.declare('unused', 'gauge', 'Never set')
+    registry.inc('jobs_total', source='share', result='ok')
+    registry.inc('jobs_total', 2, source='share', result='ok')
+    registry.inc('jobs_total', source='a "quoted"\\path')
+    registry.collector('depth', lambda: registry.set('depth', 4))
+    for value in (0.05, 0.5, 2.0):
+        registry.observe('latency_seconds', value, stage='read')
+
+    assert registry.render().splitlines() == [
+        '# HELP jobs_total Jobs done',
+        '# TYPE jobs_total counter',
+        'jobs_total{result="ok",source="share"} 3',
+        'jobs_total{source="a \\"quoted\\"\\\\path"} 1',
+        '# HELP depth Queue depth',
+        '# TYPE depth gauge',
+        'depth 4',
+        '# HELP latency_seconds Latency',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{stage="read",le="0.1"} 1',
+        'latency_seconds_bucket{stage="read",le="1"} 2',
+        'latency_seconds_bucket{stage="read",le="+Inf"} 3',
+        'latency_seconds_sum{stage="read"} 2.55',
+        'latency_seconds_count{stage="read"} 3',
+    ]
+    assert registry.value('latency_seconds', stage='read') == (3, 2.55)
+
+
+def test_service_records_stage_metrics_per_source(make_handler):
+    """Test ingest stages, throughput and lag are recorded by source and served over HTTP"""
+    import shutil
+    import urllib.request
+    from pca_parser import METRICS, MetricsServer
+
+    handler, dirs = make_handler(share=True)
+
+    def count(name, **labels):
+        value = METRICS.value(name, **labels)
+        return (value[0] if isinstance(value, tuple) else value) or 0
+
+    before = {source: {stage: count('pca_parser_stage_seconds', stage=stage, source=source)
+                       for stage in ('read', 'convert', 'check', 'archive', 'publish')}
+              for source in ('local', 'share')}
+    converted = count('pca_parser_files_total', source='share', format='pca', result='converted')
+    failed = count('pca_parser_files_total', source='local', format='pca', result='failed')
+    read_bytes = count('pca_parser_bytes_total', source='share')
+
+    source = os.path.join(DATA_INPUT, 'Nano Di Side.pca')
+    shutil.copy(source, dirs['share'] / 'Nano Di Side.pca')
+    handler.process_file(str(dirs['share'] / 'Nano Di Side.pca'))
+    (dirs['input'] / 'broken.pca').write_text('Version=1\n[General]\n')
+    handler.process_file(str(dirs['input'] / 'broken.pca'))
+
+    for stage in ('read', 'convert', 'check', 'archive', 'publish'):
+        assert count('pca_parser_stage_seconds', stage=stage, source='share') == before['share'][stage] + 1
+    assert count('pca_parser_stage_seconds', stage='read', source='local') == before['local']['read'] + 1
+    assert count('pca_parser_stage_seconds', stage='archive', source='local') == before['local']['archive']
+    assert count('pca_parser_files_total', source='share', format='pca', result='converted') == converted + 1
+    assert count('pca_parser_files_total', source='local', format='pca', result='failed') == failed + 1
+    assert count('pca_parser_bytes_total', source='share') == read_bytes + os.path.getsize(source)
+    assert count('pca_parser_ingest_lag_seconds', source='share') >= 1
+
+    server = MetricsServer(METRICS, 0)
+    server.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            text = response.read().decode('utf-8')
+            assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    finally:
+        server.stop()
+    assert '# TYPE pca_parser_stage_seconds histogram' in text
+    assert 'pca_parser_stage_seconds_bucket{source="share",stage="convert",le="+Inf"}' in text
+    assert 'pca_parser_info{version="1.0.0"} 1' in text
+
+
+def test_git_publisher_records_git_metrics(tmp_path):
+    """Test commit, fetch, pull and push are timed and batches and pending outputs are counted"""
+    from pca_parser import GitPublisher, METRICS
+
+    origin_dir, repo_dir = _make_origin(tmp_path)
+    publisher = GitPublisher(str(repo_dir), 'main', 'test', email='test@example.com', batch_size=10)
+    ops = {op: (METRICS.value('pca_parser_git_seconds', op=op) or (0, 0.0))[0]
+           for op in ('commit', 'fetch', 'pull', 'push')}
+    pushed = METRICS.value('pca_parser_git_batches_total', result='pushed') or 0
+
+    src = tmp_path / 'a.json'
+    src.write_text('{}')
+    publisher.add(str(src), 'a.json')
+    publisher.collect_metrics()
+    assert METRICS.value('pca_parser_git_pending') == 1
+    publisher.flush()
+    publisher.collect_metrics()
+
+    assert METRICS.value('pca_parser_git_pending') == 0
+    assert METRICS.value('pca_parser_git_batches_total', result='pushed') == pushed + 1
+    for op, seen in ops.items():
+        assert METRICS.value('pca_parser_git_seconds', op=op)[0] == seen + 1
+
+
+def test_service_profiles_sampled_files(tmp_path, make_handler):
+    """Test a handler with a profiler dumps a profile per processed file and a git batch summary"""
+    import shutil
+    import profiling
+
+    handler, dirs = make_handler()
+    handler.publish_json = lambda path, name: None
+    handler.profiler = profiling.Profiler(str(tmp_path / 'profile'), summary_interval=None)
+
+    for name in ['Nano Di Side.pca', 'Nano Di Side.pcj']:
+        shutil.copy(os.path.join(DATA_INPUT, name), dirs['input'] / name)
+        handler.process_file(str(dirs['input'] / name))
+
+    assert sorted(name.split('-', 3)[3] for name in os.listdir(tmp_path / 'profile')) == \
+        ['Nano_Di_Side.pca.prof', 'Nano_Di_Side.pcj.prof']
+    summary = open(handler.profiler.close()).read()
+    assert summary.startswith('2 profiled') and '_process_file' in summary and 'convert_to_file' in summary
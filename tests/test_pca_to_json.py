@@ -0,0 +1,57 @@
+import pytest
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts'))
+from pca_to_json import parse_pca, parse_pca_file, convert_value
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+def test_flat_output_matches_committed_outputs():
+    """Test flat parsing reproduces every committed data/output PCA JSON"""
+    checked = 0
+    for name in sorted(os.listdir(os.path.join(DATA_DIR, 'input'))):
+        output = os.path.join(DATA_DIR, 'output', f"{name}.json")
+        if not name.endswith('.pca') or not os.path.exists(output):
+            continue
+        with open(output, 'r') as f:
+            expected = json.load(f)
+        assert parse_pca_file(os.path.join(DATA_DIR, 'input', name)) == expected, name
+        checked += 1
+    assert checked > 0
+
+def test_nested_output_from_bytes_and_str():
+    """Test nested sections and identical results for bytes and str input"""
+    with open(os.path.join(DATA_DIR, 'input', 'Nano Di Side.pca'), 'rb') as f:
+        raw = f.read()
+
+    nested = parse_pca(raw)
+    assert nested == parse_pca(raw.decode('utf-8'))
+    assert nested['Geometry']['FDD'] == 802.77534791
+    assert nested['Xray']['Voltage'] == 190
+    assert nested['General']['SystemName'] == 'v|tome|x m'
+    assert nested['General']['Comment'] == ''
+
+def test_values_before_section_rejected():
+    """Test nested parsing needs a section header, like configparser"""
+    with pytest.raises(ValueError):
+        parse_pca('Voltage=190\n[Xray]\nCurrent=130\n')
+    assert parse_pca('Voltage=190\n', flat=True) == {'Voltage': 190}
+
+@pytest.mark.parametrize("value,expected", [
+    ('190', 190),
+    ('-9.402', -9.402),
+    ('0.00000000', 0.0),
+    ('2.8.2.20099', '2.8.2.20099'),
+    ('image_0001.tif', 'image_0001.tif'),
+    ('1.tif', '1.tif'),
+    ('v|tome|x m', 'v|tome|x m'),
+    ('1_000', 1000),
+    ('', ''),
+])
+def test_convert_value(value, expected):
+    """Test value typing matches the float/int/str fallbacks"""
+    result = convert_value(value)
+    assert result == expected
+    assert type(result) is type(expected)
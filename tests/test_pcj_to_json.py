@@ -0,0 +1,102 @@
+import pytest
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts'))
+from pcj_to_json import XRayLogParser, stream_json
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+SAMPLE = [
+    '[Info]\n',
+    'Version=2.0\n',
+    'Name=scan=1\n',
+    '[Data]\n',
+    ';ImgNr\tXS\t\tYS\t\tZS\n',
+    '1\t0.0\t69.5\t-105.8\n',
+    '\n',
+    '2\t0.0\t69.5\t-105.8\n',
+]
+
+def test_column_names_skip_double_tabs():
+    """Test values line up with their columns when the header uses double tabs"""
+    result = XRayLogParser('<lines>').parse_lines(SAMPLE)
+    assert result['info'] == {'Version': 2.0, 'Name': 'scan=1'}
+    assert result['data'] == [
+        {'ImgNr': 1, 'XS': 0.0, 'YS': 69.5, 'ZS': -105.8},
+        {'ImgNr': 2, 'XS': 0.0, 'YS': 69.5, 'ZS': -105.8},
+    ]
+
+def test_iter_events_is_lazy():
+    """Test info is yielded at [Data] and rows are read one line at a time"""
+    consumed = []
+
+    def lines():
+        for line in SAMPLE:
+            consumed.append(line)
+            yield line
+
+    events = XRayLogParser('<lines>').iter_events(lines())
+    kind, info = next(events)
+    assert kind == 'info' and info['Version'] == 2.0
+    assert len(consumed) == 4
+    assert next(events) == ('row', {'ImgNr': 1, 'XS': 0.0, 'YS': 69.5, 'ZS': -105.8})
+    assert len(consumed) == 6
+
+@pytest.mark.parametrize('lines', [SAMPLE, ['[Info]\n', 'A=1\n'], []])
+def test_stream_matches_json_dump(lines):
+    """Test the streaming writer produces the same text as json.dump(indent=2)"""
+    out = io.StringIO()
+    rows = XRayLogParser('<lines>').write_json_stream(lines, out)
+    expected = XRayLogParser('<lines>').parse_lines(lines)
+    assert out.getvalue() == json.dumps(expected, indent=2)
+    assert rows == len(expected['data'])
+
+def test_save_json_matches_committed_outputs(tmp_path):
+    """Test the streaming save reproduces every committed data/output PCJ JSON"""
+    checked = 0
+    for name in sorted(os.listdir(os.path.join(DATA_DIR, 'input'))):
+        expected = os.path.join(DATA_DIR, 'output', f"{name}.json")
+        if not name.endswith('.pcj') or not os.path.exists(expected):
+            continue
+        output = tmp_path / f"{name}.json"
+        XRayLogParser(os.path.join(DATA_DIR, 'input', name)).save_json(str(output))
+        with open(expected, 'r') as f:
+            assert output.read_text() == f.read(), name
+        checked += 1
+    assert checked > 0
+
+@pytest.mark.parametrize('lines', [SAMPLE, SAMPLE + [';ImgNr\tRS\n', '3\t1.5\n'], ['[Info]\n', 'A=1\n'], []])
+def test_columnar_stream_matches_columnar_dumps(lines):
+    """Test the spilled columnar writer produces the same text as columnar.dumps"""
+    from columnar import dumps
+    out = io.StringIO()
+    rows = stream_json(iter(lines), out, columnar=True)
+    expected = XRayLogParser('<lines>').parse_lines(lines, columnar=True)
+    assert out.getvalue() == dumps(expected, indent=2)
+    assert rows == expected['data']['schema']['rows']
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_registry_stream_memory_is_flat(tmp_path, columnar):
+    """Test Converter.write keeps peak memory well below the size of the rows"""
+    import tracemalloc
+    from converters import CONVERTERS
+
+    source = tmp_path / 'big.pcj'
+    with open(source, 'w') as f:
+        f.write('[Info]\nVersion=2.0\n[Data]\n;ImgNr\tXS\t\tYS\t\tRS\n')
+        for i in range(40000):
+            f.write(f'{i + 1}\t0.0\t69.67175\t{i * 0.018:.4f}\n')
+
+    # Warm up so lazy imports are not counted
+    CONVERTERS['pcj'].write(io.BytesIO(b'[Info]\n[Data]\n;A\n1\n'), io.StringIO(), columnar=columnar)
+    tracemalloc.start()
+    try:
+        with open(source, 'rb') as src, open(tmp_path / 'out.json', 'w') as out:
+            CONVERTERS['pcj'].write(src, out, columnar=columnar)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < os.path.getsize(source) / 2
@@ -0,0 +1,65 @@
+import pytest
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts'))
+import pcp_monitor
+from pcp_monitor import PCPMonitor, anomaly_name, monitor_file
+
+INPUT_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'input')
+HEADER = 'ImgNr\tRotPos\tU\tI\tMeanGV\tDevGV\tDose\tUse\tCValue\tXDShift\tTime'
+
+def scan_lines(rows=600, current=None, mean_gv=None, shift=None, seed=1):
+    """A synthetic PCP file with noisy but stable readings unless a channel function is given"""
+    rng = random.Random(seed)
+    lines = ['datos|x 2 acquisition 2.8.2', HEADER]
+    for image in range(1, rows + 1):
+        i = current(image) if current else 128 + rng.choice([0, 0, 1, 2])
+        gv = mean_gv(image) if mean_gv else 4890 + rng.uniform(-30, 30)
+        xd = shift(image) if shift else rng.randint(-5, 5)
+        lines.append(f"{image}\t{image * 0.3:.3f}\t190\t{i}\t{gv:.1f}\t9.5\t0.0\t1\t0.000\t{xd}\t2021-07-23 12:28:14")
+    return lines
+
+@pytest.mark.parametrize('name', ['Nano Di Side.pcp', 'TV Vizio PCB.pcp'])
+def test_stable_scans_are_ok(name):
+    """Test the stable sample scans raise no events"""
+    summary = monitor_file(os.path.join(INPUT_DIR, name))
+    assert summary['status'] == 'ok' and summary['events'] == [] and summary['counts'] == {}
+    assert summary['file'] == name and summary['rows'] > 1000
+    assert set(summary['channels']) == {'I', 'U', 'MeanGV', 'XDShift'}
+
+def test_grey_value_jump_in_sample_scan():
+    """Test the MeanGV step in the Amazon echo scan is found at the right image"""
+    summary = monitor_file(os.path.join(INPUT_DIR, 'Amazon echo 40 micron.pcp'))
+    assert summary['counts'] == {'MeanGV_jump': 1}
+    event = summary['events'][0]
+    assert event['channel'] == 'MeanGV' and event['first'] == 1515 and event['score'] < 0
+
+def test_current_drift_is_one_event():
+    """Test a lasting drift of the tube current is one merged drift event"""
+    drift = lambda image: 128 if image < 300 else 128 + (image - 300) // 20
+    summary = PCPMonitor().feed(scan_lines(current=drift)).summary()
+    assert summary['counts'] == {'I_drift': 1}
+    event = summary['events'][0]
+    assert 300 < event['first'] < 400 and event['last'] == 600 and event['score'] > 0
+
+def test_shift_spike_and_clean_scan():
+    """Test a single XDShift spike is flagged and the same scan without it is not"""
+    assert PCPMonitor().feed(scan_lines()).summary()['status'] == 'ok'
+    summary = PCPMonitor().feed(scan_lines(shift=lambda image: 60 if image == 250 else 0)).summary()
+    assert summary['counts'] == {'XDShift_spike': 1}
+    event = summary['events'][0]
+    assert (event['first'], event['last'], event['rows'], event['value']) == (250, 251, 2, 60.0)
+
+def test_events_are_bounded(monkeypatch):
+    """Test past MAX_EVENTS events are only counted and the summary is marked truncated"""
+    monkeypatch.setattr(pcp_monitor, 'MAX_EVENTS', 3)
+    sawtooth = lambda image: 4890 + (500 if image > 100 and image % 20 == 0 else 0)
+    summary = PCPMonitor().feed(scan_lines(mean_gv=sawtooth)).summary()
+    assert len(summary['events']) == 3 and summary['truncated']
+    assert summary['counts']['MeanGV_jump'] > 3
+
+def test_anomaly_name():
+    """Test the summary name is not read as a converted output"""
+    assert anomaly_name('Nano_Di_Side.pcp.json') == 'Nano_Di_Side.pcp-anomalies.json'
@@ -0,0 +1,78 @@
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts'))
+from pcp_to_json import PCPConverter, convert_cell, infer_type, parse_column
+
+HEADER = [
+    'datos|x 2 acquisition 2.8.2\n',
+    'ImgNr\tRotPos\tU\tTime\n',
+]
+
+def test_column_types_inferred_once():
+    """Test integer, float and timestamp columns keep their types"""
+    converter = PCPConverter('<lines>')
+    result = converter.convert_lines(HEADER + [
+        '1\t0.000\t220\t2021-08-26 17:37:36\n',
+        '2\t0.129\t220\t2021-08-26 17:37:38\n',
+    ])
+
+    assert result['metadata'] == {'datos': 'x 2 acquisition 2.8.2'}
+    assert result['measurements'][1] == {'ImgNr': 2, 'RotPos': 0.129, 'U': 220, 'Time': '2021-08-26T17:37:38'}
+    assert type(result['measurements'][0]['ImgNr']) is int
+    assert converter.column_types == {'ImgNr': 'int', 'RotPos': 'float', 'U': 'int', 'Time': 'datetime'}
+    assert converter.timestamps['Time'] == [1629999456.0, 1629999458.0]
+
+def test_columnar_schema_marks_timestamps():
+    """Test the columnar schema records datetime columns"""
+    result = PCPConverter('<lines>').convert_lines(HEADER + [
+        '1\t0.000\t220\t2021-08-26 17:37:36\n',
+        '2\t0.129\t220\t2021-08-26 17:37:38\n',
+    ], columnar=True)
+
+    types = {c['name']: c['type'] for c in result['measurements']['schema']['columns']}
+    assert types == {'ImgNr': 'int', 'RotPos': 'float', 'U': 'int', 'Time': 'datetime'}
+    assert result['measurements']['columns']['U'] == 220
+
+def test_late_values_widen_the_column():
+    """Test values past the type sample that do not fit fall back cleanly"""
+    lines = HEADER + [f'{i}\t0.0\t220\t2021-08-26 17:37:36\n' for i in range(1, 40)]
+    lines += ['40\t0.0\t220.5\t2021-08-26 17:38:00\n', '41\t0.0\tn/a\t2021-13-26 17:38:00\n']
+    converter = PCPConverter('<lines>')
+    rows = converter.convert_lines(lines)['measurements']
+
+    assert converter.column_types['U'] == 'mixed'
+    assert rows[39]['U'] == 220.5
+    assert rows[40]['U'] == 'n/a'
+    assert rows[0]['U'] == 220
+    assert converter.column_types['Time'] == 'mixed'
+    assert rows[40]['Time'] == '2021-13-26 17:38:00'
+
+def test_short_rows_omit_missing_values():
+    """Test rows shorter than the header leave out the missing columns"""
+    rows = PCPConverter('<lines>').convert_lines(HEADER + [
+        '1\t0.000\t220\t2021-08-26 17:37:36\n',
+        '2\t0.129\n',
+        'footer line\n',
+    ])['measurements']
+    assert rows == [
+        {'ImgNr': 1, 'RotPos': 0.0, 'U': 220, 'Time': '2021-08-26T17:37:36'},
+        {'ImgNr': 2, 'RotPos': 0.129},
+    ]
+
+@pytest.mark.parametrize("value,expected", [
+    ('12', 12), ('-5', -5), ('0.129', 0.129), ('-0.8', -0.8),
+    ('2021-08-26 17:37:36', '2021-08-26T17:37:36'), ('abc', 'abc'), ('', ''),
+])
+def test_convert_cell(value, expected):
+    """Test single values convert the way whole columns do"""
+    assert convert_cell(value) == expected
+    assert type(convert_cell(value)) is type(expected)
+
+def test_int_sample_with_decimals_later_becomes_float():
+    """Test an integer-looking sample widens to float rather than mixed"""
+    assert infer_type(['1', '2']) == 'int'
+    column_type, values, _ = parse_column(['1', '2', '2.5'], 'int')
+    assert column_type == 'float'
+    assert values == [1.0, 2.0, 2.5]
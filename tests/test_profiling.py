@@ -0,0 +1,99 @@
+import pytest
+import os
+import pstats
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts'))
+import profiling
+from profiling import Profiler
+
+def busy(n=2000):
+    return sum(i * i for i in range(n))
+
+def dumps(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith('.prof') and name != 'aggregate.prof')
+
+def test_disabled_profiler_does_nothing(tmp_path):
+    """Test no directory, or rate 0, runs the block without profiling it"""
+    for profiler in (Profiler(), Profiler(str(tmp_path), rate=0)):
+        with profiler.profile('scan.pcj') as run:
+            busy()
+        assert run is None and profiler.profiled == 0 and profiler.close() is None
+    assert os.listdir(tmp_path) == []
+
+def test_dumps_and_summary(tmp_path):
+    """Test each profiled call is dumped and the summary ranks the aggregate"""
+    profiler = Profiler(str(tmp_path), top=5, summary_interval=None)
+    for name in ('a scan.pcj', 'b/scan.pcp'):
+        with profiler.profile(name) as run:
+            busy()
+        assert os.path.exists(run.dump)
+    assert [name.split('-', 3)[3] for name in dumps(tmp_path)] == ['a_scan.pcj.prof', 'b_scan.pcp.prof']
+    assert not os.path.exists(tmp_path / 'summary.txt')
+
+    summary = open(profiler.close()).read()
+    assert summary.startswith('2 profiled, 0 skipped')
+    assert 'Top 5 by cumulative time' in summary and 'Top 5 by own time' in summary
+    assert 'busy' in summary and '<genexpr>' in summary
+    calls = pstats.Stats(str(tmp_path / 'aggregate.prof')).stats
+    assert sum(entry[1] for func, entry in calls.items() if func[2] == 'busy') == 2
+
+def test_failed_block_is_still_recorded(tmp_path):
+    """Test an exception propagates and the profile of the failed call is kept"""
+    profiler = Profiler(str(tmp_path))
+    with pytest.raises(ValueError):
+        with profiler.profile('broken.pca'):
+            raise ValueError("bad file")
+    assert profiler.profiled == 1 and len(dumps(tmp_path)) == 1
+
+def test_sampling_bounds_cost(tmp_path, monkeypatch):
+    """Test the rate, the one-at-a-time rule and max_dumps bound what is profiled and kept"""
+    draws = iter([0.05, 0.5, 0.05, 0.9])
+    monkeypatch.setattr(profiling.random, 'random', lambda: next(draws))
+    profiler = Profiler(str(tmp_path), rate=0.1)
+    for _ in range(4):
+        with profiler.profile('x'):
+            pass
+    assert (profiler.profiled, profiler.skipped) == (2, 2)
+    monkeypatch.undo()
+
+    profiler = Profiler(str(tmp_path / 'one'))
+    inner = []
+    with profiler.profile('outer') as outer:
+        thread = threading.Thread(target=lambda: inner.append(profiler.profile('inner').__enter__()))
+        thread.start()
+        thread.join()
+    assert outer is not None and inner == [None] and profiler.skipped == 1
+
+    profiler = Profiler(str(tmp_path / 'bounded'), max_dumps=3)
+    for i in range(5):
+        with profiler.profile(f"f{i}"):
+            pass
+    assert [name.split('-', 3)[3] for name in dumps(tmp_path / 'bounded')] == ['f2.prof', 'f3.prof', 'f4.prof']
+    assert profiler.profiled == 5
+
+def test_summary_from_other_processes_dumps(tmp_path):
+    """Test add_dumps aggregates dump files and skips unreadable ones"""
+    worker = Profiler(str(tmp_path / 'dumps'), summary_interval=None)
+    paths = []
+    for name in ('a', 'b'):
+        with worker.profile(name) as run:
+            busy()
+        paths.append(run.dump)
+    (tmp_path / 'dumps' / 'junk.prof').write_text('not marshal')
+
+    profiler = Profiler(str(tmp_path / 'summary'))
+    assert profiler.add_dumps(paths + [str(tmp_path / 'dumps' / 'junk.prof'), str(tmp_path / 'missing.prof')]) == 2
+    assert profiler.errors == 2
+    assert open(profiler.close()).read().startswith('2 profiled')
+
+def test_environment_overrides_settings():
+    """Test PCA_PROFILE* take precedence over the given settings"""
+    profiler = profiling.from_env('/from/config', rate=0.1, environ={})
+    assert (profiler.output_dir, profiler.rate, profiler.top) == ('/from/config', 0.1, 30)
+    environ = {'PCA_PROFILE': '/from/env', 'PCA_PROFILE_RATE': '0.5', 'PCA_PROFILE_TOP': '10'}
+    profiler = profiling.from_env('/from/config', rate=0.1, environ=environ)
+    assert (profiler.output_dir, profiler.rate, profiler.top) == ('/from/env', 0.5, 10)
+    with pytest.raises(ValueError):
+        profiling.from_env(environ={'PCA_PROFILE_RATE': 'often'})
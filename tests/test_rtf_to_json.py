@@ -0,0 +1,60 @@
+import pytest
+import json
+import os
+import sys
+
+pytest.importorskip('striprtf')
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts'))
+from rtf_to_json import convert_rtf, parse_formulas, parse_report
+from benchmark import legacy_rtf
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+def report(*rows):
+    """A minimal RTF report with one paragraph per row"""
+    return '{\\rtf1\\ansi ' + ''.join(row.replace('\\', '\\\\') + '\\par\n' for row in rows) + '}'
+
+class iter_once(list):
+    """A list that fails if it is iterated more than once"""
+    def __iter__(self):
+        assert not getattr(self, 'used', False), "lines were walked twice"
+        self.used = True
+        return super().__iter__()
+
+def test_matches_committed_output():
+    """Test the single-pass parser writes the committed technique JSON byte for byte"""
+    with open(os.path.join(DATA_DIR, 'input', 'Technique-USNM35717_.rtf'), encoding='utf-8') as f:
+        text = f.read()
+    with open(os.path.join(DATA_DIR, 'output', 'Technique-USNM35717_.json'), encoding='utf-8') as f:
+        expected = f.read()
+    assert json.dumps(convert_rtf(text), indent=4, ensure_ascii=False) == expected
+    assert convert_rtf(text) == legacy_rtf(text)
+
+@pytest.mark.parametrize("rows", [
+    ['Machine ID:|A|', 'Name:|stray|', 'Xray Source:||', 'Voltage:|90 kV|', 'Name:|Tube|', 'Detector:||', 'Name:|Panel|'],
+    ['Operator ID:', '', '   next line value', 'Type:|helical|', 'Scan Type:|ignored|'],
+    ['Gain:||', 'Gain map 0:|0.5|', 'Gain:|second|', 'Start: 1 End: 2'],
+    ['Detector Name: inline', 'Filter:'],
+    ['Geometric Unsharpness Custom Formula:||', 'Name:|A [mm]|', 'Expression:|Math.Sqrt(2)|', 'Value:|1.41|',
+     '||', 'Name:|B|', 'Expression:|3|', 'Value:|3|', 'Motion Positions:||', 'Table mag:|132[mm]|'],
+    ['Geometric Unsharpness Custom Formula:', 'Name: A Name: B Expression: x Value: 1', 'Name: dangling'],
+])
+def test_matches_regex_per_field_parsing(rows):
+    """Test first-use, blank-value and scoped-name rules match the regex-per-field parser"""
+    text = report(*rows)
+    assert convert_rtf(text) == legacy_rtf(text)
+
+def test_scoped_names_follow_their_heading():
+    """Test each section's Name is the first one after its heading"""
+    result = convert_rtf(report('Name:|stray|', 'Xray Source:||', 'Name:|Tube|', 'Detector:||', 'Name:|Panel|'))
+    assert result == {'Xray Source': {'Name': 'Tube'}, 'Detector': {'Name': 'Panel'}}
+
+def test_one_pass_over_lines():
+    """Test fields and the formula section come from a single walk over the lines"""
+    lines = ['Xray Source:||', 'Voltage:|130 kV|', 'Geometric Unsharpness Custom Formula:||',
+             'Name:|Ug [mm]|', 'Expression:|Math.Pow(2,2)|', 'Value:|4|', 'Motion Positions:||', 'Table mag:|1|']
+    found, formula_text = parse_report(iter_once(lines))
+    assert found[('Xray Source', 'Voltage')] == '130 kV'
+    assert found[('Motion Positions', 'Table mag')] == '1'
+    assert parse_formulas(formula_text) == {'Ug': {'Expression': 'Pow(2,2)', 'Value': '4'}}
@@ -0,0 +1,96 @@
+import pytest
+import io
+import json
+import os
+import sys
+
+np = pytest.importorskip('numpy')
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts'))
+import sidecar
+from columnar import as_rows, column, to_columnar
+from converters import CONVERTERS
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+@pytest.mark.parametrize("name,table_key", [
+    ('Nano Di Side.pcj', 'data'),
+    ('TV Vizio PCB.pcj', 'data'),
+    ('Nano Di Side.pcp', 'measurements'),
+    ('Amazon echo 40 micron.pcp', 'measurements'),
+])
+def test_sidecar_round_trip(tmp_path, name, table_key):
+    """Test sidecar tables read back as the original rows and keep the JSON small"""
+    converter = CONVERTERS[os.path.splitext(name)[1][1:]]
+    with open(os.path.join(DATA_DIR, 'input', name), 'rb') as f:
+        raw = f.read()
+    rows = converter.convert(raw)[table_key]
+
+    json_path = tmp_path / converter.output_name('scan')
+    with open(json_path, 'w') as out:
+        assert converter.write_with_sidecar(io.BytesIO(raw), out, str(tmp_path / 'scan.npz'))
+    with open(json_path) as f:
+        document = json.load(f)
+
+    schema = document[table_key]['schema']
+    assert sidecar.is_sidecar(document[table_key])
+    assert schema['sidecar']['path'] == 'scan.npz'
+    assert any('member' in c for c in schema['columns'])
+    assert os.path.getsize(json_path) < len(converter.dumps(converter.convert(raw))) / 10
+
+    resolved = sidecar.resolve(document, str(tmp_path))[table_key]
+    for meta in schema['columns']:
+        values = column(resolved, meta['name'])
+        if meta.get('dtype', '').startswith('<M8'):
+            values = list(np.datetime_as_string(values))
+        elif hasattr(values, 'tolist'):
+            values = values.tolist()
+        assert values == [row.get(meta['name']) for row in rows], meta['name']
+    assert len(as_rows(resolved)) == len(rows)
+
+def test_arrays_are_memory_mapped(tmp_path):
+    """Test sidecar columns come back as read-only typed views, not copies"""
+    table = to_columnar([{'ImgNr': i, 'RS': i * 0.5, 'Tag': f't{i}'} for i in range(1000)])
+    document = sidecar.write({'data': table}, ['data'], str(tmp_path / 'scan.npz'))
+
+    columns = sidecar.load_columns(document['data'], str(tmp_path))
+    assert columns['ImgNr'].dtype == np.int64
+    assert columns['RS'].dtype == np.float64
+    assert not columns['RS'].flags.writeable
+    assert columns['RS'].base is not None
+    assert columns['RS'][999] == 499.5
+    copied = sidecar.load_columns(document['data'], str(tmp_path), mmap_mode=False)
+    assert copied['Tag'].tolist() == [f't{i}' for i in range(1000)]
+
+def test_mixed_and_constant_columns_stay_inline(tmp_path):
+    """Test columns that do not fit a typed array stay in the JSON"""
+    table = to_columnar([{'A': 1, 'B': 0.0, 'C': 1}, {'A': 2, 'B': 0.0, 'C': 'x'}, {'A': 3, 'B': 0.0}])
+    document = sidecar.write({'data': table}, ['data'], str(tmp_path / 'scan.npz'))
+
+    members = {c['name']: c.get('member') for c in document['data']['schema']['columns']}
+    assert members == {'A': 'data.0', 'B': None, 'C': None}
+    assert document['data']['columns'] == {'B': 0.0, 'C': [1, 'x', None]}
+
+def test_no_array_columns_writes_no_sidecar(tmp_path):
+    """Test a table with nothing to move is left inline and no file is written"""
+    document = {'data': to_columnar([{'A': 'x'}, {'A': 1}])}
+    assert sidecar.write(document, ['data'], str(tmp_path / 'scan.npz')) == document
+    assert os.listdir(tmp_path) == []
+
+def test_stale_sidecar_is_rejected(tmp_path):
+    """Test a sidecar rewritten after its JSON fails the hash check instead of loading"""
+    rows = [{'ImgNr': i, 'RS': i * 0.5} for i in range(100)]
+    document = sidecar.write({'data': to_columnar(rows)}, ['data'], str(tmp_path / 'scan.npz'))
+    sidecar.write({'data': to_columnar(rows[:50])}, ['data'], str(tmp_path / 'scan.npz'))
+
+    with pytest.raises(ValueError, match='sha256'):
+        sidecar.load_columns(document['data'], str(tmp_path))
+    with pytest.raises(ValueError, match='sha256'):
+        sidecar.resolve(document, str(tmp_path))
+    # Without the hash check the shapes still have to match the schema
+    with pytest.raises(ValueError, match=r'column ImgNr is <i8\[50\], expected <i8\[100\]'):
+        sidecar.load_columns(document['data'], str(tmp_path), check_hash=False)
+
+def test_sidecar_name():
+    """Test sidecars are named after their JSON output"""
+    assert sidecar.sidecar_name('Nano_Di_Side.pcj.json') == 'Nano_Di_Side.pcj.npz'
@@ -0,0 +1,34 @@
+import pytest
+import os
+import shutil
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts'))
+import soak
+from soak import build_parser, parse_mix, percentile, run_soak
+
+def test_parse_mix_and_percentile():
+    """Test mix weights are parsed and checked, and percentiles use the nearest rank"""
+    assert parse_mix('pca:6, scan:3,large') == {'pca': 6.0, 'scan': 3.0, 'large': 1.0}
+    for bad in ('huge:1', 'pca:0', ''):
+        with pytest.raises(ValueError):
+            parse_mix(bad)
+    values = [float(v) for v in range(1, 101)]
+    assert [percentile(values, q) for q in (50, 95, 99)] == [50.0, 95.0, 99.0]
+    assert percentile([], 50) is None
+
+@pytest.mark.skipif(shutil.which('git') is None, reason="needs git")
+def test_soak_run_commits_every_output(tmp_path):
+    """Test a short soak run gets every dropped file's JSON onto the local origin exactly once"""
+    options = build_parser().parse_args(['--scans', '3', '--rate', '4', '--mix', 'pca:1,scan:1',
+                                         '--projections', '300', '--quiet-period', '0.3',
+                                         '--batch-window', '0.5', '--drain-timeout', '60'])
+    report = run_soak(options, tmp_path)
+
+    assert report['missing'] == [] and report['committed'] == report['files'] >= 3
+    assert report['conversions']['duplicates'] == {} and report['conversions']['failed'] == 0
+    assert report['latency']['p50'] > 0 and report['latency']['max'] < 60
+    assert report['commits'] >= 1 and report['throughput']['files_per_second'] > 0
+    if soak.process_rss(os.getpid()) is not None:
+        assert report['memory']['peak'] >= report['memory']['start'] > 0
+    assert not any((tmp_path / 'share').iterdir())
@@ -0,0 +1,40 @@
+import pytest
+import gzip
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts'))
+from converters import convert_path
+from pcp_monitor import monitor_file
+from synthetic import write_scan
+
+@pytest.fixture(scope='module')
+def scan(tmp_path_factory):
+    """A small synthetic scan with a 1 MiB VGL project"""
+    return write_scan(tmp_path_factory.mktemp('scan'), name='Big scan', projections=1500, vgl_bytes=1 << 20)
+
+def test_scan_converts_at_its_scale(scan, tmp_path):
+    """Test every file of a synthetic scan converts, with one table row per projection over a full turn"""
+    outputs = {ext: json.loads(convert_path(path, tmp_path)[1].read_text()) for ext, path in scan.items()}
+    assert outputs['pca']['StartImg'] == 1501 and outputs['pca']['FOD'] == pytest.approx(436.723875)
+    assert len(outputs['pcj']['data']) == 1501 and outputs['pcj']['data'][-1]['RS'] == pytest.approx(360.0)
+    assert len(outputs['pcp']['measurements']) == 1501
+    assert outputs['pcr']['Reconstruction Settings']['LastImage'] == 1500
+    assert outputs['vgl']['scan_info']['Number of projections'] == '1500'
+
+def test_vgl_reaches_its_size_and_is_read_to_the_end(scan, tmp_path):
+    """Test the VGL project is about the requested size and its volume is found after every slice"""
+    with gzip.open(scan['vgl'], 'rb') as f:
+        size = len(f.read())
+    assert (1 << 20) - 2048 < size <= 1 << 20
+    volume = json.loads(convert_path(scan['vgl'], tmp_path)[1].read_text())['volumes'][0]
+    assert volume['grid_size'][:2] == [2024, 2024] and volume['grid_size'][2] > 5000
+    assert volume['voxel_size'] == [pytest.approx(0.1088035107)] * 3 and volume['file_name'].endswith('Big scan.vol')
+
+def test_scan_passes_the_ingest_checks(scan):
+    """Test the trajectory matches the PCA and the PCP readings are stable"""
+    trajectory = pytest.importorskip('trajectory')
+    pytest.importorskip('numpy')
+    assert trajectory.check_files(scan['pcj'], scan['pca'])['status'] == 'ok'
+    assert monitor_file(scan['pcp'])['status'] == 'ok'
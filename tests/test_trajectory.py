@@ -0,0 +1,86 @@
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts'))
+np = pytest.importorskip('numpy')
+import trajectory
+from trajectory import check_files, check_trajectory, read_trajectory, trajectory_name
+
+INPUT_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'input')
+NOMINAL = {'FOD': 100.0, 'FDD': 800.0, 'NumberImages': 1000, 'RotationSector': 360.0}
+
+def columns(rows=1001, step=0.36, fod=100.0):
+    """A clean circular trajectory as read_trajectory returns it"""
+    images = np.arange(1, rows + 1, dtype=float)
+    return {
+        'ImgNr': images,
+        'XS': np.zeros(rows),
+        'YS': np.full(rows, 158.0),
+        'ZS': np.full(rows, -fod),
+        'RS': (images - 1) * step,
+        'XD': np.zeros(rows),
+    }
+
+@pytest.mark.parametrize('name', ['TV Vizio PCB', 'Nano Di Side', 'Amazon echo 40 micron'])
+def test_sample_scans_match_their_pca(name):
+    """Test the sample trajectories match their nominal geometry"""
+    report = check_files(os.path.join(INPUT_DIR, f"{name}.pcj"), os.path.join(INPUT_DIR, f"{name}.pca"))
+    assert report['status'] == 'ok' and report['problems'] == [] and report['ranges'] == []
+    assert report['projections'] == report['expected_projections']
+    assert report['rotation']['angle_max_dev'] < 1e-6 and report['source_z']['max_dev'] < 1e-6
+    assert report['pca'] == f"{name}.pca"
+
+def test_rotation_glitch_and_source_offset():
+    """Test a missed rotation step and a moved source stage are flagged by image"""
+    data = columns()
+    data['RS'][500:] += 0.36  # One step skipped from image 501 on
+    data['ZS'][100:110] += 0.5
+    report = check_trajectory(data, NOMINAL)
+    assert report['status'] == 'mismatch' and report['problems'] == ['out_of_tolerance']
+    assert report['rotation']['out_of_tolerance'] == 501
+    assert report['rotation']['step_max_dev'] == pytest.approx(0.36)
+    assert report['source_z']['out_of_tolerance'] == 10
+    assert report['ranges'] == [[101, 110], [501, 1001]]
+
+def test_projection_count_and_sector():
+    """Test a short scan is reported and a partial sector expects NumberImages projections"""
+    report = check_trajectory(columns(rows=900), NOMINAL)
+    assert report['problems'] == ['projection_count'] and report['flagged'] == 0
+
+    report = check_trajectory(columns(rows=1000, step=0.18), {**NOMINAL, 'RotationSector': 180.0})
+    assert report['status'] == 'ok' and report['expected_projections'] == 1000
+
+def test_without_pca_only_evenness_is_checked():
+    """Test with no nominal geometry the scan's own step is used and ZS is not checked"""
+    data = columns(fod=50.0)
+    report = check_trajectory(data)
+    assert report['status'] == 'ok' and 'source_z' not in report
+    assert report['rotation']['nominal_step'] is None
+
+    data['RS'][400] += 0.1
+    assert check_trajectory(data)['ranges'] == [[401, 401]]
+
+def test_ranges_are_bounded(monkeypatch):
+    """Test past MAX_RANGES ranges are counted but not listed"""
+    monkeypatch.setattr(trajectory, 'MAX_RANGES', 3)
+    data = columns()
+    data['ZS'][::100] += 1.0
+    report = check_trajectory(data, NOMINAL)
+    assert report['ranges'] == [[1, 1], [101, 101], [201, 201]]
+    assert report['truncated'] and report['flagged'] == 11
+
+def test_read_trajectory(tmp_path):
+    """Test the [Data] columns are found by name and a file without them is rejected"""
+    text = ("[Info]\nNumImages=2\n\n[Data]\n;ImgNr\tXS\t\tYS\t\tZS\t\tRS\t\tXD\tWarmup\n"
+            "1\t0.0\t158.0\t-436.5\t0.0\t0.0\t0\t\n2\t0.0\t158.0\t-436.5\t0.5\t0.0\t0\t\n")
+    data = read_trajectory(text)
+    assert data['RS'].tolist() == [0.0, 0.5] and data['ZS'].tolist() == [-436.5, -436.5]
+    with pytest.raises(ValueError):
+        read_trajectory(text.replace('RS', 'R'))
+    with pytest.raises(ValueError):
+        read_trajectory('[Info]\nNumImages=2\n')
+
+def test_trajectory_name():
+    """Test the report name is not read as a converted output"""
+    assert trajectory_name('TV_Vizio_PCB.pcj.json') == 'TV_Vizio_PCB.pcj-trajectory.json'
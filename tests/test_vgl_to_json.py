@@ -0,0 +1,114 @@
+import pytest
+import gzip
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts'))
+from vgl_to_json import READ_SIZE, VGLConverter
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+PROJECT = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<!DOCTYPE Project [\n<!ELEMENT Project (version, units, vgl)>\n]>\n'
+    '<Project>\n'
+    '<version identifier="4.2.0" appname="VGStudio MAX" appversion="5.5.0">\n'
+    '  <file_location><filename>S:/scan.vgl</filename></file_location>\n'
+    '</version>\n'
+    '<units><unit quantity="Length" name="Millimeter" abbreviation="mm" factor="0.001" isInternalUnit="1"/></units>\n'
+    '<vgl>\n'
+    '{filler}'
+    '<property name="ScanInfo" type="stringpairarray">'
+    '<string>Tube voltage</string><string>220 kV</string><string>Scan time</string><string></string>'
+    '</property>\n'
+    '<object class="VGLSampleGridImportRaw" id="VGL_1">'
+    '<property name="TransformMatrixList" type="matrix4array">'
+    '<matrix4>0.1 0 0 0 0 0.1 0 0 0 0 0.1 0 0 0 0.05 1</matrix4>'
+    '<matrix4>0.1 0 0 0 0 0.1 0 0 0 0 0.1 0 0 0 0.15 1</matrix4>'
+    '</property>'
+    '<property name="GridSize" type="vector4"><vector4>392 2024 2022 1</vector4></property>'
+    '<property name="SampleDataType" type="typeinfo"><typeinfo>UInt16</typeinfo></property>'
+    '<property name="FileName" type="string"><string>S:/scan.vol</string></property>'
+    '</object>\n'
+    '</vgl>\n</Project>\n'
+)
+
+def project(filler_objects=0):
+    filler = ''.join(f'<object class="VGLTransform" id="VGL_f{i}"><property name="Name" type="string">'
+                     f'<string>object {i}</string></property></object>\n' for i in range(filler_objects))
+    return PROJECT.replace('{filler}', filler).encode('utf-8')
+
+class CountingReader(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+def test_gzip_project_is_parsed():
+    """Test the gzip wrapper is inflated and the project document is read"""
+    data = VGLConverter().convert_stream(io.BytesIO(gzip.compress(project()) + b'trailing bytes'))
+
+    assert data['header']['compression'] == 'gzip'
+    assert data['header']['complete']
+    assert data['metadata'] == {'identifier': '4.2.0', 'appname': 'VGStudio MAX', 'appversion': '5.5.0',
+                                'file_location': 'S:/scan.vgl', 'length_unit': 'mm'}
+    assert data['scan_info'] == {'Tube voltage': '220 kV'}
+    assert data['volumes'] == [{'importer': 'VGLSampleGridImportRaw', 'voxel_size': [0.1, 0.1, 0.1],
+                                'grid_size': [392, 2024, 2022], 'data_type': 'UInt16',
+                                'file_name': 'S:/scan.vol'}]
+
+def test_plain_xml_project_is_parsed():
+    """Test an uncompressed project document converts the same way"""
+    data = VGLConverter().convert_stream(io.BytesIO(project()))
+    assert data['header']['compression'] is None
+    assert data['volumes'][0]['file_name'] == 'S:/scan.vol'
+
+def test_metadata_only_reads_a_prefix():
+    """Test reading stops once the requested sections are complete"""
+    raw = gzip.compress(project(20000), compresslevel=1)
+    source = CountingReader(raw)
+    data = VGLConverter().convert_stream(source, sections=['metadata'])
+
+    assert data['metadata']['appname'] == 'VGStudio MAX'
+    assert 'volumes' not in data
+    assert data['header']['bytes_read'] < len(raw) / 4
+    assert source.reads <= 3
+
+def test_reads_in_blocks_with_flat_memory():
+    """Test the whole document is read in blocks and peak memory does not grow with it"""
+    import tracemalloc
+
+    small = gzip.compress(project(2000))
+    large = gzip.compress(project(40000))
+    VGLConverter().convert_stream(io.BytesIO(small))
+    peaks = []
+    for raw in (small, large):
+        source = CountingReader(raw)
+        tracemalloc.start()
+        try:
+            data = VGLConverter().convert_stream(source)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+        assert data['volumes'][0]['grid_size'] == [392, 2024, 2022]
+        assert source.reads <= len(raw) // READ_SIZE + 3
+    assert peaks[1] < peaks[0] * 2
+
+@pytest.mark.parametrize("raw", [gzip.compress(project())[:200], b'not a project'])
+def test_broken_input_raises(raw):
+    """Test truncated streams and non-XML content raise ValueError"""
+    with pytest.raises(ValueError):
+        VGLConverter().convert_stream(io.BytesIO(raw))
+
+@pytest.mark.parametrize("name", ['TV Vizio PCB.vgl', 'Amazon echo 40 micron.vgl'])
+def test_corpus_projects(name):
+    """Test the sample projects yield their scan settings and volume file"""
+    data = VGLConverter().convert_file(os.path.join(DATA_DIR, 'input', name))
+    assert data['metadata']['appname'] == 'VGStudio MAX'
+    assert data['scan_info']['Tube voltage'].endswith('kV')
+    assert data['volumes'][0]['file_name'].endswith('.vol')
+    assert data['file_size'] == os.path.getsize(os.path.join(DATA_DIR, 'input', name))